@@ -0,0 +1,198 @@
+"""
+Fixture sets for the mock server.
+
+generate() writes synthetic pages for the HTTP audio sources that only carry
+the markup their parsers read (category variables, the `d` JSON of the
+media.qdnd.vn AJAX APIs, listing links, the player's media URL) plus a
+short WAV file every item points to, so the benchmark runs out of the box:
+
+    <root>/qdnd_media/     category pages, LoadMediaPageDetaileByPageIndex pages, video pages
+    <root>/qdnd_podcast/   LoadMoreAudioList pages, podcast pages
+    <root>/nhandan_radio/  listing pages (/page/N), article pages
+    <root>/media/          sample.wav
+
+record() captures a live response into the same layout, for replaying real
+pages (like crawl_text/tcqp_crawler/page_dump.html) instead:
+
+    python fixtures.py record <root>/<source> <url> [--post '{"pageindex": 0}'] [--name list_0.json]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+import urllib.request
+import wave
+
+SPEECH_TEST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "speech_test")
+sys.path.append(SPEECH_TEST_DIR)
+
+MEDIA_FILE = "media/sample.wav"
+
+
+class FixtureSet:
+    """Writes one source's files and routes.json."""
+
+    def __init__(self, root, source):
+        self.dir = os.path.join(root, source)
+        os.makedirs(self.dir, exist_ok=True)
+        self.routes = []
+
+    def add(self, url, name, body, method="GET", content_type="text/html", match=None):
+        with open(os.path.join(self.dir, name), "w", encoding="utf-8") as f:
+            f.write(body)
+        route = {"method": method, "url": url, "file": name, "content_type": content_type}
+        if match:
+            route["match"] = match
+        self.routes.append(route)
+
+    def save(self):
+        with open(os.path.join(self.dir, "routes.json"), "w", encoding="utf-8") as f:
+            json.dump(self.routes, f, ensure_ascii=False, indent=1)
+
+
+def media_url(item_id):
+    # A distinct query per item so downloads do not collide in .downloads/
+    return f"{{{{MOCK}}}}/_files/{MEDIA_FILE}?item={item_id}"
+
+
+def write_media(root, seconds=1.0, sample_rate=16000):
+    path = os.path.join(root, MEDIA_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frames = int(seconds * sample_rate)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate)))
+                               for i in range(frames)))
+    return path
+
+
+def generate_qdnd_media(root, pages, items):
+    import crawl_qdnd_media as source
+
+    fixtures = FixtureSet(root, "qdnd_media")
+    video_page = "<script>intVideo('avatar.jpg', '{media}');</script>"
+    for theloai, (cat_name, cat_url) in enumerate(source.CATEGORIES.items(), start=1):
+        slug = cat_url.rstrip("/").rsplit("/", 1)[-1]
+        fixtures.add(cat_url, f"{slug}.html",
+                     f"<script>var _glvtheloai = '{theloai}'; var _glvtieude = '{slug}';</script>")
+        for page in range(pages + 1):
+            articles = []
+            if page < pages:
+                for i in range(items):
+                    item_id = theloai * 100000 + page * 1000 + i
+                    path = f"/{slug}/video-{item_id}"
+                    articles.append(f'<article class="media-small-news"><a href="{path}">x</a>'
+                                    f'<h4 class="media-tt-news">Video {item_id}</h4></article>')
+                    fixtures.add(source.BASE_URL + path, f"video_{item_id}.html",
+                                 video_page.format(media=media_url(item_id)))
+            fixtures.add(source.API_URL, f"{slug}_page_{page}.json", json.dumps({"d": "".join(articles)}),
+                         method="POST", content_type="application/json",
+                         match={"theloai": theloai, "pageindex": page})
+    fixtures.save()
+
+
+def generate_qdnd_podcast(root, pages, items):
+    import crawl_qdnd_podcast as source
+
+    fixtures = FixtureSet(root, "qdnd_podcast")
+    for page in range(1, pages + 2):
+        links = []
+        if page <= pages:
+            for i in range(items):
+                item_id = page * 1000 + i
+                url = f"https://media.qdnd.vn/audio-podcast/podcast-{item_id}"
+                links.append(f'<article class="media-small-news"><a href="{url}" title="Podcast {item_id}">x</a></article>')
+                fixtures.add(url, f"podcast_{item_id}.html",
+                             f'<div class="mediaurl" data-src="{media_url(item_id)}"></div>')
+        fixtures.add(source.API_URL, f"page_{page}.json", json.dumps({"d": "".join(links)}),
+                     method="POST", content_type="application/json", match={"pageindex": page - 1})
+    fixtures.save()
+
+
+def generate_nhandan_radio(root, pages, items):
+    import crawl_nhandan_radio as source
+
+    fixtures = FixtureSet(root, "nhandan_radio")
+    for page in range(1, pages + 1):
+        links = []
+        for i in range(items):
+            item_id = page * 1000 + i
+            path = f"/ban-tin-{item_id}-i{item_id}"
+            links.append(f'<div class="box-title-main"><a href="{path}" title="Bản tin {item_id}">x</a></div>')
+            fixtures.add("https://radio.nhandan.vn" + path, f"article_{item_id}.html",
+                         f'<div class="item_media_json">{json.dumps([media_url(item_id)])}</div>')
+        url = source.BASE_URL if page == 1 else f"{source.BASE_URL}/page/{page}"
+        # Past the last page the server answers 404, like the site
+        fixtures.add(url, f"list_{page}.html", "".join(links))
+    fixtures.save()
+
+
+GENERATORS = {
+    "qdnd_media": generate_qdnd_media,
+    "qdnd_podcast": generate_qdnd_podcast,
+    "nhandan_radio": generate_nhandan_radio,
+}
+
+
+def generate(root, sources=None, pages=5, items=12, media_seconds=1.0):
+    write_media(root, media_seconds)
+    for name in sources or GENERATORS:
+        GENERATORS[name](root, pages, items)
+    return root
+
+
+def record(source_dir, url, post=None, name=None):
+    """Fetches url (POSTing the JSON `post` if given) and adds it to source_dir/routes.json."""
+    data = json.dumps(post).encode() if post is not None else None
+    request = urllib.request.Request(url, data=data, headers={
+        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        **({"Content-Type": "application/json"} if data else {}),
+    })
+    with urllib.request.urlopen(request, timeout=60) as response:
+        body = response.read()
+        content_type = response.headers.get_content_type()
+
+    os.makedirs(source_dir, exist_ok=True)
+    name = name or hashlib.md5((url + (data or b"").decode()).encode()).hexdigest() + (
+        ".json" if content_type.endswith("json") else ".html")
+    with open(os.path.join(source_dir, name), "wb") as f:
+        f.write(body)
+
+    routes_path = os.path.join(source_dir, "routes.json")
+    routes = []
+    if os.path.exists(routes_path):
+        with open(routes_path, "r", encoding="utf-8") as f:
+            routes = json.load(f)
+    route = {"method": "POST" if data else "GET", "url": url, "file": name, "content_type": content_type}
+    if post:
+        route["match"] = post
+    routes.append(route)
+    with open(routes_path, "w", encoding="utf-8") as f:
+        json.dump(routes, f, ensure_ascii=False, indent=1)
+    print(f"Recorded {url} -> {os.path.join(source_dir, name)} ({len(body)} bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate or record mock-server fixtures")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate")
+    gen.add_argument("root")
+    gen.add_argument("--pages", type=int, default=5)
+    gen.add_argument("--items", type=int, default=12)
+    rec = sub.add_parser("record")
+    rec.add_argument("source_dir")
+    rec.add_argument("url")
+    rec.add_argument("--post", type=json.loads, help="JSON body to POST (also used as the route's match)")
+    rec.add_argument("--name")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.root, pages=args.pages, items=args.items)
+    else:
+        record(args.source_dir, args.url, args.post, args.name)
@@ -0,0 +1,173 @@
+"""
+Local HTTP server replaying recorded crawler fixtures.
+Lets throughput work be measured offline: the crawlers keep their real URLs
+and AsyncFetcher(url_rewrite=server.rewrite) sends every request here
+instead, as http://127.0.0.1:<port>/<host>/<path>?<query>.
+
+Fixture root layout (one directory per source, see fixtures.py):
+
+    <root>/<source>/routes.json     [{"method": "GET", "url": "https://...", "file": "list_1.html",
+                                      "content_type": "text/html", "status": 200,
+                                      "match": {"pageindex": 0}}, ...]
+    <root>/<source>/<files>
+
+`match` (POST only) must be a subset of the JSON body, so one API URL can
+answer per page. Anything under <root> is also served at /_files/<path>
+(with Range support, for media), and "{{MOCK}}" in a fixture body is
+replaced by the server's base URL so media links point back at it.
+Requests without a route get a 404, which is how most listings end.
+
+Latency (mean/jitter seconds per response) and error injection (a fraction
+of responses answered with error_status) are configurable.
+
+Usage:
+    with MockServer("fixtures", latency=0.05, error_rate=0.01) as server:
+        async with AsyncFetcher(url_rewrite=server.rewrite) as fetcher:
+            ...
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+FILES_PREFIX = "/_files/"
+PLACEHOLDER = "{{MOCK}}"
+
+
+def rewrite_url(base_url, url):
+    """https://host/path?query -> <base_url>/host/path?query (URLs already on the server are kept)."""
+    if url.startswith(base_url):
+        return url
+    parts = urlsplit(url)
+    target = f"{base_url}/{parts.netloc}{parts.path or '/'}"
+    return f"{target}?{parts.query}" if parts.query else target
+
+
+def load_routes(root):
+    """{(method, url): [route, ...]} for every routes.json under root."""
+    routes = {}
+    for source in sorted(os.listdir(root)):
+        path = os.path.join(root, source, "routes.json")
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for route in json.load(f):
+                route = dict(route, file=os.path.join(root, source, route["file"]))
+                routes.setdefault((route.get("method", "GET").upper(), route["url"]), []).append(route)
+    return routes
+
+
+class MockServer:
+    def __init__(self, root, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 seed=0, host="127.0.0.1", port=0):
+        self.root = os.path.abspath(root)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.host = host
+        self.port = port
+        self.base_url = None
+        self.routes = load_routes(self.root)
+        self.stats = {"requests": 0, "errors": 0, "misses": 0}
+        self._random = random.Random(seed)
+        self._bodies = {}
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    def rewrite(self, url):
+        return rewrite_url(self.base_url, url)
+
+    def _find(self, method, url, payload):
+        for route in self.routes.get((method, url), []):
+            match = route.get("match") or {}
+            if all(isinstance(payload, dict) and payload.get(k) == v for k, v in match.items()):
+                return route
+        return None
+
+    def _body(self, path):
+        if path not in self._bodies:
+            with open(path, "rb") as f:
+                self._bodies[path] = f.read().replace(PLACEHOLDER.encode(), self.base_url.encode())
+        return self._bodies[path]
+
+    async def _delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self._random.gauss(self.latency, self.jitter)))
+
+    async def handle(self, request):
+        self.stats["requests"] += 1
+        await self._delay()
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=self.error_status, text="injected error")
+
+        if request.path.startswith(FILES_PREFIX):
+            path = os.path.normpath(os.path.join(self.root, request.path[len(FILES_PREFIX):]))
+            if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+                self.stats["misses"] += 1
+                raise web.HTTPNotFound()
+            return web.FileResponse(path)
+
+        host, _, rest = request.path_qs.lstrip("/").partition("/")
+        url = f"https://{host}/{rest}"
+        payload = None
+        if request.method == "POST" and request.can_read_body:
+            try:
+                payload = await request.json()
+            except ValueError:
+                payload = None
+
+        route = self._find(request.method, url, payload)
+        if route is None:
+            self.stats["misses"] += 1
+            raise web.HTTPNotFound()
+        return web.Response(status=route.get("status", 200), body=self._body(route["file"]),
+                            content_type=route.get("content_type", "text/html"), charset="utf-8")
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Runs the server on its own event loop in a background thread."""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,218 @@
+"""
+Offline crawler throughput benchmark.
+Starts the mock server on a fixture root (generated by fixtures.py unless
+--fixtures is given), then runs each source's frontier plugin (the same
+code crawl_all_sources.py runs) in its own process and working directory
+against it, and reports:
+
+    pages/s     listing pages handled per second
+    items/s     detail pages handled per second
+    media/s     transcodes finished per second (with --media; needs ffmpeg)
+    p50 / p99   per-item latency (detail fetch + parse + submit), ms
+    peak RSS    of the crawler process, MB
+
+Run:
+    python run_benchmarks.py [--sources qdnd_media nhandan_radio] [--pages 5] [--items 12]
+                             [--latency 0.05 --jitter 0.02] [--error-rate 0.02] [--media]
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.append(REPO_DIR)
+sys.path.append(os.path.join(REPO_DIR, "speech_test"))
+
+from mock_server import MockServer, rewrite_url
+import fixtures
+
+# source name -> (module in speech_test, plugin class)
+SOURCES = {
+    "qdnd_media": ("crawl_qdnd_media", "QdndMediaSource"),
+    "qdnd_podcast": ("crawl_qdnd_podcast", "QdndPodcastSource"),
+    "nhandan_radio": ("crawl_nhandan_radio", "NhandanRadioSource"),
+}
+
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100.0 * len(values) + 0.5)) - 1))]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # ru_maxrss is in KB on Linux
+
+
+async def run_source(source, base_url, args):
+    """Worker side: runs one plugin to completion against the mock server."""
+    from crawl_common.fetch import AsyncFetcher
+    from crawl_common.frontier import Frontier, Scheduler, SourcePlugin
+    from crawl_common.transcode_pool import TranscodePool
+
+    class TimedSource(SourcePlugin):
+        """Wraps a plugin and times its tasks."""
+
+        def __init__(self, plugin):
+            self.plugin = plugin
+            self.name = plugin.name
+            self.pages = 0
+            self.item_latencies = []
+            self.media = 0
+
+        def start(self, transcoder):
+            self.plugin.start(transcoder)
+
+        def seeds(self):
+            return self.plugin.seeds()
+
+        async def handle(self, fetcher, task):
+            start = time.perf_counter()
+            new_tasks = await self.plugin.handle(fetcher, task)
+            if task.kind == "listing":
+                self.pages += 1
+            else:
+                self.item_latencies.append(time.perf_counter() - start)
+            return new_tasks
+
+        def on_transcoded(self, job):
+            self.media += 1 if job.ok else 0
+            self.plugin.on_transcoded(job)
+
+        def close(self):
+            self.plugin.close()
+
+    module_name, class_name = SOURCES[source]
+    plugin = TimedSource(getattr(importlib.import_module(module_name), class_name)())
+    frontier = Frontier("frontier.db")
+    transcoder = TranscodePool(workers=args.transcode_workers, limiter=None) if args.media else None
+
+    start = time.perf_counter()
+    try:
+        async with AsyncFetcher(per_host_concurrency=args.per_host,
+                                url_rewrite=partial(rewrite_url, base_url)) as fetcher:
+            # No rate limiter: the benchmark measures the crawler, not the politeness delays
+            scheduler = Scheduler(frontier, [plugin], fetcher, transcoder, workers=args.workers,
+                                  per_host_tasks=args.per_host, limiter=None,
+                                  max_attempts=args.max_attempts)
+            await scheduler.run()
+        counts = frontier.counts()
+    finally:
+        frontier.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "source": source,
+        "elapsed": elapsed,
+        "pages": plugin.pages,
+        "items": len(plugin.item_latencies),
+        "media": plugin.media,
+        "failed": counts.get("failed", 0),
+        "pages_per_s": plugin.pages / elapsed,
+        "items_per_s": len(plugin.item_latencies) / elapsed,
+        "media_per_s": plugin.media / elapsed,
+        "p50_ms": percentile(plugin.item_latencies, 50) * 1000,
+        "p99_ms": percentile(plugin.item_latencies, 99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def worker_main(args):
+    # Fresh working directory: processed stores, frontier.db and downloads start empty
+    os.chdir(args.workdir)
+    with open("pipeline_config.json", "w") as f:
+        json.dump({"save_audio": args.media, "audio_format": "wav", "sample_rate": 16000, "channels": 1,
+                   "output_dir": "downloads_audio", "per_host_concurrency": args.per_host}, f)
+    result = asyncio.run(run_source(args.worker, args.base_url, args))
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def run_worker(source, base_url, args):
+    workdir = tempfile.mkdtemp(prefix=f"bench_{source}_")
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", source, "--base-url", base_url,
+           "--workdir", workdir, "--workers", str(args.workers), "--per-host", str(args.per_host),
+           "--max-attempts", str(args.max_attempts)]
+    if args.media:
+        cmd.append("--media")
+    if args.transcode_workers:
+        cmd += ["--transcode-workers", str(args.transcode_workers)]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+        if args.verbose:
+            print(f"  [{source}] {line}")
+    print(f"{source}: worker exited with {proc.returncode}")
+    print("\n".join(proc.stdout.splitlines()[-20:]))
+    return None
+
+
+def main(args):
+    cleanup = None
+    root = args.fixtures
+    if root is None:
+        root = cleanup = tempfile.mkdtemp(prefix="bench_fixtures_")
+        fixtures.generate(root, args.sources, pages=args.pages, items=args.items)
+
+    try:
+        with MockServer(root, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as server:
+            print(f"Mock server at {server.base_url} (latency {args.latency}s ± {args.jitter}s, "
+                  f"error rate {args.error_rate:.1%})")
+            print(f"{'source':<14} {'pages':>6} {'items':>6} {'failed':>6} {'pages/s':>8} {'items/s':>8} "
+                  f"{'media/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")
+            for source in args.sources:
+                r = run_worker(source, server.base_url, args)
+                if r is None:
+                    continue
+                print(f"{r['source']:<14} {r['pages']:>6} {r['items']:>6} {r['failed']:>6} "
+                      f"{r['pages_per_s']:>8.1f} {r['items_per_s']:>8.1f} {r['media_per_s']:>8.1f} "
+                      f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['peak_rss_mb']:>7.1f}")
+            print(f"Server: {server.stats}")
+    finally:
+        if cleanup:
+            shutil.rmtree(cleanup, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline crawler benchmark against a local mock server")
+    parser.add_argument("--sources", nargs="+", choices=list(SOURCES), default=list(SOURCES))
+    parser.add_argument("--fixtures", help="Fixture root to replay (default: generate synthetic fixtures)")
+    parser.add_argument("--pages", type=int, default=5, help="Listing pages per source (generated fixtures)")
+    parser.add_argument("--items", type=int, default=12, help="Items per listing page (generated fixtures)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Std deviation of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of responses answered with 503")
+    parser.add_argument("--workers", type=int, default=8, help="Scheduler workers")
+    parser.add_argument("--per-host", type=int, default=4, help="Per-host connections / tasks in flight")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--media", action="store_true", help="Download and transcode the media files (needs ffmpeg)")
+    parser.add_argument("--transcode-workers", type=int)
+    parser.add_argument("--verbose", action="store_true", help="Show the crawlers' own output")
+    # Internal: run one source in this process
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+    else:
+        main(args)
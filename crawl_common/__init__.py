@@ -0,0 +1,5 @@
+"""
+Shared helpers used by the crawlers in speech_test/ and crawl_text/.
+Scripts run from their own directory, so they add the repo root to sys.path
+before importing from this package.
+"""
@@ -0,0 +1,181 @@
+"""
+Article output for the news text crawlers (qdnd, tcqp).
+Both crawlers save an article the same way: skip it if it is a near-duplicate
+of one already saved (see near_dup.py), then append it to the shards (see
+shard_writer.py) or write one .txt file per article. Each crawler's utils.py
+holds its own settings and one ArticleStore built from them.
+
+Usage:
+    store = ArticleStore(SHARD_DIR, output_format="shards", near_dup_db=NEAR_DUP_DB)
+    store.save(output_dir, {"title": ..., "date": ..., "url": url}, content)
+    store.export_txt(SHARD_DIR, "crawled_data")
+"""
+
+import atexit
+import hashlib
+import os
+import re
+
+from crawl_common.metrics import default_metrics
+from crawl_common.near_dup import NearDuplicateIndex
+from crawl_common.shard_writer import DEFAULT_MAX_BYTES, ShardWriter, iter_records
+
+DEFAULT_NEAR_DUP_THRESHOLD = 0.8
+
+
+def sanitize_filename(name):
+    """
+    Sanitizes a string to be safe for use as a filename.
+    """
+    name = re.sub(r'[\\/*?:"<>|]', '_', name)
+    name = name.strip().strip('.')
+    return name[:200]
+
+
+def ensure_dir(directory):
+    """
+    Ensures that a directory exists.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+
+def saved_url(file_path):
+    """
+    Reads the URL line from the header of a file written by save_article_txt.
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for _ in range(3):
+                line = f.readline()
+                if line.startswith("URL: "):
+                    return line[len("URL: "):].strip()
+    except Exception:
+        pass
+    return None
+
+
+def save_article_txt(output_dir, metadata, content):
+    """
+    Saves article content and metadata.
+    Structure: output_dir/Title.txt
+    """
+    ensure_dir(output_dir)
+
+    title = metadata.get('title', 'Untitled')
+    date = metadata.get('date', 'Unknown_Date')
+    url = metadata.get('url', 'N/A')
+
+    filename = f"{sanitize_filename(title)}.txt"
+    file_path = os.path.join(output_dir, filename)
+
+    # A different article with the same title already has this name: keep both
+    if os.path.exists(file_path) and saved_url(file_path) != url:
+        filename = f"{sanitize_filename(title)}_{hashlib.md5(url.encode()).hexdigest()[:8]}.txt"
+        file_path = os.path.join(output_dir, filename)
+
+    file_content = f"Title: {title}\n"
+    file_content += f"Date: {date}\n"
+    file_content += f"URL: {url}\n"
+    file_content += "-" * 40 + "\n\n"
+    file_content += content
+
+    try:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(file_content)
+        print(f"Saved: {file_path}")
+        return True
+    except Exception as e:
+        print(f"Error saving {file_path}: {e}")
+        return False
+
+
+def export_txt(shard_dir, output_dir):
+    """Writes the .txt files (same layout as save_article_txt) from the shards."""
+    count = 0
+    for record in iter_records(shard_dir):
+        content = record.pop("content", "")
+        if save_article_txt(output_dir, record, content):
+            count += 1
+    print(f"Exported {count} articles from {shard_dir} to {output_dir}")
+    return count
+
+
+class ArticleStore:
+    """
+    output_format "shards" appends JSONL records keyed by URL to shard_dir;
+    "txt" writes output_dir/Title.txt. With near_dup_db set, near-duplicates
+    are recorded as aliases there instead of being saved.
+    The shard writer and the index are opened on first use and closed at exit.
+    """
+
+    def __init__(self, shard_dir, output_format="shards", max_bytes=DEFAULT_MAX_BYTES, compression=None,
+                 near_dup_db=None, near_dup_threshold=DEFAULT_NEAR_DUP_THRESHOLD):
+        self.shard_dir = shard_dir
+        self.output_format = output_format
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.near_dup_db = near_dup_db
+        self.near_dup_threshold = near_dup_threshold
+        self._writer = None
+        self._index = None
+        atexit.register(self.close)
+
+    @property
+    def writer(self):
+        if self._writer is None:
+            self._writer = ShardWriter(self.shard_dir, max_bytes=self.max_bytes, compression=self.compression)
+        return self._writer
+
+    @property
+    def near_dup_index(self):
+        if self._index is None:
+            ensure_dir(os.path.dirname(self.near_dup_db) or ".")
+            self._index = NearDuplicateIndex(self.near_dup_db, threshold=self.near_dup_threshold)
+        return self._index
+
+    def save(self, output_dir, metadata, content):
+        """
+        Saves the article in output_format, unless it is a near-duplicate of a saved one.
+        In "shards" mode output_dir is unused; records go to shard_dir keyed by URL.
+        Returns True when the article is saved or recorded as an alias.
+        """
+        url = metadata.get('url', 'N/A')
+        signature = None
+        if self.near_dup_db:
+            index = self.near_dup_index
+            signature = index.signature(content)
+            match = index.find(signature)
+            if match and match[0] != url:
+                index.add_alias(url, *match)
+                default_metrics.inc("near_duplicates_total")
+                print(f"Near-duplicate of {match[0]} ({match[1]:.0%} similar), recorded as alias: {url}")
+                return True
+
+        if self.output_format == "shards":
+            saved = self.save_shards(metadata, content)
+        else:
+            saved = save_article_txt(output_dir, metadata, content)
+        if saved and signature is not None:
+            self.near_dup_index.add(url, signature)
+        return saved
+
+    def save_shards(self, metadata, content):
+        """
+        Appends the article to the shards under shard_dir, keyed by URL.
+        """
+        url = metadata.get('url', 'N/A')
+        try:
+            self.writer.write(url, {**metadata, "content": content})
+            return True
+        except Exception as e:
+            print(f"Error saving {url} to shards: {e}")
+            return False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
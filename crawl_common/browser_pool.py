@@ -0,0 +1,77 @@
+"""
+Bounded pool of Playwright pages for the async API.
+Each page lives in its own browser context so cookies/session state of one
+document never leaks into another. Pages are recycled between jobs instead of
+being created and closed per document. context_setup (a coroutine function
+taking the new context, e.g. resource_blocking.block_resources_async) runs
+on every context the pool creates, including replacements.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+DEFAULT_POOL_SIZE = 4
+
+
+class PagePool:
+    """
+    Usage:
+        pool = PagePool(browser, size=4)
+        await pool.start()
+        async with pool.page() as page:
+            await page.goto(url)
+        await pool.close()
+    """
+
+    def __init__(self, browser, size=DEFAULT_POOL_SIZE, context_options=None, context_setup=None):
+        self.browser = browser
+        self.size = size
+        self.context_options = context_options or {}
+        self.context_setup = context_setup
+        self._idle = asyncio.Queue()
+        self._contexts = []
+
+    async def _new_page(self):
+        context = await self.browser.new_context(**self.context_options)
+        self._contexts.append(context)
+        if self.context_setup is not None:
+            await self.context_setup(context)
+        return await context.new_page()
+
+    async def start(self):
+        for _ in range(self.size):
+            await self._idle.put(await self._new_page())
+
+    async def acquire(self):
+        """Waits until a page is idle and hands it out."""
+        return await self._idle.get()
+
+    async def release(self, page):
+        """Returns a page to the pool, replacing it if it crashed or was closed."""
+        if page.is_closed():
+            if page.context in self._contexts:
+                self._contexts.remove(page.context)
+                await page.context.close()
+            page = await self._new_page()
+        else:
+            try:
+                # Drop the previous document so its scripts stop running
+                await page.goto("about:blank")
+            except Exception:
+                self._contexts.remove(page.context)
+                await page.context.close()
+                page = await self._new_page()
+        await self._idle.put(page)
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self.acquire()
+        try:
+            yield page
+        finally:
+            await self.release(page)
+
+    async def close(self):
+        for context in self._contexts:
+            await context.close()
+        self._contexts = []
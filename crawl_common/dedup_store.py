@@ -0,0 +1,117 @@
+"""
+Persistent set of already-processed item keys (URL md5 hashes).
+Replaces the processed_*.json files that were rewritten in full after every
+item: keys live in an in-memory set for O(1) lookups and are appended to a
+SQLite table in WAL mode, committed in batches so a run does one fsync per
+batch instead of one full JSON rewrite per item. A crash loses at most the
+last uncommitted batch, never the whole file.
+
+One-time migration:
+    Passing legacy_json= imports an existing processed_*.json the first time
+    the store is opened. It can also be run by hand:
+        python -m crawl_common.dedup_store processed_vov.db processed_vov.json
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds
+
+
+class ProcessedStore:
+    """
+    Set-like store: `key in store`, `store.add(key)`, `len(store)`.
+    Call close() (or use it as a context manager) to commit the last batch.
+    """
+
+    def __init__(self, db_path, legacy_json=None, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL only fsyncs at checkpoints; committed batches survive a process crash
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS processed (key TEXT PRIMARY KEY)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS imports (path TEXT PRIMARY KEY, count INTEGER)")
+        self.conn.commit()
+
+        if legacy_json:
+            self.import_json(legacy_json)
+
+        self._keys = set(row[0] for row in self.conn.execute("SELECT key FROM processed"))
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def add(self, key):
+        if key in self._keys:
+            return
+        self._keys.add(key)
+        self.conn.execute("INSERT OR IGNORE INTO processed (key) VALUES (?)", (key,))
+        self._pending += 1
+        if self._pending >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Commits the pending batch."""
+        if self._pending:
+            self.conn.commit()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def import_json(self, json_path):
+        """Imports a legacy processed_*.json list once; returns the number of keys read."""
+        if not os.path.exists(json_path):
+            return 0
+        abs_path = os.path.abspath(json_path)
+        already = self.conn.execute("SELECT count FROM imports WHERE path = ?", (abs_path,)).fetchone()
+        if already:
+            return 0
+        try:
+            with open(json_path, "r") as f:
+                keys = json.load(f)
+        except Exception as e:
+            print(f"Could not import {json_path}: {e}")
+            return 0
+        self.conn.executemany("INSERT OR IGNORE INTO processed (key) VALUES (?)", ((k,) for k in keys))
+        self.conn.execute("INSERT INTO imports (path, count) VALUES (?, ?)", (abs_path, len(keys)))
+        self.conn.commit()
+        print(f"Imported {len(keys)} processed keys from {json_path} into {self.db_path}")
+        if hasattr(self, "_keys"):
+            self._keys.update(keys)
+        return len(keys)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m crawl_common.dedup_store <store.db> <processed.json> [more.json ...]")
+        sys.exit(1)
+    with ProcessedStore(sys.argv[1]) as store:
+        for path in sys.argv[2:]:
+            store.import_json(path)
+        print(f"{store.db_path}: {len(store)} keys")
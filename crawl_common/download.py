@@ -0,0 +1,128 @@
+"""
+Resumable media downloads.
+Fetches a remote file to `<dest>.part`, resuming with an HTTP Range request
+after a dropped connection instead of starting over. The size is checked
+against Content-Length / Content-Range (and an optional sha256), and the file
+is renamed to `dest` only once it is complete, so a file at `dest` is never
+truncated.
+
+Usage:
+    path = download_file(audio_url, "downloads_audio/.downloads/abc.mp3", headers=get_headers())
+"""
+
+import hashlib
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+from crawl_common.metrics import DOWNLOAD, default_metrics
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_RETRIES = 5
+DEFAULT_TIMEOUT = 60
+DEFAULT_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class DownloadError(Exception):
+    pass
+
+
+def _total_size(response, resumed_from):
+    """Full size of the remote file, from Content-Range on a 206 or Content-Length on a 200."""
+    content_range = response.headers.get("Content-Range")
+    if content_range:
+        match = re.search(r"/(\d+)\s*$", content_range)
+        if match:
+            return int(match.group(1))
+    length = response.headers.get("Content-Length")
+    if length is not None:
+        return int(length) + (resumed_from if response.status == 206 else 0)
+    return None
+
+
+def sha256_of(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fetch_once(url, part_path, headers, chunk_size, timeout):
+    """One attempt: resumes from the current .part size; returns the expected total size (or None)."""
+    have = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    request_headers = {"User-Agent": DEFAULT_USER_AGENT, **(headers or {})}
+    if have:
+        request_headers["Range"] = f"bytes={have}-"
+
+    request = urllib.request.Request(url, headers=request_headers)
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and have:
+            # Nothing left to fetch: the .part already holds the whole file
+            return have
+        raise
+
+    with response:
+        if have and response.status != 206:
+            # Server ignored the Range header; start over
+            have = 0
+        total = _total_size(response, have)
+        with open(part_path, "ab" if have else "wb") as f:
+            while True:
+                block = response.read(chunk_size)
+                if not block:
+                    break
+                f.write(block)
+    return total
+
+
+def download_file(url, dest_path, headers=None, expected_sha256=None, retries=DEFAULT_RETRIES,
+                  chunk_size=DEFAULT_CHUNK_SIZE, timeout=DEFAULT_TIMEOUT):
+    """Downloads url to dest_path (resuming any earlier .part); returns dest_path or raises DownloadError."""
+    if os.path.exists(dest_path):
+        return dest_path
+
+    host = urlsplit(url).netloc
+    with default_metrics.stage(DOWNLOAD, host, url=url):
+        _download(url, dest_path, headers, expected_sha256, retries, chunk_size, timeout)
+    default_metrics.inc("download_bytes_total", os.path.getsize(dest_path), host=host)
+    return dest_path
+
+
+def _download(url, dest_path, headers, expected_sha256, retries, chunk_size, timeout):
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    part_path = dest_path + ".part"
+    last_error = None
+
+    for attempt in range(1, retries + 1):
+        try:
+            total = _fetch_once(url, part_path, headers, chunk_size, timeout)
+        except Exception as e:
+            last_error = e
+            default_metrics.inc("download_retries_total", host=urlsplit(url).netloc)
+            print(f"  Download interrupted ({attempt}/{retries}) {url}: {e}")
+            time.sleep(min(2 ** attempt, 30))
+            continue
+
+        size = os.path.getsize(part_path)
+        if total is not None and size < total:
+            last_error = DownloadError(f"short read: {size}/{total} bytes")
+            print(f"  Download incomplete ({attempt}/{retries}) {url}: {size}/{total} bytes, resuming")
+            continue
+        if total is not None and size > total:
+            os.remove(part_path)
+            last_error = DownloadError(f"size mismatch: {size} > {total} bytes")
+            continue
+        if expected_sha256 and sha256_of(part_path) != expected_sha256:
+            os.remove(part_path)
+            raise DownloadError(f"checksum mismatch for {url}")
+
+        os.replace(part_path, dest_path)
+        return
+
+    raise DownloadError(f"giving up on {url} after {retries} attempts: {last_error}")
@@ -0,0 +1,139 @@
+"""
+Async HTTP fetch layer shared by the requests-based crawlers.
+One aiohttp session per run keeps TCP/TLS connections alive between requests,
+and a per-host semaphore caps how many requests hit the same site at once.
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from crawl_common.metrics import default_metrics
+from crawl_common.warc_archive import get_archive
+
+DEFAULT_PER_HOST_CONCURRENCY = 4
+DEFAULT_TOTAL_CONNECTIONS = 32
+DEFAULT_TIMEOUT = 30
+
+
+class FetchResponse:
+    """Fully-read HTTP response, safe to use after the connection is released."""
+
+    def __init__(self, status, url, headers, body, encoding="utf-8"):
+        self.status = status
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                None, (), status=self.status, message=f"HTTP {self.status} for {self.url}"
+            )
+
+
+class AsyncFetcher:
+    """
+    Pooled async HTTP client.
+    Usage:
+        async with AsyncFetcher(per_host_concurrency=4) as fetcher:
+            response = await fetcher.get(url, headers=get_headers())
+    With a rate_limiter (see rate_limiter.py) every request first waits for a
+    token for its host and then reports status/latency back to it.
+    url_rewrite maps the URL actually requested (e.g. onto the local mock
+    server in benchmarks/); limits, the rate limiter and response.url keep
+    using the crawler's own URL.
+    GET responses are written to the archive (see warc_archive.py; the one
+    set up by configure_archive() unless one is passed). In replay mode an
+    archived GET is answered from the archive without a request or a
+    rate limiter token.
+    """
+
+    def __init__(self, per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY,
+                 total_connections=DEFAULT_TOTAL_CONNECTIONS, timeout=DEFAULT_TIMEOUT,
+                 rate_limiter=None, url_rewrite=None, archive=None):
+        self.per_host_concurrency = per_host_concurrency
+        self.archive = archive
+        self.rate_limiter = rate_limiter
+        self.url_rewrite = url_rewrite
+        self.total_connections = total_connections
+        self.timeout = timeout
+        self.session = None
+        self._host_semaphores = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.total_connections,
+            limit_per_host=self.per_host_concurrency,
+            keepalive_timeout=60,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        self.session = None
+
+    def _semaphore_for(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_semaphores[host]
+
+    async def request(self, method, url, headers=None, json_payload=None, data=None):
+        """Performs one request and returns a FetchResponse with the body read."""
+        archive = self.archive or get_archive()
+        if archive is not None and archive.replay and method == "GET":
+            record = archive.get(url)
+            default_metrics.inc("archive_replay_total", host=urlsplit(url).netloc,
+                                outcome="hit" if record else "miss")
+            if record is not None:
+                return FetchResponse(record.status, url, record.headers, record.body, record.encoding)
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.wait_async(url)
+        target = self.url_rewrite(url) if self.url_rewrite else url
+        host = urlsplit(url).netloc
+        start = time.monotonic()
+        try:
+            async with self._semaphore_for(url):
+                async with self.session.request(method, target, headers=headers,
+                                                json=json_payload, data=data) as resp:
+                    body = await resp.read()
+                    response = FetchResponse(resp.status, url if self.url_rewrite else str(resp.url),
+                                             dict(resp.headers), body, resp.charset)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            default_metrics.inc("http_requests_total", host=host, status=type(e).__name__)
+            if self.rate_limiter is not None:
+                self.rate_limiter.record(url, error=True)
+            raise
+        latency = time.monotonic() - start
+        default_metrics.inc("http_requests_total", host=host, status=response.status)
+        default_metrics.observe("http_request_seconds", latency, host=host)
+        default_metrics.inc("http_response_bytes_total", len(response.body), host=host)
+        if self.rate_limiter is not None:
+            self.rate_limiter.record(url, status=response.status, latency=latency,
+                                     retry_after=response.headers.get("Retry-After"))
+        if archive is not None and method == "GET":
+            archive.write_response(url, response.status, response.headers, response.body)
+        return response
+
+    async def get(self, url, headers=None):
+        return await self.request("GET", url, headers=headers)
+
+    async def post_json(self, url, payload, headers=None):
+        return await self.request("POST", url, headers=headers, json_payload=payload)
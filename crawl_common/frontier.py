@@ -0,0 +1,313 @@
+"""
+Shared crawl frontier and scheduler.
+Instead of every script running its own page loop with its own
+crawler_state.json, sources are plugins that turn a task (a listing page or
+a detail page) into new tasks. One Scheduler runs all of them in a single
+process:
+
+  - pending tasks live in a SQLite checkpoint (WAL, batched commits like
+    dedup_store), so an interrupted run resumes where it stopped;
+  - tasks are kept per host and the next task is the lowest `priority`
+    value among hosts the rate limiter would let through right now, so a
+    slow or throttled host never holds up the others;
+  - a host never has more than `per_host_tasks` tasks in flight;
+  - a task that queued a transcode (SourcePlugin.transcode) stays pending
+    until the transcode finishes: done on success, retried on failure, and
+    requeued on the next run if the process stopped first.
+
+Lower priority values run first; plugins use the listing page number, so
+the newest items of every source are fetched before older pages.
+
+Usage:
+    frontier = Frontier("frontier.db")
+    async with AsyncFetcher(rate_limiter=default_limiter) as fetcher:
+        await Scheduler(frontier, [QdndMediaSource(), NhandanRadioSource()], fetcher, transcoder).run()
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import sqlite3
+import time
+
+from crawl_common.metrics import DETAIL_FETCH, LIST_FETCH, default_metrics
+from crawl_common.rate_limiter import default_limiter, host_of
+
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST_TASKS = 2
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_PENALTY = 10.0   # added to the priority of a task that failed
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 5.0   # seconds
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class Task:
+    """
+    One unit of work for a source plugin.
+    key identifies the task across runs; url decides which host it counts against.
+    Listing tasks are `refresh` tasks: adding one that is already done queues it
+    again, so each new pass re-reads the listings while finished details stay done.
+    """
+
+    def __init__(self, key, url, source, kind, priority=0.0, data=None, refresh=None):
+        self.key = key
+        self.url = url
+        self.source = source
+        self.kind = kind
+        self.priority = priority
+        self.data = data or {}
+        self.refresh = (kind == "listing") if refresh is None else refresh
+        self.attempts = 0
+        self.awaiting = False   # set by SourcePlugin.transcode: done/failed once the transcode finishes
+
+    def __repr__(self):
+        return f"Task({self.key!r}, priority={self.priority})"
+
+
+class SourcePlugin:
+    """
+    Base class for a crawl source. Subclasses set `name` and implement seeds()
+    and handle(); handle() returns the new tasks it discovered.
+    """
+
+    name = None
+
+    def start(self, transcoder):
+        """Called once before the first task; open stores here."""
+        self.transcoder = transcoder
+
+    def seeds(self):
+        return []
+
+    async def handle(self, fetcher, task):
+        raise NotImplementedError
+
+    async def transcode(self, task, item_key, source_url, output_path, *args, **kwargs):
+        """
+        Queues a transcode for task (waiting for a free slot if needed). The task
+        is only marked done once the file is written; a failed transcode retries it.
+        """
+        task.awaiting = True
+        return await self.transcoder.submit_async(source_url, output_path, *args,
+                                                  key=(self.name, item_key, task.key), **kwargs)
+
+    def on_transcoded(self, job):
+        """A transcode this plugin submitted through transcode() has finished; job.key is item_key again."""
+        pass
+
+    def close(self):
+        pass
+
+
+class Frontier:
+    def __init__(self, db_path, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending_writes = 0
+        self._last_flush = time.monotonic()
+        self._queues = {}          # host -> heap of (priority, seq, task)
+        self._seq = itertools.count()
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "key TEXT PRIMARY KEY, url TEXT, source TEXT, kind TEXT, priority REAL, data TEXT, "
+            "state TEXT, attempts INTEGER DEFAULT 0, error TEXT, updated REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, source)")
+        self.conn.commit()
+
+        # Resume: everything still pending from the last run goes back on the queues
+        rows = self.conn.execute(
+            "SELECT key, url, source, kind, priority, data, attempts FROM tasks WHERE state = ?", (PENDING,)
+        )
+        for key, url, source, kind, priority, data, attempts in rows:
+            task = Task(key, url, source, kind, priority, json.loads(data or "{}"))
+            task.attempts = attempts
+            self._push(task)
+
+    def _push(self, task):
+        heapq.heappush(self._queues.setdefault(host_of(task.url), []), (task.priority, next(self._seq), task))
+
+    def _written(self):
+        self._pending_writes += 1
+        if self._pending_writes >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def add(self, task):
+        """Queues a task unless it is already known; returns True if it was queued."""
+        row = self.conn.execute("SELECT state FROM tasks WHERE key = ?", (task.key,)).fetchone()
+        if row is not None and not (task.refresh and row[0] != PENDING):
+            return False
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tasks (key, url, source, kind, priority, data, state, attempts, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
+            (task.key, task.url, task.source, task.kind, task.priority,
+             json.dumps(task.data, ensure_ascii=False), PENDING, time.time())
+        )
+        self._push(task)
+        self._written()
+        return True
+
+    def has_pending(self, source):
+        for queue in self._queues.values():
+            if any(entry[2].source == source for entry in queue):
+                return True
+        return False
+
+    def pop_ready(self, limiter=default_limiter, in_flight=None, per_host_tasks=DEFAULT_PER_HOST_TASKS):
+        """
+        Returns (task, None) for the best task whose host can be hit now, or
+        (None, wait) with the seconds until some host frees up (wait is None
+        when the frontier is empty).
+        """
+        in_flight = in_flight or {}
+        best_host = None
+        wait = None
+        for host, queue in self._queues.items():
+            if not queue:
+                continue
+            if in_flight.get(host, 0) >= per_host_tasks:
+                wait = 0.1 if wait is None else min(wait, 0.1)
+                continue
+            delay = limiter.ready_in(queue[0][2].url) if limiter else 0.0
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            if best_host is None or queue[0][:2] < self._queues[best_host][0][:2]:
+                best_host = host
+        if best_host is None:
+            return None, wait
+        return heapq.heappop(self._queues[best_host])[2], None
+
+    def done(self, task):
+        self.conn.execute("UPDATE tasks SET state = ?, error = NULL, updated = ? WHERE key = ?",
+                          (DONE, time.time(), task.key))
+        self._written()
+
+    def retry(self, task, error, max_attempts=DEFAULT_MAX_ATTEMPTS, penalty=DEFAULT_RETRY_PENALTY):
+        """Requeues a failed task further back, or marks it failed after max_attempts."""
+        task.attempts += 1
+        if task.attempts >= max_attempts:
+            state = FAILED
+        else:
+            state = PENDING
+            task.priority += penalty
+            self._push(task)
+        self.conn.execute(
+            "UPDATE tasks SET state = ?, attempts = ?, priority = ?, error = ?, updated = ? WHERE key = ?",
+            (state, task.attempts, task.priority, str(error)[:500], time.time(), task.key)
+        )
+        self._written()
+        return state
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"))
+
+    def flush(self):
+        if self._pending_writes:
+            self.conn.commit()
+        self._pending_writes = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+class Scheduler:
+    def __init__(self, frontier, plugins, fetcher, transcoder=None, workers=DEFAULT_WORKERS,
+                 per_host_tasks=DEFAULT_PER_HOST_TASKS, limiter=default_limiter,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.frontier = frontier
+        self.plugins = {plugin.name: plugin for plugin in plugins}
+        self.fetcher = fetcher
+        self.transcoder = transcoder
+        self.workers = workers
+        self.per_host_tasks = per_host_tasks
+        self.limiter = limiter
+        self.max_attempts = max_attempts
+        self._in_flight = {}
+        self._active = 0
+        self._awaiting = {}    # task key -> task whose transcode has not finished yet
+
+    def _route_transcodes(self, jobs):
+        for job in jobs:
+            plugin = self.plugins.get(job.key[0]) if isinstance(job.key, tuple) else None
+            if plugin is None:
+                continue
+            task = self._awaiting.pop(job.key[2], None) if len(job.key) > 2 else None
+            # The plugin's stores are keyed by its own item key, not the routing tuple
+            job.key = job.key[1]
+            plugin.on_transcoded(job)
+            if task is None:
+                continue
+            if job.ok:
+                self.frontier.done(task)
+                default_metrics.inc("tasks_total", source=task.source, kind=task.kind, outcome="done")
+            else:
+                state = self.frontier.retry(task, f"transcode: {job.error}", self.max_attempts)
+                default_metrics.inc("tasks_total", source=task.source, kind=task.kind, outcome=state)
+                print(f"[{task.source}] {task.key} transcode failed ({state}): {job.error}")
+
+    async def _worker(self):
+        while True:
+            if self.transcoder is not None:
+                self._route_transcodes(self.transcoder.completed())
+            task, wait = self.frontier.pop_ready(self.limiter, self._in_flight, self.per_host_tasks)
+            if task is None:
+                # A failed transcode can still put its task back on the queue
+                if wait is None and self._active == 0 and not self._awaiting:
+                    return
+                await asyncio.sleep(min(wait or 0.2, 1.0))
+                continue
+
+            host = host_of(task.url)
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            self._active += 1
+            stage = LIST_FETCH if task.kind == "listing" else DETAIL_FETCH
+            try:
+                with default_metrics.stage(stage, host, source=task.source, key=task.key):
+                    new_tasks = await self.plugins[task.source].handle(self.fetcher, task)
+                for new_task in new_tasks or []:
+                    self.frontier.add(new_task)
+                if task.awaiting:
+                    # Stays pending in the checkpoint until _route_transcodes sees the job
+                    task.awaiting = False
+                    self._awaiting[task.key] = task
+                else:
+                    self.frontier.done(task)
+                    default_metrics.inc("tasks_total", source=task.source, kind=task.kind, outcome="done")
+            except Exception as e:
+                state = self.frontier.retry(task, e, self.max_attempts)
+                default_metrics.inc("tasks_total", source=task.source, kind=task.kind, outcome=state)
+                print(f"[{task.source}] {task.key} failed ({state}): {e}")
+            finally:
+                self._in_flight[host] -= 1
+                self._active -= 1
+
+    async def run(self):
+        for plugin in self.plugins.values():
+            plugin.start(self.transcoder)
+            # A source with nothing pending finished its last pass (or never ran): start a new one
+            if not self.frontier.has_pending(plugin.name):
+                for task in plugin.seeds():
+                    self.frontier.add(task)
+        try:
+            await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+        finally:
+            if self.transcoder is not None:
+                print(f"Waiting for {self.transcoder.pending} transcodes to finish...")
+                self._route_transcodes(self.transcoder.join())
+            self.frontier.flush()
+            for plugin in self.plugins.values():
+                plugin.close()
+            print(f"Frontier: {self.frontier.counts()}")
@@ -0,0 +1,223 @@
+"""
+On-disk HTTP response cache for listing pages.
+A restart (or an incremental run) re-requests listing pages whose links are
+all already processed. The cache keeps url -> body + ETag/Last-Modified +
+fetch time in SQLite (WAL, like dedup_store):
+
+  - within `ttl` seconds of the last fetch the cached body is used without
+    any request;
+  - after that the page is re-requested with If-None-Match/If-Modified-Since,
+    and a 304 reuses the cached body (and restarts the ttl);
+  - once the cached bodies exceed `max_bytes` the least recently used
+    entries are evicted.
+
+Three ways in:
+    cache = ResponseCache("listing_cache.db")
+    response = cache.fetch(url)                     # urllib, e.g. beside Selenium
+    cache_route(page, cache, lambda url: "/p/" in url)   # Playwright (sync) document requests
+    body = cache.lookup(url) ... cache.store(url, status, headers, body)   # anything else
+"""
+
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+import zlib
+
+from crawl_common.metrics import default_metrics
+from crawl_common.rate_limiter import host_of
+from crawl_common.warc_archive import get_archive
+
+DEFAULT_TTL = 300.0                    # seconds a cached listing is used without revalidating
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # compressed bodies kept before LRU eviction
+DEFAULT_TIMEOUT = 30
+DEFAULT_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+FRESH = "fresh"              # served from the cache, no request
+REVALIDATED = "revalidated"  # 304 Not Modified, cached body reused
+MISS = "miss"                # full 200 response, stored
+
+
+class CachedEntry:
+    def __init__(self, url, body, etag, last_modified, content_type, fetched_at):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+        self.fetched_at = fetched_at
+
+    def validators(self):
+        """Conditional request headers for this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class CachedResponse:
+    def __init__(self, url, status, body, content_type=None, outcome=MISS):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.outcome = outcome
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+
+def _header(headers, name):
+    """Case-insensitive lookup (urllib, aiohttp and Playwright spell header names differently)."""
+    name = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class ResponseCache:
+    def __init__(self, db_path, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, body BLOB, etag TEXT, "
+            "last_modified TEXT, content_type TEXT, fetched_at REAL, last_used REAL, size INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def lookup(self, url):
+        """The cached entry for url (fresh or not), or None."""
+        row = self.conn.execute(
+            "SELECT body, etag, last_modified, content_type, fetched_at FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute("UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+        body, etag, last_modified, content_type, fetched_at = row
+        return CachedEntry(url, zlib.decompress(body), etag, last_modified, content_type, fetched_at)
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry.fetched_at < self.ttl
+
+    def store(self, url, status, headers, body):
+        """Records a response: a 200 replaces the entry, a 304 refreshes it. Returns the outcome."""
+        now = time.time()
+        if status == 304:
+            self.conn.execute("UPDATE responses SET fetched_at = ?, last_used = ? WHERE url = ?", (now, now, url))
+            self.conn.commit()
+            return REVALIDATED
+        if status != 200:
+            return None
+
+        data = zlib.compress(body)
+        old = self.conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, content_type, fetched_at, "
+            "last_used, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, data, _header(headers, "ETag"), _header(headers, "Last-Modified"),
+             _header(headers, "Content-Type"), now, now, len(data))
+        )
+        self._size += len(data) - (old[0] if old else 0)
+        if self._size > self.max_bytes:
+            self.evict()
+        self.conn.commit()
+        return MISS
+
+    def evict(self, target=None):
+        """Drops least recently used entries until the cache is under target bytes (90% of max_bytes)."""
+        target = self.max_bytes * 0.9 if target is None else target
+        rows = self.conn.execute("SELECT url, size FROM responses ORDER BY last_used").fetchall()
+        evicted = []
+        for url, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((url,))
+            self._size -= size
+        self.conn.executemany("DELETE FROM responses WHERE url = ?", evicted)
+        self.conn.commit()
+        return len(evicted)
+
+    def _record(self, url, outcome):
+        default_metrics.inc("http_cache_total", host=host_of(url), outcome=outcome)
+
+    def fetch(self, url, headers=None, timeout=DEFAULT_TIMEOUT, limiter=None):
+        """GET through the cache with urllib; returns a CachedResponse (raises on network errors)."""
+        entry = self.lookup(url)
+        if self.is_fresh(entry):
+            self._record(url, FRESH)
+            return CachedResponse(url, 200, entry.body, entry.content_type, FRESH)
+
+        request_headers = {"User-Agent": DEFAULT_USER_AGENT, **(headers or {})}
+        if entry is not None:
+            request_headers.update(entry.validators())
+        if limiter is not None:
+            limiter.wait(url)
+        request = urllib.request.Request(url, headers=request_headers)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                status, response_headers, body = response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            if e.code != 304 or entry is None:
+                raise
+            status, response_headers, body = 304, dict(e.headers), b""
+
+        outcome = self.store(url, status, response_headers, body)
+        self._record(url, outcome)
+        if outcome == MISS and get_archive() is not None:
+            get_archive().write_response(url, status, response_headers, body)
+        if outcome == REVALIDATED:
+            return CachedResponse(url, 200, entry.body, entry.content_type, REVALIDATED)
+        return CachedResponse(url, status, body, _header(response_headers, "Content-Type"), MISS)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def cache_route(target, cache, should_cache):
+    """
+    Serves matching top-level document GETs of a Playwright (sync) page or
+    context from the cache, revalidating with a conditional request; everything
+    else falls through to the routes installed before (e.g. resource blocking).
+    """
+    def handle(route):
+        request = route.request
+        if request.method != "GET" or request.resource_type != "document" or not should_cache(request.url):
+            route.fallback()
+            return
+        url = request.url
+        entry = cache.lookup(url)
+        if cache.is_fresh(entry):
+            cache._record(url, FRESH)
+            route.fulfill(status=200, body=entry.body, content_type=entry.content_type or "text/html")
+            return
+
+        response = route.fetch(headers={**request.headers, **(entry.validators() if entry else {})})
+        if response.status == 304 and entry is not None:
+            cache._record(url, cache.store(url, 304, response.headers, b""))
+            route.fulfill(status=200, body=entry.body, content_type=entry.content_type or "text/html")
+            return
+        body = response.body()
+        outcome = cache.store(url, response.status, response.headers, body)
+        if outcome:
+            cache._record(url, outcome)
+        route.fulfill(response=response, body=body)
+
+    target.route("**/*", handle)
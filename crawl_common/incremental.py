@@ -0,0 +1,120 @@
+"""
+Incremental recrawl of newest-first listings.
+A full pass walks every listing page (resuming from last_page); once one has
+reached the end, later runs only need what was published since. An
+incremental pass starts at the first page and stops after a page whose links
+are all already processed, or after a page that reached items older than the
+date watermark (the newest item date seen by the last finished pass).
+
+State lives in the crawler's existing JSON state file next to last_page:
+    backfill_done      a full pass has reached the last page
+    watermark          newest item date of the last finished pass (ISO)
+    incremental_page   deepest page an interrupted incremental pass finished;
+                       the next pass does not stop on known pages up to it,
+                       so new items behind the interruption are not skipped
+
+Usage:
+    incremental = IncrementalCrawl("crawler_state.json")
+    page = 1 if incremental.active else load_state()
+    ...
+    incremental.seen(article_date)
+    if incremental.should_stop(page, links, processed_urls):
+        break
+    ...
+    incremental.finish()
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+
+DATE_RE = re.compile(r"(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})(?:\D{1,5}(\d{1,2})[:h](\d{2}))?")
+
+
+def parse_date(text):
+    """Parses dd/mm/yyyy [hh:mm] out of free text (or an ISO string); None if there is no date."""
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    match = DATE_RE.search(text)
+    if not match:
+        return None
+    day, month, year, hour, minute = match.groups()
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0))
+    except ValueError:
+        return None
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def update_state(path, **values):
+    """Merges values into the JSON state file, keeping keys written by others (last_page)."""
+    state = load_state(path)
+    for key, value in values.items():
+        if value is None:
+            state.pop(key, None)
+        else:
+            state[key] = value
+    with open(path, "w") as f:
+        json.dump(state, f)
+    return state
+
+
+class IncrementalCrawl:
+    def __init__(self, state_path, enabled=True):
+        self.state_path = state_path
+        state = load_state(state_path)
+        self.backfill_done = bool(state.get("backfill_done"))
+        self.watermark = parse_date(state.get("watermark"))
+        self.resume_page = state.get("incremental_page")
+        # Until a full pass has finished, "all known" only means an earlier run got this far
+        self.active = enabled and self.backfill_done
+        self.newest = None
+        self._reached_watermark = False
+
+    def seen(self, date_text):
+        """Records the date of an item; returns True if it is older than the watermark."""
+        date = parse_date(date_text)
+        if date is None:
+            return False
+        if self.newest is None or date > self.newest:
+            self.newest = date
+        if self.watermark is not None and date < self.watermark:
+            self._reached_watermark = True
+            return True
+        return False
+
+    def should_stop(self, page_num, links, processed):
+        """Called after a page is done; True if an incremental pass can stop here."""
+        if not self.active:
+            return False
+        if self._reached_watermark:
+            print(f"  Reached watermark {self.watermark:%d/%m/%Y %H:%M} on page {page_num}. Stopping.")
+            return True
+        past_resume = self.resume_page is None or page_num > self.resume_page
+        if links and past_resume and all(link in processed for link in links):
+            print(f"  Every item on page {page_num} is already processed. Stopping.")
+            return True
+        update_state(self.state_path, incremental_page=max(page_num, self.resume_page or 0))
+        return False
+
+    def finish(self):
+        """A pass ended cleanly (stopped early or reached the last page): advance the watermark."""
+        watermark = self.watermark
+        if self.newest is not None and (watermark is None or self.newest > watermark):
+            watermark = self.newest
+        update_state(self.state_path, backfill_done=True, incremental_page=None,
+                     watermark=watermark.isoformat() if watermark else None)
@@ -0,0 +1,87 @@
+"""
+Direct pagination of "Xem thêm" (load more) listings.
+The load-more button on these sites only requests the next chunk of items
+and appends it to the page. Calling that endpoint with plain HTTP returns the
+same items without a browser, scroll waits or a DOM that grows with every
+click, and each chunk can be handed to the caller as soon as it arrives.
+
+Usage:
+    async with AsyncFetcher(rate_limiter=default_limiter) as fetcher:
+        async for page, urls in iter_load_more(fetcher, page_url, "h3 a", accept):
+            all_urls.update(urls)
+"""
+
+import json
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+DEFAULT_MAX_PAGES = 1000
+
+
+def _html_of(response):
+    """Body as HTML; endpoints that wrap the fragment in JSON get their string fields joined."""
+    text = response.text
+    if not text.lstrip().startswith(("{", "[")):
+        return text
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text
+
+    parts = []
+
+    def walk(value):
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, dict):
+            for v in value.values():
+                walk(v)
+        elif isinstance(value, list):
+            for v in value:
+                walk(v)
+
+    walk(data)
+    return "\n".join(parts)
+
+
+def extract_links(html, base_url, selector="a[href]", accept=None):
+    """Absolute, de-duplicated hrefs of `selector` matches that pass `accept`."""
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
+    for a in soup.select(selector):
+        href = a.get("href")
+        if not href or href.startswith(("javascript", "#")):
+            continue
+        url = urljoin(base_url, href)
+        if accept and not accept(url):
+            continue
+        if url not in links:
+            links.append(url)
+    return links
+
+
+async def iter_load_more(fetcher, page_url, selector="a[href]", accept=None, start_page=1,
+                         max_pages=DEFAULT_MAX_PAGES, headers=None):
+    """
+    Fetches page_url(1), page_url(2), ... and yields (page, new_urls) for each
+    chunk. Stops at a 404, a request error or the first chunk that adds no new
+    URLs (also covers endpoints that ignore the page number and repeat page 1).
+    """
+    seen = set()
+    for page in range(start_page, start_page + max_pages):
+        url = page_url(page)
+        try:
+            response = await fetcher.get(url, headers=headers)
+            if response.status == 404:
+                break
+            response.raise_for_status()
+        except Exception as e:
+            print(f"  Error loading {url}: {e}")
+            break
+
+        new_urls = [u for u in extract_links(_html_of(response), url, selector, accept) if u not in seen]
+        if not new_urls:
+            break
+        seen.update(new_urls)
+        yield page, new_urls
@@ -0,0 +1,145 @@
+"""
+Network-level capture of audio/video URLs for Selenium (Chrome) pages.
+Instead of sleeping a fixed 2-4s and regex-scanning <script> tags and
+driver.page_source, Chrome's performance log is read while the page loads
+and the first media request/response (audio/*, video/mp4, HLS playlists) is
+returned as soon as the player fetches it.
+
+Usage:
+    options = webdriver.ChromeOptions()
+    enable_network_capture(options)
+    driver = webdriver.Chrome(options=options)
+
+    clear_network_log(driver)
+    driver.get(url)
+    media_url = capture_media_url(driver, timeout=6)
+
+Scripts that read the URL from the DOM instead (audio_capture "dom") are
+polled with wait_for_script_result until the player has filled it in.
+"""
+
+import json
+import time
+from urllib.parse import urlsplit
+
+MEDIA_MIME_PREFIXES = ("audio/", "video/mp4", "application/vnd.apple.mpegurl", "application/x-mpegurl")
+MEDIA_EXTENSIONS = (".mp3", ".m4a", ".aac", ".wav", ".mp4", ".m3u8")
+
+# Direct player state; cheap once the page has loaded, and catches players with
+# preload="none" that never issue a media request on their own
+MEDIA_ELEMENT_SCRIPT = """
+    if (typeof jwplayer !== 'undefined') {
+        try {
+            var playlist = jwplayer().getPlaylist();
+            if (playlist && playlist[0] && playlist[0].sources && playlist[0].sources[0]) {
+                return playlist[0].sources[0].file;
+            }
+        } catch(e) {}
+    }
+    var elem = document.querySelector('audio[src], video[src], audio source[src], video source[src]');
+    return elem ? elem.src : null;
+"""
+
+DEFAULT_TIMEOUT = 6.0        # seconds to wait for the player to request media
+DEFAULT_POLL_INTERVAL = 0.2
+
+
+def enable_network_capture(options):
+    """Turns on Chrome's performance log (Network.* events) for a ChromeOptions."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def clear_network_log(driver):
+    """Drops buffered events so a capture only sees the next page's requests."""
+    try:
+        driver.get_log("performance")
+    except Exception:
+        pass
+
+
+def is_media(url, mime_type=None, resource_type=None):
+    if not url or not url.startswith("http"):
+        return False
+    if resource_type == "Media":
+        return True
+    if mime_type and mime_type.lower().startswith(MEDIA_MIME_PREFIXES):
+        return True
+    return urlsplit(url).path.lower().endswith(MEDIA_EXTENSIONS)
+
+
+def media_url_from_event(message):
+    """Returns the media URL carried by one performance-log message, or None."""
+    method = message.get("method")
+    params = message.get("params", {})
+    if method == "Network.responseReceived":
+        response = params.get("response", {})
+        if is_media(response.get("url"), response.get("mimeType"), params.get("type")):
+            return response.get("url")
+    elif method == "Network.requestWillBeSent":
+        # Media elements may start a range request before any response arrives
+        request = params.get("request", {})
+        if params.get("type") == "Media" and is_media(request.get("url"), resource_type="Media"):
+            return request.get("url")
+    return None
+
+
+def poll_media_url(driver):
+    """Reads the events buffered since the last call; returns the first media URL seen."""
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        url = media_url_from_event(message)
+        if url:
+            return url
+    return None
+
+
+def wait_for_media_url(driver, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Polls the performance log until a media request shows up or `timeout` expires."""
+    deadline = time.monotonic() + timeout
+    while True:
+        url = poll_media_url(driver)
+        if url:
+            return url
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(poll_interval)
+
+
+def media_element_url(driver):
+    try:
+        return driver.execute_script(MEDIA_ELEMENT_SCRIPT)
+    except Exception:
+        return None
+
+
+def wait_for_script_result(driver, script, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Runs script until it returns a value (the player sets its source some time
+    after the page loads) or `timeout` expires; None on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = driver.execute_script(script)
+        except Exception:
+            result = None
+        if result:
+            return result
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(poll_interval)
+
+
+def capture_media_url(driver, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Media URL of the page just loaded: a media request already in the log,
+    else the player element's src, else whatever media request arrives
+    within `timeout`.
+    """
+    return (poll_media_url(driver)
+            or media_element_url(driver)
+            or wait_for_media_url(driver, timeout, poll_interval))
@@ -0,0 +1,276 @@
+"""
+Per-stage counters and latency histograms for a crawl run.
+Stages (list_fetch, detail_fetch, resolve, download, transcode, save) are
+timed with `stage()`, labelled by host, and counted by outcome; the shared
+fetch/download/transcode/shard layers report on their own, so most scripts
+only need to call configure_metrics() once.
+
+While the run is going the numbers are available as:
+  - a Prometheus text endpoint (metrics_port; /metrics, and /metrics.json),
+  - a JSON snapshot rewritten every metrics_interval seconds (metrics_snapshot),
+  - structured JSON log lines, one per finished stage (json_log).
+
+Each comes from a pipeline_config.json key or, for scripts without one,
+the environment (CRAWL_METRICS_PORT, CRAWL_METRICS_SNAPSHOT, CRAWL_JSON_LOG).
+Worker processes (e.g. the sharded VBPL crawl) call configure_metrics(worker=N)
+and report on their own files and port.
+
+Usage:
+    configure_metrics(CONFIG)
+    with default_metrics.stage("resolve", host_of(url)) as span:
+        audio_url = extract_audio_from_page(driver, url)
+        if not audio_url:
+            span.fail("no audio")
+    default_metrics.inc("items_total", source="chinhphu", outcome="skip")
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LIST_FETCH = "list_fetch"
+DETAIL_FETCH = "detail_fetch"
+RESOLVE = "resolve"
+DOWNLOAD = "download"
+TRANSCODE = "transcode"
+SAVE = "save"
+
+PREFIX = "crawl_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+DEFAULT_SNAPSHOT_INTERVAL = 30.0  # seconds
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (Prometheus-style estimate)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Span:
+    """Handed out by Metrics.stage(); call fail() to count the stage as failed without raising."""
+
+    def __init__(self):
+        self.outcome = "ok"
+        self.reason = None
+
+    def fail(self, reason=None):
+        self.outcome = "fail"
+        self.reason = reason
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._log_stream = None
+        self._log_lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def stage(self, stage, host=None, **fields):
+        """Times the block as `stage` for host; exceptions count as outcome=error and propagate."""
+        span = Span()
+        start = time.monotonic()
+        try:
+            yield span
+        except BaseException as e:
+            span.outcome = "error"
+            span.reason = span.reason or f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            self.observe("stage_seconds", elapsed, stage=stage, host=host)
+            self.inc("stage_total", stage=stage, host=host, outcome=span.outcome)
+            self.log("stage", stage=stage, host=host, outcome=span.outcome, seconds=round(elapsed, 4),
+                     reason=span.reason, **fields)
+
+    # --- structured log -------------------------------------------------
+
+    def enable_json_log(self, path_or_stream):
+        """Writes one JSON object per event to a file path (appended) or an open stream."""
+        if isinstance(path_or_stream, str):
+            path_or_stream = open(path_or_stream, "a", buffering=1, encoding="utf-8")
+        self._log_stream = path_or_stream
+
+    def log(self, event, **fields):
+        if self._log_stream is None:
+            return
+        record = {"ts": round(time.time(), 3), "event": event}
+        record.update((k, v) for k, v in fields.items() if v is not None)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._log_lock:
+            self._log_stream.write(line + "\n")
+
+    # --- export ---------------------------------------------------------
+
+    def snapshot(self):
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), "count": h.count, "sum": round(h.sum, 4),
+                           "mean": round(h.sum / h.count, 4) if h.count else None,
+                           "p50": h.quantile(0.5), "p99": h.quantile(0.99)}
+                          for (name, labels), h in sorted(self._histograms.items())]
+        return {"ts": round(time.time(), 3), "uptime": round(time.time() - self.started, 1),
+                "counters": counters, "histograms": histograms}
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            counter_names = sorted({name for name, _ in self._counters})
+            for name in counter_names:
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+            histogram_names = sorted({name for name, _ in self._histograms})
+            for name in histogram_names:
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (n, labels), h in sorted(self._histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {h.count}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {h.sum:.6f}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path):
+        tmp_path = path + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def start_snapshots(self, path, interval=DEFAULT_SNAPSHOT_INTERVAL):
+        """Rewrites the JSON snapshot at path every interval seconds, and once more at exit."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot(path)
+                except Exception as e:
+                    print(f"Metrics snapshot failed: {e}")
+
+        threading.Thread(target=run, daemon=True, name="metrics-snapshot").start()
+        atexit.register(self.write_snapshot, path)
+
+    def serve_http(self, port, host="0.0.0.0"):
+        """Serves /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json"
+                elif self.path.startswith("/metrics"):
+                    body = registry.prometheus_text().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+        print(f"Metrics at http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+default_metrics = Metrics()
+
+
+def _worker_path(path, worker):
+    """path with -w<N> before the extension: one file per worker process."""
+    root, ext = os.path.splitext(path)
+    return f"{root}-w{worker}{ext}"
+
+
+def configure_metrics(config=None, metrics=default_metrics, worker=None):
+    """
+    Turns on the outputs named in config (pipeline_config.json keys) or the environment.
+    A worker process of a parallel run passes its index: it writes its own
+    <snapshot>-w<N> / <json_log>-w<N> files and serves on port + 1 + N.
+    """
+    config = config or {}
+    port = config.get("metrics_port") or os.environ.get("CRAWL_METRICS_PORT")
+    snapshot = config.get("metrics_snapshot") or os.environ.get("CRAWL_METRICS_SNAPSHOT")
+    json_log = config.get("json_log") or os.environ.get("CRAWL_JSON_LOG")
+    if worker is not None:
+        snapshot = snapshot and _worker_path(snapshot, worker)
+        json_log = json_log if json_log in (None, "", "-") else _worker_path(json_log, worker)
+        port = port and int(port) + 1 + worker
+    if json_log:
+        metrics.enable_json_log(sys.stderr if json_log == "-" else json_log)
+    if snapshot:
+        metrics.start_snapshots(snapshot, float(config.get("metrics_interval") or DEFAULT_SNAPSHOT_INTERVAL))
+    if port:
+        try:
+            metrics.serve_http(int(port))
+        except OSError as e:
+            print(f"Metrics endpoint unavailable on port {port}: {e}")
+    return metrics
@@ -0,0 +1,251 @@
+"""
+Content-level near-duplicate detection for crawled articles (MinHash + LSH).
+The text crawlers dedupe by URL only, so an article reposted under another
+slug or category was stored twice. Each article is reduced to a MinHash
+signature of its word 5-gram shingles. The signature is split into LSH
+bands, and each band is hashed to a bucket in a SQLite index (WAL, batched
+commits like dedup_store). A lookup is one indexed IN query over the bands
+plus a signature comparison for the few candidates found, so it stays
+sub-millisecond at millions of documents. A match is recorded as an alias
+of the article already stored instead of a second copy.
+
+With the defaults (128 permutations, 16 bands of 8 rows) pairs with Jaccard
+similarity above ~0.7 become candidates, and a candidate counts as a
+duplicate when its estimated similarity reaches `threshold` (0.8).
+
+Usage:
+    index = NearDuplicateIndex("crawled_data/near_dup.db")
+    signature = index.signature(content)
+    match = index.find(signature)
+    if match:
+        index.add_alias(url, *match)
+    else:
+        save(...)
+        index.add(url, signature)
+
+Existing shards can be indexed once with:
+    python -m crawl_common.near_dup crawled_data/near_dup.db crawled_data/shards
+"""
+
+import hashlib
+import random
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_SEED = 1
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MASK_64 = (1 << 64) - 1
+_MASK_32 = (1 << 32) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text, size=DEFAULT_SHINGLE_SIZE):
+    """Set of 32-bit hashes of the word n-grams of text (NFC, lowercased)."""
+    words = _WORD_RE.findall(unicodedata.normalize("NFC", text).lower())
+    if not words:
+        return set()
+    if len(words) < size:
+        grams = [" ".join(words)]
+    else:
+        grams = (" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams}
+
+
+class MinHasher:
+    """num_perm universal hashes (a*x + b mod 2^61-1); numpy if available, same values without it."""
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=DEFAULT_SEED):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.randint(1, _MERSENNE_PRIME - 1) for _ in range(num_perm)]
+        self.b = [rng.randint(0, _MERSENNE_PRIME - 1) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)
+            self._b = np.array(self.b, dtype=np.uint64)
+
+    def signature(self, hashes):
+        """Signature bytes (num_perm little-endian uint32), or None for an empty shingle set."""
+        if not hashes:
+            return None
+        if np is not None:
+            x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[:, None]
+            # uint64 wraps around like the & _MASK_64 below
+            values = ((x * self._a + self._b) % np.uint64(_MERSENNE_PRIME)) & np.uint64(_MASK_32)
+            return values.min(axis=0).astype("<u4").tobytes()
+        signature = array("I", (
+            min((((a * x + b) & _MASK_64) % _MERSENNE_PRIME) & _MASK_32 for x in hashes)
+            for a, b in zip(self.a, self.b)
+        ))
+        if sys.byteorder != "little":
+            signature.byteswap()
+        return signature.tobytes()
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity: the fraction of equal MinHash values."""
+    if np is not None:
+        a = np.frombuffer(sig_a, dtype="<u4")
+        b = np.frombuffer(sig_b, dtype="<u4")
+        return float(np.count_nonzero(a == b)) / len(a)
+    a, b = array("I", sig_a), array("I", sig_b)
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class NearDuplicateIndex:
+    def __init__(self, db_path, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS,
+                 shingle_size=DEFAULT_SHINGLE_SIZE, threshold=DEFAULT_THRESHOLD, seed=DEFAULT_SEED,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.db_path = db_path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.hasher = MinHasher(num_perm, seed)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, key TEXT UNIQUE, signature BLOB)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER, doc_id INTEGER, "
+                          "PRIMARY KEY (bucket, doc_id)) WITHOUT ROWID")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS aliases (key TEXT PRIMARY KEY, canonical TEXT, similarity REAL)")
+        self._check_params({"num_perm": num_perm, "bands": bands, "shingle_size": shingle_size, "seed": seed})
+        self.conn.commit()
+
+    def _check_params(self, params):
+        """Signatures from different parameters are not comparable: refuse to mix them."""
+        stored = dict(self.conn.execute("SELECT name, value FROM meta"))
+        if stored and stored != {k: str(v) for k, v in params.items()}:
+            raise ValueError(f"{self.db_path} was built with {stored}, not {params}")
+        self.conn.executemany("INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)",
+                              ((k, str(v)) for k, v in params.items()))
+
+    def signature(self, text):
+        return self.hasher.signature(shingles(text, self.shingle_size))
+
+    def _buckets(self, signature):
+        width = self.rows * 4
+        return [int.from_bytes(hashlib.blake2b(bytes([band]) + signature[band * width:(band + 1) * width],
+                                               digest_size=8).digest(), "little", signed=True)
+                for band in range(self.bands)]
+
+    def find(self, signature):
+        """(key, similarity) of the most similar indexed document at or above threshold, else None."""
+        if signature is None:
+            return None
+        buckets = self._buckets(signature)
+        rows = self.conn.execute(
+            "SELECT key, signature FROM docs WHERE id IN "
+            f"(SELECT doc_id FROM buckets WHERE bucket IN ({','.join('?' * len(buckets))}))",
+            buckets
+        )
+        best = None
+        for key, candidate in rows:
+            score = similarity(signature, candidate)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def add(self, key, signature):
+        """Indexes a stored document under key (its URL)."""
+        if signature is None:
+            return
+        cursor = self.conn.execute("INSERT OR IGNORE INTO docs (key, signature) VALUES (?, ?)", (key, signature))
+        if cursor.rowcount:
+            self.conn.executemany("INSERT OR IGNORE INTO buckets (bucket, doc_id) VALUES (?, ?)",
+                                  ((bucket, cursor.lastrowid) for bucket in self._buckets(signature)))
+        self._written()
+
+    def add_alias(self, key, canonical, similarity):
+        """Records key as a near-duplicate of the stored document canonical."""
+        self.conn.execute("INSERT OR REPLACE INTO aliases (key, canonical, similarity) VALUES (?, ?, ?)",
+                          (key, canonical, similarity))
+        self._written()
+
+    def canonical(self, key):
+        """The stored document key is an alias of, or key itself."""
+        row = self.conn.execute("SELECT canonical FROM aliases WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else key
+
+    def __contains__(self, key):
+        return self.conn.execute("SELECT 1 FROM docs WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Commits the pending batch."""
+        if self._pending:
+            self.conn.commit()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def index_shards(index, shard_dir):
+    """Indexes every record of a shard directory (key = url); near-duplicates become aliases."""
+    from crawl_common.shard_writer import iter_records
+
+    added = aliased = 0
+    for record in iter_records(shard_dir):
+        key = record.get("url")
+        if not key or key in index:
+            continue
+        signature = index.signature(record.get("content", ""))
+        match = index.find(signature)
+        if match:
+            index.add_alias(key, *match)
+            aliased += 1
+        else:
+            index.add(key, signature)
+            added += 1
+    index.flush()
+    print(f"Indexed {added} articles from {shard_dir} ({aliased} near-duplicates)")
+    return added, aliased
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m crawl_common.near_dup <index.db> <shard_dir> [more shard dirs ...]")
+        sys.exit(1)
+    with NearDuplicateIndex(sys.argv[1]) as index:
+        for shard_dir in sys.argv[2:]:
+            index_shards(index, shard_dir)
+        print(f"{index.db_path}: {len(index)} documents")
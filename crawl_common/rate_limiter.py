@@ -0,0 +1,170 @@
+"""
+Per-host adaptive rate limiter (token bucket + AIMD).
+Replaces the fixed `time.sleep(random.uniform(a, b))` calls between items and
+pages. Each host gets its own bucket whose refill rate (requests/second):
+  - grows additively while responses are fast and healthy,
+  - shrinks multiplicatively on 429/503, timeouts and connection errors
+    (and honours Retry-After),
+  - shrinks gently when latency climbs above the target.
+
+Usage (sync, e.g. Selenium/Playwright sync API):
+    limiter.call(url, lambda: driver.get(url))
+
+Usage (async, e.g. Playwright async API):
+    response = await limiter.call_async(url, lambda: page.goto(url))
+
+AsyncFetcher takes a limiter directly and records every response itself.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_INITIAL_RATE = 0.5    # requests per second per host
+DEFAULT_MIN_RATE = 0.05       # never slower than one request every 20s
+DEFAULT_MAX_RATE = 4.0
+DEFAULT_BURST = 2             # tokens a quiet host may accumulate
+DEFAULT_INCREASE = 0.05       # additive increase per healthy response
+DEFAULT_BACKOFF = 0.5         # multiplicative decrease on 429/503/errors
+DEFAULT_SLOW_BACKOFF = 0.85   # multiplicative decrease when latency is high
+DEFAULT_LATENCY_TARGET = 3.0  # seconds
+DEFAULT_COOLDOWN = 30.0       # pause after a 429/503 without Retry-After
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def host_of(url):
+    return urlsplit(url).netloc or url
+
+
+def _status_of(result):
+    """HTTP status of a Playwright Response; Selenium's driver.get() returns None."""
+    status = getattr(result, "status", None)
+    return status if isinstance(status, int) else None
+
+
+class _HostState:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.cooldown_until = 0.0
+
+
+class HostRateLimiter:
+    def __init__(self, initial_rate=DEFAULT_INITIAL_RATE, min_rate=DEFAULT_MIN_RATE,
+                 max_rate=DEFAULT_MAX_RATE, burst=DEFAULT_BURST, increase=DEFAULT_INCREASE,
+                 backoff=DEFAULT_BACKOFF, slow_backoff=DEFAULT_SLOW_BACKOFF,
+                 latency_target=DEFAULT_LATENCY_TARGET, cooldown=DEFAULT_COOLDOWN, jitter=0.1):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.backoff = backoff
+        self.slow_backoff = slow_backoff
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.jitter = jitter
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(self.initial_rate, self.burst)
+            self._hosts[host] = state
+        return state
+
+    def _reserve(self, url):
+        """Takes one token for the host and returns how long the caller must wait for it."""
+        with self._lock:
+            state = self._state(host_of(url))
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.last_refill) * state.rate)
+            state.last_refill = now
+            # Tokens may go negative: concurrent callers queue up behind each other
+            state.tokens -= 1
+            delay = 0.0 if state.tokens >= 0 else -state.tokens / state.rate
+            delay = max(delay, state.cooldown_until - now)
+        if delay > 0 and self.jitter:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+    def ready_in(self, url):
+        """Seconds until the host has a token, without taking one (0.0 if it can go now)."""
+        with self._lock:
+            state = self._hosts.get(host_of(url))
+            if state is None:
+                return 0.0
+            now = time.monotonic()
+            tokens = min(self.burst, state.tokens + (now - state.last_refill) * state.rate)
+            delay = 0.0 if tokens >= 1 else (1 - tokens) / state.rate
+            return max(delay, state.cooldown_until - now)
+
+    def wait(self, url):
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def wait_async(self, url):
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def call(self, url, load):
+        """Runs load() (a page load for url) under the limiter and records its outcome."""
+        self.wait(url)
+        start = time.monotonic()
+        try:
+            result = load()
+        except Exception:
+            self.record(url, error=True)
+            raise
+        self.record(url, status=_status_of(result), latency=time.monotonic() - start)
+        return result
+
+    async def call_async(self, url, load):
+        """Async version of call(): load() returns an awaitable."""
+        await self.wait_async(url)
+        start = time.monotonic()
+        try:
+            result = await load()
+        except Exception:
+            self.record(url, error=True)
+            raise
+        self.record(url, status=_status_of(result), latency=time.monotonic() - start)
+        return result
+
+    def record(self, url, status=None, latency=None, error=False, retry_after=None):
+        """Feeds the outcome of one request back into the host's rate."""
+        with self._lock:
+            state = self._state(host_of(url))
+            if error or status in THROTTLE_STATUSES:
+                state.rate = max(self.min_rate, state.rate * self.backoff)
+                if status in THROTTLE_STATUSES:
+                    pause = self.cooldown
+                    if retry_after:
+                        try:
+                            pause = float(retry_after)
+                        except ValueError:
+                            pass
+                    state.cooldown_until = max(state.cooldown_until, time.monotonic() + pause)
+                # Drop saved-up tokens so the slowdown takes effect immediately
+                state.tokens = min(state.tokens, 0)
+            elif latency is not None and latency > self.latency_target:
+                state.rate = max(self.min_rate, state.rate * self.slow_backoff)
+            elif status is None or status < 400:
+                state.rate = min(self.max_rate, state.rate + self.increase)
+
+    def rate(self, url):
+        with self._lock:
+            return self._state(host_of(url)).rate
+
+
+# Process-wide instance shared by everything that talks to the same hosts
+default_limiter = HostRateLimiter()
@@ -0,0 +1,243 @@
+"""
+Offline reprocessing of a crawled shard corpus into a new corpus version.
+Cleaning, metadata inference and normalization otherwise only happen inline
+in the crawl loop, so a rule change in text_clean.SITE_RULES needed a recrawl.
+This reruns them over the stored documents instead:
+
+  - the source index.db gives the latest (shard, offset, length) of every
+    key, so a document rewritten later is processed once, in its last version;
+  - the parent process only reads raw record bytes and queues them in chunks
+    of `chunk_size` records (a work unit);
+  - `workers` spawned processes decode, run `process(record)` and append the
+    result to their own shard-w<N> files in the destination directory (the
+    destination index is shared, as in a sharded VBPL crawl);
+  - dst/reprocess.json records the source, counts and timing of the run.
+
+The source is never modified; compare versions, then point SHARD_DIR at the new one.
+
+Usage:
+    python -m crawl_common.reprocess crawled_data/shards crawled_data/shards-v2 [--workers 8]
+    reprocess(src_dir, dst_dir, process=functools.partial(process_record, infer=INFER_FIELDS))
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import queue
+import time
+from urllib.parse import urlsplit
+
+from crawl_common.shard_writer import DEFAULT_MAX_BYTES, ShardWriter, _decode, _open_index, list_shards
+from crawl_common.text_clean import cleaner_for, infer_fields, normalize_text
+
+DEFAULT_CHUNK_SIZE = 500
+PROGRESS_INTERVAL = 5.0  # seconds
+MANIFEST_FILE = "reprocess.json"
+
+
+_cleaners = {}
+
+
+def _cleaner_for_url(url):
+    """cleaner_for by host, memoized (None for sites without rules)."""
+    host = urlsplit(url).netloc
+    if host not in _cleaners:
+        try:
+            _cleaners[host] = cleaner_for(host) if host else None
+        except KeyError:
+            _cleaners[host] = None
+    return _cleaners[host]
+
+
+def process_record(record, infer=None, normalize=True):
+    """
+    The default per-document pipeline: the site's cleaning rules (by the URL of
+    the record), normalize_text and, with infer, infer_fields. Returns a new record.
+    """
+    record = dict(record)
+    content = record.get("content") or ""
+    cleaner = _cleaner_for_url(record.get("url") or "")
+    if cleaner is not None:
+        content = cleaner.clean(content)
+    if normalize:
+        content = normalize_text(content)
+    if infer:
+        infer_fields(record, content, infer)
+    record["content"] = content
+    return record
+
+
+def iter_work_units(src_dir, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields (shard, [(key, raw bytes), ...]) chunks in file order, one entry per key."""
+    conn = _open_index(src_dir)
+    try:
+        rows = conn.execute("SELECT key, shard, offset, length FROM records ORDER BY shard, offset").fetchall()
+    finally:
+        conn.close()
+
+    current, f, chunk = None, None, []
+    try:
+        for key, shard, offset, length in rows:
+            if shard != current:
+                if chunk:
+                    yield current, chunk
+                    chunk = []
+                if f:
+                    f.close()
+                current, f = shard, open(os.path.join(src_dir, shard), "rb")
+            f.seek(offset)
+            chunk.append((key, f.read(length)))
+            if len(chunk) >= chunk_size:
+                yield current, chunk
+                chunk = []
+        if chunk:
+            yield current, chunk
+    finally:
+        if f:
+            f.close()
+
+
+def _worker(index, dst_dir, tasks, results, process, writer_options):
+    """Worker process: processes queued chunks until a None arrives."""
+    writer = ShardWriter(dst_dir, prefix=f"shard-w{index}", **writer_options)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            shard, chunk = task
+            documents = changed = dropped = errors = 0
+            for key, data in chunk:
+                documents += 1
+                try:
+                    record = _decode(data, shard)
+                    result = process(record)
+                    if result is None:
+                        dropped += 1
+                        continue
+                    if result != record:
+                        changed += 1
+                    writer.write(key, result)
+                except Exception as e:
+                    errors += 1
+                    print(f"  [worker {index}] Error reprocessing {key}: {e}")
+            results.put(("chunk", documents, changed, dropped, errors))
+    finally:
+        writer.close()
+        results.put(("done", index))
+
+
+def reprocess(src_dir, dst_dir, process=process_record, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+              compression=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Runs process(record) over every document of src_dir and writes the results
+    (None drops a document) to a new shard corpus in dst_dir. Returns the counts.
+    """
+    if os.path.abspath(src_dir) == os.path.abspath(dst_dir):
+        raise ValueError("The destination must be a new directory, not the source corpus")
+    if list_shards(dst_dir):
+        raise ValueError(f"{dst_dir} already holds shards; reprocess into a new directory")
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(dst_dir, exist_ok=True)
+    # Each worker flushes once per chunk rather than every 50 records
+    writer_options = {"compression": compression, "max_bytes": max_bytes,
+                      "batch_size": chunk_size, "flush_interval": 60.0}
+
+    # spawn, as for the VBPL page workers: no forked SQLite connections or locks
+    ctx = multiprocessing.get_context("spawn")
+    tasks = ctx.Queue(maxsize=workers * 4)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_worker, args=(i, dst_dir, tasks, results, process, writer_options),
+                             name=f"reprocess-{i}") for i in range(workers)]
+    for p in processes:
+        p.start()
+
+    totals = {"documents": 0, "changed": 0, "dropped": 0, "errors": 0}
+    start = time.monotonic()
+    last_report = start
+    finished = 0
+
+    def handle(message):
+        nonlocal finished
+        if message[0] == "done":
+            finished += 1
+            return
+        for name, value in zip(("documents", "changed", "dropped", "errors"), message[1:]):
+            totals[name] += value
+
+    def report():
+        elapsed = time.monotonic() - start
+        print(f"  {totals['documents']} documents ({totals['documents'] / max(elapsed, 1e-9):.0f}/s), "
+              f"{totals['changed']} changed, {totals['dropped']} dropped, {totals['errors']} errors")
+
+    def drain():
+        nonlocal last_report
+        while True:
+            try:
+                handle(results.get_nowait())
+            except queue.Empty:
+                break
+        if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            report()
+            last_report = time.monotonic()
+
+    print(f"Reprocessing {src_dir} -> {dst_dir} with {workers} workers")
+    try:
+        for unit in iter_work_units(src_dir, chunk_size):
+            while True:
+                try:
+                    tasks.put(unit, timeout=1)
+                    break
+                except queue.Full:
+                    if not any(p.is_alive() for p in processes):
+                        raise RuntimeError("All reprocessing workers exited")
+                    drain()
+            drain()
+    finally:
+        for _ in processes:
+            tasks.put(None)
+        while finished < len(processes):
+            try:
+                handle(results.get(timeout=1))
+            except queue.Empty:
+                # A worker killed before its "done" message
+                if not any(p.is_alive() for p in processes):
+                    break
+        for p in processes:
+            p.join()
+
+    elapsed = time.monotonic() - start
+    report()
+    manifest = {"source": os.path.abspath(src_dir), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "seconds": round(elapsed, 2), "workers": workers, "chunk_size": chunk_size, **totals}
+    with open(os.path.join(dst_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Done in {elapsed:.1f}s; manifest: {os.path.join(dst_dir, MANIFEST_FILE)}")
+    return totals
+
+
+def add_arguments(parser, src=None, dst=None):
+    """The reprocessing options; src/dst become optional when given defaults."""
+    parser.add_argument("src", nargs="?" if src else None, default=src, help="Shard directory to read (left untouched)")
+    parser.add_argument("dst", nargs="?" if dst else None, default=dst, help="New directory for the reprocessed corpus")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_SIZE, help="Records per work unit")
+    parser.add_argument("--no-normalize", action="store_true", help="Skip normalize_text")
+    parser.add_argument("--zstd", action="store_true", help="Write zstd-compressed shards")
+
+
+def run_from_args(args, infer=None):
+    process = process_record
+    if infer or args.no_normalize:
+        # A partial of a module-level function pickles for spawned workers (a lambda would not)
+        process = functools.partial(process_record, infer=infer, normalize=not args.no_normalize)
+    return reprocess(args.src, args.dst, process=process, workers=args.workers, chunk_size=args.chunk,
+                     compression="zstd" if args.zstd else None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-clean a shard corpus into a new corpus version")
+    add_arguments(parser)
+    run_from_args(parser.parse_args())
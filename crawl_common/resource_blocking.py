@@ -0,0 +1,274 @@
+"""
+Request interception for browser sessions.
+The crawlers only read the DOM (and, for the audio crawlers, the player's
+media request), yet every page also pulls images, fonts, CSS, ads and
+analytics, and `networkidle` then waits for the slowest of those third-party
+requests. This module drops them before they leave the browser:
+
+  - Playwright: a route handler on the context/page aborts requests by
+    resource type and by ad/analytics host;
+  - Selenium (Chrome): the same rules become URL patterns for the CDP
+    command Network.setBlockedURLs.
+
+Each site has an allowlist of resource types / URL fragments it still needs
+(e.g. stylesheets where the crawler relies on is_visible()). Page loads then
+wait for the selector the crawler actually reads instead of `networkidle`.
+
+Usage:
+    context = browser.new_context()
+    block_resources(context, site="qdnd.vn")
+    page.goto(url, wait_until="domcontentloaded")
+    wait_for_selector(page, "h3 a")
+
+    driver = webdriver.Chrome(options=options)
+    block_resources_cdp(driver, site="vov.vn")
+"""
+
+from urllib.parse import urlsplit
+
+# Playwright resource types the crawlers never read
+BLOCKED_RESOURCE_TYPES = ("image", "font", "media", "stylesheet")
+# Selenium sessions keep media (the audio crawlers capture the player's own request)
+# and CSS (jwplayer builds the player from its skin; setBlockedURLs has no allow rules
+# to exempt the CDN)
+SELENIUM_BLOCKED_TYPES = ("image", "font")
+
+# Ad / analytics / social hosts, blocked whatever the resource type
+BLOCKED_HOSTS = (
+    "googletagmanager.com",
+    "google-analytics.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "facebook.com/plugins",
+    "platform.twitter.com",
+    "admicro.vn",
+    "vcmedia.vn",
+    "eclick.vn",
+    "ants.vn",
+    "adtimaserver.vn",
+    "amcdn.vn",
+    "gemius.pl",
+    "hotjar.com",
+    "clarity.ms",
+    "mgid.com",
+)
+
+# URL suffixes used for Selenium, where Network.setBlockedURLs only sees URLs
+RESOURCE_EXTENSIONS = {
+    "image": (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".ico", ".avif", ".bmp"),
+    "font": (".woff", ".woff2", ".ttf", ".otf", ".eot"),
+    "stylesheet": (".css",),
+    "media": (".mp3", ".m4a", ".aac", ".wav", ".mp4", ".m3u8", ".ts", ".webm"),
+}
+
+# What each site still needs: resource types let through, and URL fragments
+# that are never blocked
+SITE_ALLOWLISTS = {
+    # Thuộc tính / Toàn văn are separate pages, but their content blocks are picked with is_visible()
+    "vbpl.vn": {"types": ("stylesheet",)},
+    # Date / content blocks are picked with is_visible(); hidden duplicates show up without CSS
+    "qdnd.vn": {"types": ("stylesheet",)},
+    "tapchiqptd.vn": {"types": ("stylesheet",)},
+    # jwplayer is loaded from its CDN and needs its skin to build the player
+    "vov.vn": {"urls": ("jwplayer", "jwpcdn.com")},
+    "antv.gov.vn": {"urls": ("jwplayer", "jwpcdn.com")},
+    "baohaiphong.vn": {"urls": ("jwplayer", "jwpcdn.com")},
+    "chinhphu.vn": {"urls": ("jwplayer", "jwpcdn.com")},
+}
+
+DEFAULT_SELECTOR_TIMEOUT = 15.0  # seconds
+DEFAULT_NAVIGATION_TIMEOUT = 30.0  # seconds
+
+
+def site_of(url):
+    host = urlsplit(url).hostname or url
+    return host[4:] if host.startswith("www.") else host
+
+
+def allowlist_for(site):
+    """The allowlist of site or of the registered domain it belongs to."""
+    if not site:
+        return {}
+    site = site_of(site) if "/" in site else site
+    for name, allowlist in SITE_ALLOWLISTS.items():
+        if site == name or site.endswith("." + name):
+            return allowlist
+    return {}
+
+
+def is_blocked_host(url):
+    return any(host in url for host in BLOCKED_HOSTS)
+
+
+def should_block(url, resource_type, site=None, blocked_types=BLOCKED_RESOURCE_TYPES):
+    """True if a request of this type is not needed when crawling site."""
+    if not url.startswith("http"):
+        return False
+    allowlist = allowlist_for(site)
+    if any(fragment in url for fragment in allowlist.get("urls", ())):
+        return False
+    if is_blocked_host(url):
+        return True
+    return resource_type in blocked_types and resource_type not in allowlist.get("types", ())
+
+
+class BlockStats:
+    """Request counters for one session (reported by benchmark_blocking.py)."""
+
+    def __init__(self):
+        self.allowed = 0
+        self.blocked = 0
+
+    def __repr__(self):
+        return f"BlockStats(allowed={self.allowed}, blocked={self.blocked})"
+
+
+def block_resources(target, site=None, blocked_types=BLOCKED_RESOURCE_TYPES, stats=None):
+    """Installs the blocking route on a sync Playwright BrowserContext or Page."""
+    def handle(route):
+        request = route.request
+        if should_block(request.url, request.resource_type, site, blocked_types):
+            if stats is not None:
+                stats.blocked += 1
+            route.abort()
+        else:
+            if stats is not None:
+                stats.allowed += 1
+            route.continue_()
+
+    target.route("**/*", handle)
+    return target
+
+
+async def block_resources_async(target, site=None, blocked_types=BLOCKED_RESOURCE_TYPES, stats=None):
+    """Async Playwright version of block_resources."""
+    async def handle(route):
+        request = route.request
+        if should_block(request.url, request.resource_type, site, blocked_types):
+            if stats is not None:
+                stats.blocked += 1
+            await route.abort()
+        else:
+            if stats is not None:
+                stats.allowed += 1
+            await route.continue_()
+
+    await target.route("**/*", handle)
+    return target
+
+
+def blocked_url_patterns(site=None, blocked_types=SELENIUM_BLOCKED_TYPES):
+    """Network.setBlockedURLs patterns for site (with and without a query string)."""
+    allowlist = allowlist_for(site)
+    patterns = [f"*{host}*" for host in BLOCKED_HOSTS]
+    for resource_type in blocked_types:
+        if resource_type in allowlist.get("types", ()):
+            continue
+        for extension in RESOURCE_EXTENSIONS.get(resource_type, ()):
+            patterns += [f"*{extension}", f"*{extension}?*"]
+    return patterns
+
+
+def block_resources_cdp(driver, site=None, blocked_types=SELENIUM_BLOCKED_TYPES):
+    """Blocks the same requests in a Chrome Selenium session through CDP."""
+    patterns = blocked_url_patterns(site, blocked_types)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        print(f"Resource blocking unavailable: {e}")
+    return driver
+
+
+def wait_for_selector(page, selector, timeout=DEFAULT_SELECTOR_TIMEOUT):
+    """Waits until selector is in the DOM; False on timeout instead of raising."""
+    try:
+        page.wait_for_selector(selector, state="attached", timeout=timeout * 1000)
+        return True
+    except Exception:
+        return False
+
+
+async def wait_for_selector_async(page, selector, timeout=DEFAULT_SELECTOR_TIMEOUT):
+    try:
+        await page.wait_for_selector(selector, state="attached", timeout=timeout * 1000)
+        return True
+    except Exception:
+        return False
+
+
+def is_page_link(href):
+    """False for links handled by script in place ("#...", "javascript:...")."""
+    href = (href or "").strip()
+    return bool(href) and not href.startswith("#") and not href.lower().startswith("javascript:")
+
+
+def click_tab(page, link, selector, timeout=DEFAULT_NAVIGATION_TIMEOUT):
+    """
+    Clicks a tab link and waits until selector (only the target tab has it) is in
+    the DOM. A tab with a page href (VBPL's Thuộc tính / Toàn văn) also waits for
+    that navigation, since the old page already passes wait_for_load_state;
+    a tab switched in place by script only waits for the selector.
+    """
+    if not is_page_link(link.get_attribute("href")):
+        link.click()
+        return wait_for_selector(page, selector)
+    try:
+        with page.expect_navigation(wait_until="domcontentloaded", timeout=timeout * 1000):
+            link.click()
+    except Exception as e:
+        print(f"      No navigation after clicking the tab: {e}")
+    return wait_for_selector(page, selector)
+
+
+async def click_tab_async(page, link, selector, timeout=DEFAULT_NAVIGATION_TIMEOUT):
+    if not is_page_link(await link.get_attribute("href")):
+        await link.click()
+        return await wait_for_selector_async(page, selector)
+    try:
+        async with page.expect_navigation(wait_until="domcontentloaded", timeout=timeout * 1000):
+            await link.click()
+    except Exception as e:
+        print(f"      No navigation after clicking the tab: {e}")
+    return await wait_for_selector_async(page, selector)
+
+
+# True once the first element matching the selector has a different href than before
+CHANGED_SCRIPT = """([selector, previous]) => {
+    const el = document.querySelector(selector);
+    return el !== null && el.getAttribute('href') !== previous;
+}"""
+
+
+def first_href(page, selector):
+    el = page.query_selector(selector)
+    return el.get_attribute("href") if el else None
+
+
+async def first_href_async(page, selector):
+    el = await page.query_selector(selector)
+    return await el.get_attribute("href") if el else None
+
+
+def wait_for_new_results(page, selector, previous, timeout=DEFAULT_SELECTOR_TIMEOUT):
+    """
+    For listings paged in place by AJAX (VBPL's LoadPage): waits until the first
+    result link differs from `previous` (first_href before the click).
+    """
+    try:
+        page.wait_for_function(CHANGED_SCRIPT, arg=[selector, previous], timeout=timeout * 1000)
+        return True
+    except Exception:
+        return False
+
+
+async def wait_for_new_results_async(page, selector, previous, timeout=DEFAULT_SELECTOR_TIMEOUT):
+    try:
+        await page.wait_for_function(CHANGED_SCRIPT, arg=[selector, previous], timeout=timeout * 1000)
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,213 @@
+"""
+Sharded JSONL output for crawled documents.
+Replaces one small .txt file per document (plus an os.makedirs and a print per
+write) with records appended to a few large, size-capped shard files:
+
+    out_dir/
+        shard-00000.jsonl[.zst]
+        shard-00001.jsonl[.zst]
+        index.db                  key -> (shard, offset, length)
+
+Each record is one JSON line holding the metadata fields plus "content".
+With compression="zstd" every record is its own zstd frame, so the shard is
+still a valid .zst stream for the zstd CLI while index offsets stay seekable.
+The index is SQLite in WAL mode (as in dedup_store) and is committed only
+after the shard data it points to has been flushed.
+
+Usage:
+    with ShardWriter("crawled_shards", compression="zstd") as writer:
+        writer.write(item_id, {**metadata, "content": content})
+    record = read_record("crawled_shards", item_id)
+    for record in iter_records("crawled_shards"):
+        ...
+"""
+
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+from crawl_common.metrics import SAVE, default_metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds
+INDEX_FILE = "index.db"
+
+
+def _open_index(out_dir):
+    # Parallel writers share the index; wait for each other's commits instead of failing
+    conn = sqlite3.connect(os.path.join(out_dir, INDEX_FILE), timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS records "
+        "(key TEXT PRIMARY KEY, shard TEXT, offset INTEGER, length INTEGER)"
+    )
+    conn.commit()
+    return conn
+
+
+def _require_zstd():
+    if zstandard is None:
+        raise ImportError("zstd compression needs the 'zstandard' package: pip install zstandard")
+
+
+def list_shards(out_dir, prefix="shard"):
+    """
+    Shard file names in write order, including those of parallel writers
+    (prefix "shard-w<N>", one per worker process) sharing the directory.
+    """
+    pattern = re.compile(rf"^{re.escape(prefix)}(-w\d+)?-(\d+)\.jsonl(\.zst)?$")
+    shards = []
+    if os.path.isdir(out_dir):
+        for name in os.listdir(out_dir):
+            match = pattern.match(name)
+            if match:
+                shards.append((int(match.group(2)), name))
+    return [name for _, name in sorted(shards)]
+
+
+class ShardWriter:
+    def __init__(self, out_dir, prefix="shard", max_bytes=DEFAULT_MAX_BYTES, compression=None,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        if compression not in (None, "zstd"):
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd":
+            _require_zstd()
+            self._compressor = zstandard.ZstdCompressor(level=3)
+        else:
+            self._compressor = None
+
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.conn = _open_index(out_dir)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+        # Every run starts a fresh shard, so a torn tail left by a crash is never appended to
+        existing = list_shards(out_dir, prefix)
+        self._shard_number = max(int(name.split("-")[-1].split(".")[0]) for name in existing) + 1 if existing else 0
+        self._file = None
+        self._shard_name = None
+        self._open_shard()
+
+    def _open_shard(self):
+        if self._file:
+            self._file.close()
+        suffix = ".jsonl.zst" if self.compression == "zstd" else ".jsonl"
+        self._shard_name = f"{self.prefix}-{self._shard_number:05d}{suffix}"
+        self._file = open(os.path.join(self.out_dir, self._shard_name), "ab")
+        self._shard_number += 1
+
+    def __contains__(self, key):
+        row = self.conn.execute("SELECT 1 FROM records WHERE key = ?", (str(key),)).fetchone()
+        return row is not None
+
+    def write(self, key, record):
+        """Appends one record; returns (shard, offset, length)."""
+        with default_metrics.stage(SAVE, urlsplit(str(key)).netloc or None):
+            shard, offset, length = self._write(key, record)
+        default_metrics.inc("saved_bytes_total", length)
+        return shard, offset, length
+
+    def _write(self, key, record):
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._compressor:
+            data = self._compressor.compress(data)
+
+        offset = self._file.tell()
+        if offset and offset + len(data) > self.max_bytes:
+            self.flush()
+            self._open_shard()
+            offset = 0
+        self._file.write(data)
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO records (key, shard, offset, length) VALUES (?, ?, ?, ?)",
+            (str(key), self._shard_name, offset, len(data))
+        )
+        self._pending += 1
+        if self._pending >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return self._shard_name, offset, len(data)
+
+    def flush(self):
+        """Flushes shard data to disk, then commits the index entries pointing at it."""
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.conn.commit()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _decode(data, shard):
+    if shard.endswith(".zst"):
+        _require_zstd()
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def read_record(out_dir, key):
+    """Looks a record up through the index; None if the key was never written."""
+    conn = _open_index(out_dir)
+    try:
+        row = conn.execute("SELECT shard, offset, length FROM records WHERE key = ?", (str(key),)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    shard, offset, length = row
+    with open(os.path.join(out_dir, shard), "rb") as f:
+        f.seek(offset)
+        return _decode(f.read(length), shard)
+
+
+def iter_records(out_dir, prefix="shard"):
+    """Streams every record of every shard in write order (a key rewritten later appears twice)."""
+    for shard in list_shards(out_dir, prefix):
+        path = os.path.join(out_dir, shard)
+        with open(path, "rb") as raw:
+            if shard.endswith(".zst"):
+                _require_zstd()
+                stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            else:
+                stream = raw
+            try:
+                for line in io.TextIOWrapper(stream, encoding="utf-8"):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Torn last line of a shard from an interrupted run
+                        continue
+            except Exception as e:
+                # Truncated zstd frame at the end of an interrupted shard
+                print(f"Stopped reading {shard}: {e}")
@@ -0,0 +1,184 @@
+"""
+Boilerplate stripping for crawled article text.
+Each site has a rule set (SITE_RULES) of three kinds of rules:
+
+  header_cut  - drop everything up to and including the first line, within
+                the first `header_window` lines, that contains a marker;
+  footer_cut  - drop everything from the first short line (stripped length
+                < `footer_max_line`) that contains a marker;
+  drop_lines  - drop every line that is exactly one of these phrases
+                (ignoring surrounding whitespace).
+
+None of the rules loop over lines in Python; Python code only runs for the
+few lines that match:
+  - header and footer markers are located with str.find, one C-level scan
+    per marker (re has no multi-literal search, so one alternation of the
+    markers is slower than a handful of finds);
+  - drop_lines is one regex pass over the whole text, anchored on the
+    newline before each line, so a long VBPL text is never split into
+    per-line strings.
+The output is the same as the line loops it replaces; benchmark_cleaning.py
+checks this.
+
+infer_fields() and normalize_text() are the other per-document steps,
+shared by the crawlers and the offline reprocessing in reprocess.py.
+
+Usage:
+    cleaner = cleaner_for("qdnd.vn")
+    content = cleaner.clean(content)
+"""
+
+import re
+import unicodedata
+
+from crawl_common.resource_blocking import site_of
+
+
+class CleaningRules:
+    def __init__(self, header_cut=(), header_window=30, footer_cut=(), footer_max_line=100, drop_lines=()):
+        self.header_cut = tuple(header_cut)
+        self.header_window = header_window
+        self.footer_cut = tuple(footer_cut)
+        self.footer_max_line = footer_max_line
+        self.drop_lines = tuple(drop_lines)
+
+
+SITE_RULES = {
+    "qdnd.vn": CleaningRules(
+        footer_cut=("Nguồn: qdnd.vn", "TAG", "Tin, ảnh:", "Tin liên quan", "Xem thêm",
+                    "Ý KIẾN BẠN ĐỌC", "CÁC TIN, BÀI ĐÃ ĐƯA"),
+    ),
+    "tapchiqptd.vn": CleaningRules(
+        # The header block starts with "Tòa soạn:" and ends with "Tạp chí và Tòa soạn"
+        header_cut=("Tạp chí và Tòa soạn",),
+        footer_cut=("Nguồn: qdnd.vn", "TAG", "Ý KIẾN BẠN ĐỌC", "CÁC TIN, BÀI ĐÃ ĐƯA",
+                    "Tạp chí và Tòa soạn", "TIÊU ĐIỂM", "TIN, BÀI XEM NHIỀU"),
+    ),
+    "vbpl.vn": CleaningRules(
+        drop_lines=("Văn bản quy phạm pháp luật", "Văn bản hợp nhất", "Hệ thống hóa VBQPPL", "Mục lục văn bản"),
+    ),
+}
+
+
+def _alternation(strings):
+    # Longest first, so a phrase that starts another never shadows it
+    return "|".join(re.escape(string) for string in sorted(strings, key=len, reverse=True))
+
+
+def _line_bounds(text, start, end):
+    """(start, end) of the line holding text[start:end]; end excludes the newline."""
+    line_end = text.find("\n", end)
+    return text.rfind("\n", 0, start) + 1, len(text) if line_end == -1 else line_end
+
+
+class TextCleaner:
+    def __init__(self, rules):
+        self.rules = rules
+        self._drop_set = frozenset(rules.drop_lines)
+        # A whole line (surrounding whitespace allowed) that is one of the phrases,
+        # with the newline before it; drop() handles the first line separately
+        self._drop_re = (re.compile(r"\n[^\S\n]*(?:%s)[^\S\n]*(?=\n|\Z)" % _alternation(rules.drop_lines))
+                         if rules.drop_lines else None)
+
+    def _first_line(self, text, markers, end, accept):
+        """Start/end of the first line before `end` that holds a marker and passes accept(), or None."""
+        best = None
+        for marker in markers:
+            pos = text.find(marker, 0, end)
+            while pos != -1 and (best is None or pos < best[0]):
+                bounds = _line_bounds(text, pos, pos + len(marker))
+                if accept(text, *bounds):
+                    best = bounds
+                    break
+                pos = text.find(marker, bounds[1], end)
+        return best
+
+    def cut_header(self, text):
+        window_end = -1
+        for _ in range(self.rules.header_window):
+            window_end = text.find("\n", window_end + 1)
+            if window_end == -1:
+                window_end = len(text)
+                break
+        line = self._first_line(text, self.rules.header_cut, window_end, lambda text, start, end: True)
+        if line is None:
+            return text
+        return text[line[1] + 1:]
+
+    def cut_footer(self, text):
+        max_line = self.rules.footer_max_line
+        # A long line only mentions the marker; markers are short headers
+        line = self._first_line(text, self.rules.footer_cut, len(text),
+                                lambda text, start, end: len(text[start:end].strip()) < max_line)
+        if line is None:
+            return text
+        return text[:max(line[0] - 1, 0)]
+
+    def drop(self, text):
+        # No split into line strings: the regex only stops at newlines followed by a phrase
+        text = self._drop_re.sub("", text)
+        first_end = text.find("\n")
+        first_line = text if first_end == -1 else text[:first_end]
+        if first_line.strip() in self._drop_set:
+            text = "" if first_end == -1 else text[first_end + 1:]
+        return text
+
+    def clean(self, text):
+        if self.rules.header_cut:
+            text = self.cut_header(text)
+        if self.rules.footer_cut:
+            text = self.cut_footer(text)
+        if self.rules.drop_lines:
+            text = self.drop(text)
+        return text
+
+
+_cleaners = {}
+
+
+def cleaner_for(site):
+    """The TextCleaner of a site (host or URL) or of the registered domain it belongs to."""
+    site = site_of(site) if "/" in site else site
+    if site.startswith("www."):
+        site = site[4:]
+    for name, rules in SITE_RULES.items():
+        if site == name or site.endswith("." + name):
+            if name not in _cleaners:
+                _cleaners[name] = TextCleaner(rules)
+            return _cleaners[name]
+    raise KeyError(f"No cleaning rules for {site}")
+
+
+def infer_fields(metadata, content, fields, window=1000):
+    """
+    Fills metadata fields still at their unknown value from the start of the text.
+    fields: {name: (unknown_value, candidates)}; the first candidate found in
+    content[:window] wins (VBPL agency/type when the properties tab had none).
+    """
+    head = content[:window]
+    for name, (unknown, candidates) in fields.items():
+        if metadata.get(name, unknown) != unknown:
+            continue
+        for candidate in candidates:
+            if candidate in head:
+                metadata[name] = candidate
+                break
+    return metadata
+
+
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+def normalize_text(text):
+    """
+    NFC (pages mix precomposed and combining Vietnamese diacritics), \\n line
+    ends, no trailing whitespace, at most one blank line in a row.
+    """
+    text = unicodedata.normalize("NFC", text)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # rstrip per line: a `[ \t]+$` regex would try a match at every space between words
+    text = "\n".join([line.rstrip() for line in text.split("\n")])
+    if "\n\n\n" in text:
+        text = _BLANK_RUNS.sub("\n\n", text)
+    return text.strip()
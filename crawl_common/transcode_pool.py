@@ -0,0 +1,189 @@
+"""
+Background ffmpeg transcode stage.
+Scrapers push jobs and keep scraping while up to N ffmpeg processes (one per
+CPU core by default) pull and transcode the audio. Finished jobs are handed
+back on the scraper's own thread through completed()/join(), so the
+processed-set update (SQLite, not thread-safe) happens only on success and
+only from the thread that owns the store.
+
+Remote files are first fetched to a local .downloads/ directory with a
+resumable Range download (see download.py), and ffmpeg only ever reads the
+finished local copy; HLS playlists are still handed to ffmpeg directly.
+
+Usage:
+    pool = TranscodePool(workers=4)
+    pool.submit(audio_url, output_path, "wav", 16000, 1, key=item_hash)
+    for job in pool.completed():
+        if job.ok:
+            processed_items.add(job.key)
+    ...
+    for job in pool.join():
+        ...
+"""
+
+import asyncio
+import hashlib
+import os
+import queue
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from urllib.parse import urlsplit
+
+from crawl_common.download import download_file
+from crawl_common.metrics import TRANSCODE, default_metrics
+from crawl_common.rate_limiter import default_limiter
+
+SLOT_POLL_INTERVAL = 0.2  # seconds between free-slot checks in submit_async
+STREAM_EXTENSIONS = (".m3u8", ".m3u")
+
+
+class TranscodeJob:
+    def __init__(self, source_url, output_path, audio_format="wav", sample_rate=16000,
+                 channels=1, headers=None, key=None, download=True):
+        self.source_url = source_url
+        self.output_path = output_path
+        self.audio_format = audio_format
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.headers = headers
+        self.key = key
+        self.download = download
+        self.ok = False
+        self.error = None
+
+    def command(self, target_path, input_path=None):
+        input_path = input_path or self.source_url
+        cmd = ["ffmpeg", "-y", "-nostdin", "-loglevel", "error"]
+        if self.headers and input_path == self.source_url:
+            cmd += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in self.headers.items())]
+        cmd += [
+            "-i", input_path,
+            "-vn",
+            "-acodec", "pcm_s16le" if self.audio_format == "wav" else "libmp3lame",
+            "-ar", str(self.sample_rate),
+            "-ac", str(self.channels),
+            target_path
+        ]
+        return cmd
+
+
+def is_downloadable(url):
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and not parts.path.lower().endswith(STREAM_EXTENSIONS)
+
+
+def download_path(job, download_dir=None):
+    """Local path of the raw media for a job: <download_dir>/<md5 of URL><source extension>."""
+    download_dir = download_dir or os.path.join(os.path.dirname(job.output_path) or ".", ".downloads")
+    ext = os.path.splitext(urlsplit(job.source_url).path)[1][:8]
+    return os.path.join(download_dir, hashlib.md5(job.source_url.encode()).hexdigest() + ext)
+
+
+def run_transcode(job, limiter=default_limiter, download_dir=None):
+    """
+    Runs one job in the calling thread: download the raw media (resumable), then
+    transcode it; ffmpeg writes to a temp file that is renamed on success.
+    """
+    if os.path.exists(job.output_path):
+        job.ok = True
+        return job
+
+    root, ext = os.path.splitext(job.output_path)
+    tmp_path = f"{root}.part{ext}"
+    raw_path = download_path(job, download_dir) if job.download and is_downloadable(job.source_url) else None
+    if limiter is not None:
+        limiter.wait(job.source_url)
+    try:
+        input_path = download_file(job.source_url, raw_path, headers=job.headers) if raw_path else None
+        with default_metrics.stage(TRANSCODE, urlsplit(job.source_url).netloc, key=job.key):
+            subprocess.run(job.command(tmp_path, input_path), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        os.replace(tmp_path, job.output_path)
+        job.ok = True
+        if raw_path:
+            # The transcoded file is all we keep
+            os.remove(raw_path)
+    except subprocess.CalledProcessError as e:
+        job.error = e.stderr.decode(errors="replace")[:200] if e.stderr else str(e)
+    except Exception as e:
+        job.error = str(e)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return job
+
+
+class TranscodePool:
+    def __init__(self, workers=None, max_pending=None, limiter=default_limiter, download=True, download_dir=None):
+        self.workers = workers or os.cpu_count() or 2
+        # Bounded queue: submit() blocks once this many jobs are waiting or running
+        self.max_pending = max_pending or self.workers * 4
+        self.limiter = limiter
+        self.download = download
+        self.download_dir = download_dir
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ffmpeg")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._done = queue.Queue()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def submit(self, source_url, output_path, audio_format="wav", sample_rate=16000,
+               channels=1, headers=None, key=None):
+        job = TranscodeJob(source_url, output_path, audio_format, sample_rate, channels, headers, key,
+                           download=self.download)
+        self._slots.acquire()
+        return self._start(job)
+
+    async def submit_async(self, source_url, output_path, audio_format="wav", sample_rate=16000,
+                           channels=1, headers=None, key=None):
+        """
+        submit() for coroutines: while the queue is full only the calling task
+        waits (polling for a slot), not the whole event loop.
+        """
+        job = TranscodeJob(source_url, output_path, audio_format, sample_rate, channels, headers, key,
+                           download=self.download)
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+        return self._start(job)
+
+    def _start(self, job):
+        with self._lock:
+            self._in_flight += 1
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        try:
+            run_transcode(job, self.limiter, self.download_dir)
+        finally:
+            self._slots.release()
+            self._done.put(job)
+
+    def _take(self, job):
+        with self._lock:
+            self._in_flight -= 1
+        return job
+
+    def completed(self):
+        """Yields the jobs that finished since the last call, without blocking."""
+        while True:
+            try:
+                job = self._done.get_nowait()
+            except queue.Empty:
+                return
+            yield self._take(job)
+
+    def join(self):
+        """Yields every remaining job as it finishes, then shuts the workers down."""
+        while True:
+            with self._lock:
+                if self._in_flight == 0:
+                    break
+            yield self._take(self._done.get())
+        self._executor.shutdown(wait=True)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return self._in_flight
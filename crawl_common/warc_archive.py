@@ -0,0 +1,354 @@
+"""
+Append-only WARC archive of every fetched page.
+The crawlers keep only the extracted text, so an extraction fix used to mean
+re-fetching from throttled sites. With an archive configured, fetches are
+also written here and extractors can run against the archive instead:
+
+    out_dir/
+        archive-00000.warc.gz      WARC/1.0 records, one gzip member each
+        archive-w1-00000.warc.gz   (one file series per parallel worker)
+        index.db                   url -> (file, offset, length, type, status, time)
+
+  - "response" records hold the raw HTTP response (AsyncFetcher, urllib);
+  - "resource" records hold the rendered DOM of a browser page
+    (Playwright page.content(), Selenium page_source), which is what
+    inner_text() extraction actually reads.
+
+One gzip member per record keeps the files valid .warc.gz for standard WARC
+tools, and an index offset can be read without inflating the rest of the
+file. As in shard_writer, the SQLite index (WAL) is committed only after the
+data it points to is flushed, and every run starts a new file.
+
+Usage:
+    configure_archive(CONFIG)   # "archive_dir" / "archive_replay", or CRAWL_ARCHIVE_DIR / CRAWL_ARCHIVE_REPLAY
+    archive_page(url, page.content)           # browser pages; a no-op without an archive
+    AsyncFetcher(...)                         # archives (and with replay, serves) GET responses itself
+    with WarcArchive("crawled_data/archive") as archive:
+        record = archive.get(url)             # latest capture: record.status, record.headers, record.text
+"""
+
+import atexit
+import base64
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.client import responses as HTTP_REASONS
+
+from crawl_common.metrics import default_metrics
+from crawl_common.rate_limiter import host_of
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds
+INDEX_FILE = "index.db"
+
+RESPONSE = "response"  # raw HTTP response
+RESOURCE = "resource"  # rendered DOM of a browser page
+
+# The stored body is already decoded and complete, so these would misdescribe it
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+def _open_index(out_dir):
+    conn = sqlite3.connect(os.path.join(out_dir, INDEX_FILE), timeout=60, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS captures (url TEXT, fetched_at REAL, warc TEXT, offset INTEGER, "
+        "length INTEGER, record_type TEXT, status INTEGER, content_type TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS captures_url ON captures (url, fetched_at)")
+    conn.commit()
+    return conn
+
+
+def list_archives(out_dir, prefix="archive"):
+    """Archive file names in write order, including those of parallel writers (prefix-w<N>)."""
+    pattern = re.compile(rf"^{re.escape(prefix)}(-w\d+)?-(\d+)\.warc\.gz$")
+    names = []
+    if os.path.isdir(out_dir):
+        for name in os.listdir(out_dir):
+            match = pattern.match(name)
+            if match:
+                names.append((int(match.group(2)), name))
+    return [name for _, name in sorted(names)]
+
+
+def _charset(content_type, default="utf-8"):
+    match = re.search(r"charset=([\w-]+)", content_type or "", re.I)
+    return match.group(1) if match else default
+
+
+class ArchivedRecord:
+    def __init__(self, url, record_type, status, headers, body, fetched_at):
+        self.url = url
+        self.record_type = record_type
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.fetched_at = fetched_at
+
+    @property
+    def content_type(self):
+        return next((v for k, v in self.headers.items() if k.lower() == "content-type"), None)
+
+    @property
+    def encoding(self):
+        return _charset(self.content_type)
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding, errors="replace")
+
+
+def _warc_record(record_type, url, content_type, block, date=None):
+    date = date or datetime.now(timezone.utc)
+    headers = [
+        ("WARC-Type", record_type),
+        ("WARC-Record-ID", f"<urn:uuid:{uuid.uuid4()}>"),
+        ("WARC-Date", date.strftime("%Y-%m-%dT%H:%M:%SZ")),
+    ]
+    if url:
+        headers.append(("WARC-Target-URI", url))
+    headers += [
+        ("Content-Type", content_type),
+        ("WARC-Block-Digest", "sha1:" + base64.b32encode(hashlib.sha1(block).digest()).decode()),
+        ("Content-Length", str(len(block))),
+    ]
+    head = "WARC/1.0\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+    return head.encode("utf-8") + block + b"\r\n\r\n"
+
+
+def _http_block(status, headers, body):
+    lines = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}".rstrip()]
+    for key, value in (headers or {}).items():
+        if key.lower() not in _DROP_HEADERS:
+            lines.append(f"{key}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8", errors="replace") + body
+
+
+def _parse_headers(lines):
+    headers = {}
+    for line in lines:
+        key, _, value = line.partition(":")
+        if key:
+            headers[key.strip()] = value.strip()
+    return headers
+
+
+def _parse_record(data):
+    """(warc headers, block) of one uncompressed WARC record."""
+    head, _, rest = data.partition(b"\r\n\r\n")
+    warc_headers = _parse_headers(head.decode("utf-8", errors="replace").split("\r\n")[1:])
+    return warc_headers, rest[:int(warc_headers.get("Content-Length", len(rest)))]
+
+
+class WarcArchive:
+    """Writer and reader of one archive directory (thread-safe; one file series per process)."""
+
+    def __init__(self, out_dir, prefix="archive", max_bytes=DEFAULT_MAX_BYTES, replay=False,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(out_dir, exist_ok=True)
+        self.conn = _open_index(out_dir)
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        # The file is opened on the first write, so a replay-only run leaves none behind
+        self._file = None
+        self._file_name = None
+        existing = list_archives(out_dir, prefix)
+        self._file_number = max(int(name.split("-")[-1].split(".")[0]) for name in existing) + 1 if existing else 0
+
+    def _open_file(self):
+        if self._file:
+            self.flush()
+            self._file.close()
+        self._file_name = f"{self.prefix}-{self._file_number:05d}.warc.gz"
+        self._file = open(os.path.join(self.out_dir, self._file_name), "ab")
+        self._file_number += 1
+        info = b"software: crawl_common.warc_archive\r\nformat: WARC File Format 1.0\r\n"
+        self._file.write(gzip.compress(_warc_record("warcinfo", None, "application/warc-fields", info)))
+
+    def _append(self, url, record_type, status, content_type, record):
+        data = gzip.compress(record, compresslevel=6)
+        with self._lock:
+            if self._file is None or self._file.tell() + len(data) > self.max_bytes:
+                self._open_file()
+            offset = self._file.tell()
+            self._file.write(data)
+            self.conn.execute(
+                "INSERT INTO captures (url, fetched_at, warc, offset, length, record_type, status, content_type) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, time.time(), self._file_name, offset, len(data), record_type, status, content_type)
+            )
+            self._pending += 1
+            if self._pending >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+        default_metrics.inc("archive_records_total", host=host_of(url), type=record_type)
+        default_metrics.inc("archive_bytes_total", len(data))
+
+    def write_response(self, url, status, headers, body):
+        """Archives a raw HTTP response (body as received, already decompressed)."""
+        content_type = next((v for k, v in (headers or {}).items() if k.lower() == "content-type"), None)
+        record = _warc_record(RESPONSE, url, "application/http; msgtype=response", _http_block(status, headers, body))
+        self._append(url, RESPONSE, status, content_type, record)
+
+    def write_resource(self, url, html, content_type="text/html; charset=utf-8"):
+        """Archives the rendered DOM (or any document) of url."""
+        body = html.encode("utf-8") if isinstance(html, str) else html
+        self._append(url, RESOURCE, None, content_type, _warc_record(RESOURCE, url, content_type, body))
+
+    def flush(self):
+        """Flushes archive data to disk, then commits the index rows pointing at it."""
+        with self._lock:
+            if self._pending:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self.conn.commit()
+            self._pending = 0
+            self._last_flush = time.monotonic()
+
+    def _latest(self, url, record_type=None):
+        query = "SELECT warc, offset, length, record_type, fetched_at FROM captures WHERE url = ?"
+        args = [url]
+        if record_type:
+            query += " AND record_type = ?"
+            args.append(record_type)
+        with self._lock:
+            return self.conn.execute(query + " ORDER BY fetched_at DESC LIMIT 1", args).fetchone()
+
+    def __contains__(self, url):
+        return self._latest(url) is not None
+
+    def read(self, url, warc, offset, length, record_type, fetched_at):
+        with self._lock:
+            if warc == self._file_name and self._file:
+                self._file.flush()
+        with open(os.path.join(self.out_dir, warc), "rb") as f:
+            f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        warc_headers, block = _parse_record(data)
+        if record_type != RESPONSE:
+            headers = {"Content-Type": warc_headers.get("Content-Type", "text/html")}
+            return ArchivedRecord(url, record_type, 200, headers, block, fetched_at)
+        head, _, body = block.partition(b"\r\n\r\n")
+        lines = head.decode("utf-8", errors="replace").split("\r\n")
+        status = int(lines[0].split()[1])
+        return ArchivedRecord(url, record_type, status, _parse_headers(lines[1:]), body, fetched_at)
+
+    def get(self, url, record_type=None):
+        """The latest capture of url (optionally of one record type), or None."""
+        row = self._latest(url, record_type)
+        return self.read(url, *row) if row else None
+
+    def urls(self, like=None):
+        """Distinct archived URLs, optionally filtered with an SQL LIKE pattern."""
+        query = "SELECT DISTINCT url FROM captures"
+        with self._lock:
+            rows = (self.conn.execute(query + " WHERE url LIKE ?", (like,)) if like
+                    else self.conn.execute(query)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self.flush()
+                self._file.close()
+                self._file = None
+            self.conn.commit()
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_archive = None
+
+
+def configure_archive(config=None, prefix="archive"):
+    """
+    Turns archiving on when config (pipeline_config.json keys) or the environment
+    names an archive directory; with archive_replay, archived pages are served
+    instead of fetched. Returns the archive or None.
+    """
+    global _archive
+    config = config or {}
+    out_dir = config.get("archive_dir") or os.environ.get("CRAWL_ARCHIVE_DIR")
+    if not out_dir:
+        return None
+    replay = config.get("archive_replay") or os.environ.get("CRAWL_ARCHIVE_REPLAY", "").lower() in ("1", "true", "yes")
+    if _archive is not None:
+        _archive.close()
+    _archive = WarcArchive(out_dir, prefix=prefix, replay=bool(replay))
+    atexit.register(close_archive)
+    print(f"Archiving fetched pages to {out_dir}{' (replay on)' if replay else ''}")
+    return _archive
+
+
+def get_archive():
+    """The archive set up by configure_archive(), or None."""
+    return _archive
+
+
+def close_archive():
+    global _archive
+    if _archive is not None:
+        _archive.close()
+        _archive = None
+
+
+def is_replayed(url):
+    """True when url will be served from the archive (replay on and a capture exists)."""
+    return _archive is not None and _archive.replay and url in _archive
+
+
+def archive_page(url, html):
+    """
+    Archives a browser page's DOM if archiving is on. html may be a callable
+    (page.content, lambda: driver.page_source), only called in that case.
+    Pages served by replay are not archived again.
+    """
+    if _archive is None or is_replayed(url):
+        return
+    try:
+        _archive.write_resource(url, html() if callable(html) else html)
+    except Exception as e:
+        print(f"Could not archive {url}: {e}")
+
+
+def replay_route(target, archive):
+    """
+    Serves document GETs of a Playwright (sync) page or context from the
+    archive when it has them; everything else falls through to the routes
+    installed before (e.g. resource blocking), as in http_cache.cache_route.
+    """
+    def handle(route):
+        request = route.request
+        if request.method != "GET" or request.resource_type != "document":
+            route.fallback()
+            return
+        record = archive.get(request.url)
+        default_metrics.inc("archive_replay_total", host=host_of(request.url),
+                            outcome="hit" if record else "miss")
+        if record is None:
+            route.fallback()
+            return
+        route.fulfill(status=record.status, body=record.body, content_type=record.content_type or "text/html")
+
+    target.route("**/*", handle)
@@ -0,0 +1,104 @@
+"""
+Benchmark page loads with and without resource blocking.
+For each target page, loads it N times in a fresh browser context per run:
+
+  baseline - every request allowed, goto + wait_for_load_state("networkidle")
+             (what the crawlers did before)
+  blocked  - crawl_common.resource_blocking route installed,
+             goto(wait_until="domcontentloaded") + wait for the crawler's selector
+
+and prints the median / mean time until the page is usable, the number of
+requests that went out and how many were aborted.
+
+Run: python benchmark_blocking.py [--runs 5] [--url URL --selector CSS [--site HOST]]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from playwright.sync_api import sync_playwright
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from crawl_common.resource_blocking import BlockStats, block_resources, wait_for_selector, site_of
+
+# (name, url, selector the crawler reads first)
+TARGETS = [
+    ("qdnd listing", "https://www.qdnd.vn/chinh-tri", "h3 a, .title-news a, a.title-news"),
+    ("tcqp listing", "https://tapchiqptd.vn/vi/nhung-chu-truong-cong-tac-lon-2.html", ".news-other-list p a"),
+    ("vbpl search", "https://vbpl.vn/boquocphong/Pages/vbpq-timkiem.aspx?dvid=314",
+     "input[type='submit'][value='Tìm kiếm'], a:has-text('Tìm kiếm')"),
+]
+
+TIMEOUT = 60
+
+
+def load_once(browser, url, selector, blocked, site):
+    context = browser.new_context()
+    stats = BlockStats()
+    requests = []
+    try:
+        if blocked:
+            block_resources(context, site=site, stats=stats)
+        page = context.new_page()
+        page.on("request", lambda request: requests.append(request.url))
+
+        start = time.perf_counter()
+        if blocked:
+            page.goto(url, timeout=TIMEOUT * 1000, wait_until="domcontentloaded")
+            found = wait_for_selector(page, selector, timeout=TIMEOUT)
+        else:
+            page.goto(url, timeout=TIMEOUT * 1000)
+            page.wait_for_load_state("networkidle", timeout=TIMEOUT * 1000)
+            found = page.locator(selector).count() > 0
+        elapsed = time.perf_counter() - start
+    finally:
+        context.close()
+    return elapsed, len(requests), stats.blocked, found
+
+
+def run(targets, runs, headless=True):
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless)
+        print(f"{'page':<16} {'mode':<9} {'median s':>9} {'mean s':>8} {'requests':>9} {'blocked':>8} {'found':>6}")
+        for name, url, selector, site in targets:
+            medians = {}
+            for mode in ("baseline", "blocked"):
+                times, request_counts, blocked_counts, found = [], [], [], True
+                for _ in range(runs):
+                    try:
+                        elapsed, requests, blocked, ok = load_once(browser, url, selector, mode == "blocked", site)
+                    except Exception as e:
+                        print(f"{name:<16} {mode:<9} error: {e}")
+                        continue
+                    times.append(elapsed)
+                    request_counts.append(requests)
+                    blocked_counts.append(blocked)
+                    found = found and ok
+                if not times:
+                    continue
+                medians[mode] = statistics.median(times)
+                print(f"{name:<16} {mode:<9} {medians[mode]:>9.2f} {statistics.mean(times):>8.2f} "
+                      f"{statistics.mean(request_counts):>9.0f} {statistics.mean(blocked_counts):>8.0f} "
+                      f"{'yes' if found else 'NO':>6}")
+            if len(medians) == 2 and medians["blocked"] > 0:
+                print(f"{name:<16} speedup   {medians['baseline'] / medians['blocked']:>9.2f}x")
+        browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark resource blocking + selector waits")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--url", help="Benchmark a single page instead of the default targets")
+    parser.add_argument("--selector", default="body")
+    parser.add_argument("--site", help="Allowlist to apply (defaults to the URL's host)")
+    parser.add_argument("--headed", action="store_true")
+    args = parser.parse_args()
+
+    if args.url:
+        targets = [("custom", args.url, args.selector, args.site or site_of(args.url))]
+    else:
+        targets = [(name, url, selector, site_of(url)) for name, url, selector in TARGETS]
+    run(targets, args.runs, headless=not args.headed)
@@ -0,0 +1,152 @@
+"""
+Micro-benchmark for article cleaning.
+Runs the per-line loops the crawlers used before (a Python `in` test per
+line per marker, and the VBPL noise_phrases list comprehension) and
+crawl_common.text_clean on the same texts, checks that the outputs are
+identical, and prints the best time of each.
+
+Texts are synthetic by default: a VBPL law of --mb megabytes (articles,
+clauses, noise lines scattered through it) and qdnd / tcqp articles with
+their header and footer blocks. Real documents can be used instead with
+--shards crawled_data/shards (records are cleaned with the rules of the
+site of their URL).
+
+Run: python benchmark_cleaning.py [--mb 4] [--repeat 5] [--shards DIR]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from crawl_common.shard_writer import iter_records
+from crawl_common.text_clean import SITE_RULES, cleaner_for
+from crawl_common.resource_blocking import site_of
+
+VBPL_NOISE = ["Văn bản quy phạm pháp luật", "Văn bản hợp nhất", "Hệ thống hóa VBQPPL", "Mục lục văn bản"]
+WORDS = ("quy định điều khoản thi hành quốc phòng nhiệm vụ cơ quan đơn vị trách nhiệm tổ chức "
+         "cá nhân bộ trưởng hướng dẫn thực hiện kể từ ngày ký ban hành theo pháp luật").split()
+
+
+def legacy_cut(content, stop_markers, header_markers=()):
+    """The loop QDNDCrawler/TCQPCrawler.clean_content ran before text_clean."""
+    lines = content.split('\n')
+    if header_markers:
+        start_index = 0
+        for i, line in enumerate(lines[:30]):
+            if any(marker in line for marker in header_markers):
+                start_index = i + 1
+                break
+        lines = lines[start_index:]
+    cleaned_lines = []
+    for line in lines:
+        is_stop = False
+        for marker in stop_markers:
+            if marker in line:
+                if len(line.strip()) < 100:
+                    is_stop = True
+                    break
+        if is_stop:
+            break
+        cleaned_lines.append(line)
+    return '\n'.join(cleaned_lines)
+
+
+def legacy_vbpl(content):
+    lines = content.split('\n')
+    cleaned_lines = [line for line in lines if line.strip() not in VBPL_NOISE]
+    return '\n'.join(cleaned_lines)
+
+
+def legacy_for(site):
+    rules = SITE_RULES[site]
+    if rules.drop_lines:
+        return legacy_vbpl
+    return lambda content: legacy_cut(content, rules.footer_cut, rules.header_cut)
+
+
+def sentence(rng, words=20):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def vbpl_document(megabytes, seed=0):
+    rng = random.Random(seed)
+    parts, size, article = ["BỘ QUỐC PHÒNG", "THÔNG TƯ", "Mục lục văn bản"], 0, 1
+    while size < megabytes * 1024 * 1024:
+        block = [f"Điều {article}. {sentence(rng, 8)}"]
+        block += [f"{k}. {sentence(rng, rng.randint(15, 60))}" for k in range(1, rng.randint(3, 8))]
+        if rng.random() < 0.05:
+            block.append(f"  {rng.choice(VBPL_NOISE)} ")
+        parts += block
+        size += sum(len(line.encode("utf-8")) + 1 for line in block)
+        article += 1
+    return "\n".join(parts)
+
+
+def news_article(site, paragraphs=40, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    if site == "tapchiqptd.vn":
+        lines += ["Tòa soạn: 7 Phan Đình Giót", "Điện thoại: 069.000000", "Tạp chí và Tòa soạn"]
+    lines += [sentence(rng, rng.randint(30, 90)) for _ in range(paragraphs)]
+    # A long paragraph that mentions a marker must not end the article
+    lines.insert(len(lines) // 2, sentence(rng, 40) + " Xem thêm TAG trong bài " + sentence(rng, 10))
+    lines += ["TAG", "quốc phòng", "Ý KIẾN BẠN ĐỌC", sentence(rng), "TIN, BÀI XEM NHIỀU"]
+    return "\n".join(lines)
+
+
+def best_time(fn, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def shard_texts(shard_dir, limit):
+    texts = {}
+    for record in iter_records(shard_dir):
+        site = site_of(record.get("url", ""))
+        site = next((name for name in SITE_RULES if site == name or site.endswith("." + name)), None)
+        if site:
+            texts.setdefault(site, []).append(record.get("content", ""))
+        if sum(len(v) for v in texts.values()) >= limit:
+            break
+    return texts
+
+
+def run(texts, repeat):
+    print(f"{'site':<15} {'docs':>5} {'MB':>7} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8} {'same':>5}")
+    for site, docs in texts.items():
+        legacy, cleaner = legacy_for(site), cleaner_for(site)
+        same = all(legacy(text) == cleaner.clean(text) for text in docs)
+        legacy_time = best_time(legacy, docs, repeat)
+        engine_time = best_time(cleaner.clean, docs, repeat)
+        megabytes = sum(len(text.encode("utf-8")) for text in docs) / 1024 / 1024
+        print(f"{site:<15} {len(docs):>5} {megabytes:>7.2f} {legacy_time * 1000:>10.2f} "
+              f"{engine_time * 1000:>10.2f} {legacy_time / engine_time:>7.1f}x {'yes' if same else 'NO':>5}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the article cleaning engine against the old line loops")
+    parser.add_argument("--mb", type=float, default=4.0, help="Size of the synthetic VBPL document")
+    parser.add_argument("--articles", type=int, default=200, help="Synthetic qdnd / tcqp articles")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--shards", help="Clean the records of this shard directory instead")
+    parser.add_argument("--limit", type=int, default=2000, help="Records read from --shards")
+    args = parser.parse_args()
+
+    if args.shards:
+        texts = shard_texts(args.shards, args.limit)
+    else:
+        texts = {
+            "vbpl.vn": [vbpl_document(args.mb)],
+            "qdnd.vn": [news_article("qdnd.vn", seed=i) for i in range(args.articles)],
+            "tapchiqptd.vn": [news_article("tapchiqptd.vn", seed=i) for i in range(args.articles)],
+        }
+    run(texts, args.repeat)
@@ -1,11 +1,43 @@
 import time
 import os
-import random
+import sys
 from playwright.sync_api import sync_playwright
-from utils import save_article, ensure_dir
+from utils import save_article, close_shard_writer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from crawl_common.rate_limiter import default_limiter, host_of
+from crawl_common.metrics import DETAIL_FETCH, LIST_FETCH, configure_metrics, default_metrics
+from crawl_common.incremental import IncrementalCrawl, update_state
+from crawl_common.resource_blocking import block_resources, wait_for_selector
+from crawl_common.http_cache import ResponseCache, cache_route
+from crawl_common.text_clean import cleaner_for
+from crawl_common.article_store import ensure_dir
+from crawl_common.warc_archive import archive_page, configure_archive, get_archive, is_replayed, replay_route
 
 BASE_URL = "https://tapchiqptd.vn/vi/nhung-chu-truong-cong-tac-lon-2.html"
 OUTPUT_DIR = "crawled_data"
+# "incremental": once a full pass has reached the last page, start from page 1 and stop at
+# the first page with nothing new (or past the date watermark); "full": always resume from last_page
+CRAWL_MODE = "incremental"
+# Abort images, fonts, media and ad/analytics requests (see crawl_common/resource_blocking.py)
+BLOCK_RESOURCES = True
+LIST_SELECTOR = ".news-other-list p a"
+ARTICLE_SELECTOR = "h1"
+# Listing pages go through an on-disk HTTP cache (see crawl_common/http_cache.py): after a
+# restart they are revalidated with conditional GETs and the cached page is reused on a 304
+LISTING_CACHE = True
+LISTING_CACHE_DB = "listing_cache.db"
+# Write listing and article DOMs to a WARC archive (crawl_common/warc_archive.py; CRAWL_ARCHIVE_DIR
+# turns it on too). With CRAWL_ARCHIVE_REPLAY=1 archived pages are served from it, without the rate limiter
+ARCHIVE_HTML = False
+ARCHIVE_DIR = os.path.join(OUTPUT_DIR, "archive")
+
+def goto(page, url, timeout):
+    """page.goto through the rate limiter, unless the page is replayed from the archive."""
+    load = lambda: page.goto(url, timeout=timeout, wait_until="domcontentloaded")
+    if is_replayed(url):
+        return load()
+    return default_limiter.call(url, load)
 
 class TCQPCrawler:
     def __init__(self):
@@ -14,6 +46,7 @@ class TCQPCrawler:
         self.processed_file = "processed_urls.txt"
         self.state_file = "crawler_state.json"
         self.processed_urls = self.load_processed_urls()
+        self.incremental = IncrementalCrawl(self.state_file, enabled=CRAWL_MODE == "incremental")
 
     def load_processed_urls(self):
         if not os.path.exists(self.processed_file):
@@ -27,9 +60,7 @@ class TCQPCrawler:
         self.processed_urls.add(url)
 
     def save_state(self, page_num):
-        import json
-        with open(self.state_file, 'w') as f:
-            json.dump({"last_page": page_num}, f)
+        update_state(self.state_file, last_page=page_num)
 
     def load_state(self):
         import json
@@ -46,11 +77,23 @@ class TCQPCrawler:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
             context = browser.new_context()
+            if BLOCK_RESOURCES:
+                block_resources(context, site=BASE_URL)
+            archive = get_archive()
+            if archive is not None and archive.replay:
+                replay_route(context, archive)
             page = context.new_page()
+            if LISTING_CACHE and not (archive is not None and archive.replay):
+                # Only listing pages are loaded in this page; articles open in their own
+                cache_route(page, ResponseCache(LISTING_CACHE_DB), lambda url: url.startswith(BASE_URL))
 
             # Load start page
-            start_page = self.load_state()
-            print(f"Resuming from Page {start_page}...")
+            if self.incremental.active:
+                start_page = 1
+                print("Incremental crawl from Page 1...")
+            else:
+                start_page = self.load_state()
+                print(f"Resuming from Page {start_page}...")
 
             page_num = start_page
             while True:
@@ -62,37 +105,45 @@ class TCQPCrawler:
                 
                 print(f"Navigating to: {current_url}")
                 try:
-                    page.goto(current_url, timeout=60000)
-                    page.wait_for_load_state("networkidle")
+                    with default_metrics.stage(LIST_FETCH, host_of(current_url), page=page_num):
+                        goto(page, current_url, 60000)
+                        wait_for_selector(page, LIST_SELECTOR)
+                    archive_page(current_url, page.content)
                 except Exception as e:
                     print(f"Error loading page {current_url}: {e}")
                     time.sleep(5)
                     try:
-                        page.goto(current_url, timeout=60000)
+                        goto(page, current_url, 60000)
                     except:
                         print("Skipping page due to error.")
                         page_num += 1
                         continue
 
-                self.save_state(page_num)
+                if not self.incremental.active:
+                    self.save_state(page_num)
                 
                 # Get article links
                 # Selector: .news-other-list p a
-                potential_links = page.locator(".news-other-list p a").all()
+                potential_links = page.locator(LIST_SELECTOR).all()
                 
                 article_links = []
+                page_links = []
                 for link in potential_links:
                     href = link.get_attribute("href")
                     if href:
                         full_url = href if href.startswith("http") else "https://tapchiqptd.vn" + href
+                        page_links.append(full_url)
                         if full_url not in article_links and full_url not in self.processed_urls:
                             article_links.append(full_url)
                 
                 print(f"  Found {len(article_links)} new articles on page {page_num}.")
                 
                 for url in article_links:
-                    time.sleep(random.uniform(1, 3))
-                    self.process_article(page, url)
+                    self.incremental.seen(self.process_article(page, url))
+
+                if self.incremental.should_stop(page_num, page_links, self.processed_urls):
+                    self.incremental.finish()
+                    break
                 
                 # Pagination Logic
                 # Check if "Next" button exists
@@ -102,64 +153,21 @@ class TCQPCrawler:
                 
                 if not next_btn.is_visible() and len(article_links) == 0:
                     print("  No articles and no next page found. Ending.")
+                    self.incremental.finish()
                     break
                 
                 if not next_btn.is_visible():
                      print("  No next page button found. Ending.")
+                     self.incremental.finish()
                      break
                 
                 page_num += 1
-                time.sleep(2)
 
             browser.close()
 
     def clean_content(self, content):
-        lines = content.split('\n')
-        
-        # 1. Remove Header Noise
-        # The header block starts with "Tòa soạn:" and ends with "Tạp chí và Tòa soạn"
-        # We'll look for "Tạp chí và Tòa soạn" in the first 30 lines and cut everything before it.
-        start_index = 0
-        for i, line in enumerate(lines[:30]):
-            if "Tạp chí và Tòa soạn" in line:
-                start_index = i + 1
-                break
-        
-        # If we didn't find the exact end marker, but see "Tòa soạn:" at start, 
-        # we might need a fallback, but let's stick to the user's observation.
-        # If "Tạp chí và Tòa soạn" is found, we skip to the line after it.
-        
-        lines = lines[start_index:]
-        
-        cleaned_lines = []
-        stop_markers = [
-            "Nguồn: qdnd.vn",
-            "TAG",
-            "Ý KIẾN BẠN ĐỌC",
-            "CÁC TIN, BÀI ĐÃ ĐƯA",
-            "Tạp chí và Tòa soạn", # Also a stop marker if it appears again at bottom? 
-            # Actually, "Tạp chí và Tòa soạn" is in the header list provided by user.
-            # But it might also be in the footer? 
-            # The user said "trở xuống thì xoá hết" for the footer part.
-            # And for the header "trước khi save về, hãy xoá cái này đi".
-            
-            "TIÊU ĐIỂM",
-            "TIN, BÀI XEM NHIỀU"
-        ]
-        
-        for line in lines:
-            is_stop = False
-            for marker in stop_markers:
-                if marker in line:
-                    # Check if it's a standalone marker or significant enough
-                    if len(line.strip()) < 100: # Markers are usually short headers
-                        is_stop = True
-                        break
-            if is_stop:
-                break
-            cleaned_lines.append(line)
-            
-        return '\n'.join(cleaned_lines)
+        # Header/footer markers: SITE_RULES in crawl_common/text_clean.py
+        return cleaner_for(BASE_URL).clean(content)
 
     def process_article(self, main_page, url):
         context = main_page.context
@@ -167,8 +175,10 @@ class TCQPCrawler:
         
         try:
             print(f"    Processing: {url}")
-            page.goto(url, timeout=30000)
-            page.wait_for_load_state("domcontentloaded")
+            with default_metrics.stage(DETAIL_FETCH, host_of(url)):
+                goto(page, url, 30000)
+                wait_for_selector(page, ARTICLE_SELECTOR)
+            archive_page(url, page.content)
             
             # Extract Content
             title = page.title()
@@ -199,6 +209,7 @@ class TCQPCrawler:
             
             if save_article(self.output_dir, metadata, content):
                 self.mark_as_processed(url)
+            return date
                 
         except Exception as e:
             print(f"    Error processing {url}: {e}")
@@ -206,5 +217,10 @@ class TCQPCrawler:
             page.close()
 
 if __name__ == "__main__":
+    configure_metrics()
+    configure_archive({"archive_dir": ARCHIVE_DIR} if ARCHIVE_HTML else None)
     crawler = TCQPCrawler()
-    crawler.run()
+    try:
+        crawler.run()
+    finally:
+        close_shard_writer()
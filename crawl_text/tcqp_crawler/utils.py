@@ -1,49 +1,43 @@
 import os
-import re
+import sys
 
-def sanitize_filename(name):
-    """
-    Sanitizes a string to be safe for use as a filename.
-    """
-    name = re.sub(r'[\\/*?:"<>|]', '_', name)
-    name = name.strip().strip('.')
-    return name[:200]
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from crawl_common.article_store import ArticleStore, export_txt
 
-def ensure_dir(directory):
-    """
-    Ensures that a directory exists.
-    """
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+# How articles are written (see crawl_common/article_store.py):
+#   "shards" - append JSONL records to size-capped shards under SHARD_DIR, indexed by URL
+#              (export the .txt files with: python utils.py export)
+#   "txt"    - one .txt file per article under output_dir
+OUTPUT_FORMAT = "shards"
+SHARD_DIR = os.path.join("crawled_data", "shards")
+SHARD_MAX_BYTES = 256 * 1024 * 1024
+SHARD_COMPRESSION = None # or "zstd" (needs the zstandard package)
+
+# Content-level dedup: an article whose text is a near-duplicate (MinHash/LSH, see
+# crawl_common/near_dup.py) of one already saved is recorded as an alias in NEAR_DUP_DB
+# instead of being stored again. Index existing shards once with:
+#   python -m crawl_common.near_dup crawled_data/near_dup.db crawled_data/shards
+NEAR_DUP_CHECK = True
+NEAR_DUP_DB = os.path.join("crawled_data", "near_dup.db")
+NEAR_DUP_THRESHOLD = 0.8
+
+store = ArticleStore(SHARD_DIR, output_format=OUTPUT_FORMAT, max_bytes=SHARD_MAX_BYTES,
+                     compression=SHARD_COMPRESSION, near_dup_db=NEAR_DUP_DB if NEAR_DUP_CHECK else None,
+                     near_dup_threshold=NEAR_DUP_THRESHOLD)
 
 def save_article(output_dir, metadata, content):
     """
-    Saves article content and metadata.
-    Structure: output_dir/Title.txt
+    Saves the article through the store (shards or .txt, near-duplicates as aliases).
     """
-    ensure_dir(output_dir)
-    
-    title = metadata.get('title', 'Untitled')
-    date = metadata.get('date', 'Unknown_Date')
-    url = metadata.get('url', 'N/A')
-    
-    filename = f"{sanitize_filename(title)}.txt"
-    file_path = os.path.join(output_dir, filename)
-    
-    # Avoid overwriting if possible, or append ID if available
-    # For now, just save.
-    
-    file_content = f"Title: {title}\n"
-    file_content += f"Date: {date}\n"
-    file_content += f"URL: {url}\n"
-    file_content += "-" * 40 + "\n\n"
-    file_content += content
-    
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(file_content)
-        print(f"Saved: {file_path}")
-        return True
-    except Exception as e:
-        print(f"Error saving {file_path}: {e}")
-        return False
+    return store.save(output_dir, metadata, content)
+
+def close_shard_writer():
+    store.close()
+
+if __name__ == "__main__":
+    # python utils.py export [shard_dir] [output_dir]
+    if len(sys.argv) < 2 or sys.argv[1] != "export":
+        print("Usage: python utils.py export [shard_dir] [output_dir]")
+        sys.exit(1)
+    export_txt(sys.argv[2] if len(sys.argv) > 2 else SHARD_DIR,
+               sys.argv[3] if len(sys.argv) > 3 else "crawled_data")
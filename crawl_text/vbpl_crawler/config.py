@@ -38,4 +38,50 @@ TARGET_DOC_TYPES = [
     "Thông tư liên tịch"
 ]
 
+# Metadata still unknown after the properties tab is taken from the first
+# 1000 characters of the text: {field: (unknown value, candidates)}
+INFER_FIELDS = {
+    "agency": ("Unknown_Agency", TARGET_AGENCIES),
+    "type": ("Unknown_Type", TARGET_DOC_TYPES),
+}
+
 OUTPUT_DIR = os.path.join(os.getcwd(), "crawled_data")
+
+# Number of documents extracted in parallel (one browser context each)
+BROWSER_POOL_SIZE = 4
+
+# How detail pages are extracted:
+#   "http"    - fetch the Toàn văn / Thuộc tính pages directly and parse the HTML (no browser)
+#   "browser" - open each document in a Playwright page and click through the tabs
+EXTRACTION_MODE = "http"
+HTTP_CONCURRENCY = 4
+
+# crawl_all.py: number of worker processes the search result pages are split across.
+# 1 walks the pages one after another (crawler_state.json); with more, the page count
+# is read from the pager and each worker crawls a contiguous range in its own browser,
+# tracking progress in crawler_state_shard_<i>.json (plan in crawler_state_shards.json).
+# Every worker has its own rate limiter, so vbpl.vn sees up to PAGE_WORKERS times the load.
+# Each worker also reports its own metrics (CRAWL_METRICS_SNAPSHOT / CRAWL_JSON_LOG get a -w<i>
+# suffix, its endpoint is on CRAWL_METRICS_PORT + 1 + i); the parent keeps the base names and port.
+PAGE_WORKERS = 1
+
+# How documents are written:
+#   "shards" - append JSONL records to size-capped shards under SHARD_DIR, indexed by ItemID
+#              (export the .txt tree with: python utils.py export)
+#   "txt"    - one .txt file per document under OUTPUT_DIR/[Agency]/[Type]/
+OUTPUT_FORMAT = "shards"
+SHARD_DIR = os.path.join(OUTPUT_DIR, "shards")
+SHARD_MAX_BYTES = 256 * 1024 * 1024
+SHARD_COMPRESSION = None # or "zstd" (needs the zstandard package)
+
+# Also write every fetched page to a WARC archive (crawl_common/warc_archive.py; the
+# CRAWL_ARCHIVE_DIR environment variable turns it on too). `python utils.py rebuild`
+# re-extracts the documents from it without the network.
+ARCHIVE_HTML = False
+ARCHIVE_DIR = os.path.join(OUTPUT_DIR, "archive")
+ARCHIVE_CONFIG = {"archive_dir": ARCHIVE_DIR} if ARCHIVE_HTML else None
+
+# Abort images, fonts, media and ad/analytics requests in the Playwright sessions
+# and wait for the result/detail selectors instead of networkidle
+# (allowlist in crawl_common/resource_blocking.py SITE_ALLOWLISTS)
+BLOCK_RESOURCES = True
@@ -1,20 +1,72 @@
-import time
+import asyncio
+import json
+import multiprocessing
 import os
-import random
+import sys
 import re
-from playwright.sync_api import sync_playwright
-from config import TARGET_AGENCIES, TARGET_DOC_TYPES, OUTPUT_DIR
-from utils import save_document, ensure_dir
+from playwright.async_api import async_playwright
+from config import TARGET_AGENCIES, TARGET_DOC_TYPES, OUTPUT_DIR, BROWSER_POOL_SIZE, EXTRACTION_MODE, HTTP_CONCURRENCY, BLOCK_RESOURCES, PAGE_WORKERS, ARCHIVE_CONFIG, INFER_FIELDS
+from utils import save_document, ensure_dir, close_shard_writer, set_shard_prefix
+import html_extract
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from crawl_common.browser_pool import PagePool
+from crawl_common.fetch import AsyncFetcher
+from crawl_common.metrics import configure_metrics
+from crawl_common.rate_limiter import default_limiter
+from crawl_common.text_clean import cleaner_for, infer_fields
+from crawl_common.warc_archive import archive_page, configure_archive, get_archive
+from crawl_common.resource_blocking import (block_resources_async, click_tab_async, wait_for_selector_async,
+                                            wait_for_new_results_async, first_href_async)
 
 # URL for the search page
 SEARCH_URL = "https://vbpl.vn/boquocphong/Pages/vbpq-timkiem.aspx?dvid=314"
+SEARCH_BUTTON_SELECTOR = "input[type='submit'][value='Tìm kiếm'], a:has-text('Tìm kiếm')"
+RESULT_LINK_SELECTOR = "a[href*='ItemID=']"
+PAGE_LINK_RE = re.compile(r"LoadPage\((\d+)\)")
+# Elements only the "Thuộc tính" / "Toàn văn" tab pages have
+PROPERTIES_SELECTOR = "td:has-text('Cơ quan ban hành'), td:has-text('Trích yếu')"
+CONTENT_SELECTOR = "#toanvancontent, .box-content, .content-detail"
+
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8"
+}
+
+def split_page_range(total_pages, workers):
+    """Splits pages 1..total_pages into at most `workers` contiguous (start, end) ranges."""
+    size = -(-total_pages // workers)
+    return [(start, min(start + size - 1, total_pages)) for start in range(1, total_pages + 1, size)]
+
+async def read_page_count(page):
+    """Highest LoadPage(N) in the result pager (its last-page link), or None without a pager."""
+    pages = [int(n) for n in PAGE_LINK_RE.findall(await page.content())]
+    return max(pages) if pages else None
+
+def run_page_shard(index, start_page, end_page):
+    """Worker process entry point: crawls one range of search result pages."""
+    # Each worker appends to its own shard and archive files (the indexes are shared)
+    set_shard_prefix(f"shard-w{index}")
+    configure_archive(ARCHIVE_CONFIG, prefix=f"archive-w{index}")
+    # Stage metrics live in this process: own snapshot/log files, port + 1 + index
+    configure_metrics(worker=index)
+    crawler = VBPLCrawlAll(shard=(index, start_page, end_page))
+    try:
+        crawler.run()
+    finally:
+        close_shard_writer()
 
 class VBPLCrawlAll:
-    def __init__(self):
+    def __init__(self, shard=None):
         self.output_dir = OUTPUT_DIR
         ensure_dir(self.output_dir)
         self.processed_ids_file = os.path.join(self.output_dir, "processed_ids.txt")
         self.state_file = os.path.join(self.output_dir, "crawler_state.json")
+        self.plan_file = os.path.join(self.output_dir, "crawler_state_shards.json")
+        # (index, start_page, end_page) when this process crawls one range of a sharded run
+        self.shard = shard
+        if shard is not None:
+            self.state_file = self.shard_state_file(shard[0])
         self.processed_ids = self.load_processed_ids()
 
     def load_processed_ids(self):
@@ -28,70 +80,190 @@ class VBPLCrawlAll:
             f.write(f"{item_id}\n")
         self.processed_ids.add(item_id)
 
-    def save_state(self, page_num):
-        import json
+    def shard_state_file(self, index):
+        return os.path.join(self.output_dir, f"crawler_state_shard_{index}.json")
+
+    def save_state(self, page_num, done=False):
+        state = {"last_page": page_num}
+        if self.shard is not None:
+            state.update(start=self.shard[1], end=self.shard[2], done=done)
         with open(self.state_file, 'w') as f:
-            json.dump({"last_page": page_num}, f)
+            json.dump(state, f)
 
-    def load_state(self):
-        import json
-        if not os.path.exists(self.state_file):
-            return 1
+    def load_state(self, state_file=None):
+        default = {"last_page": self.shard[1] if self.shard else 1}
+        state_file = state_file or self.state_file
+        if not os.path.exists(state_file):
+            return default
         try:
-            with open(self.state_file, 'r') as f:
-                data = json.load(f)
-                return data.get("last_page", 1)
+            with open(state_file, 'r') as f:
+                return {**default, **json.load(f)}
         except:
-            return 1
+            return default
 
     def run(self):
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context()
-            page = context.new_page()
-
-            print(f"Navigating to Search Page: {SEARCH_URL}")
-            page.goto(SEARCH_URL, timeout=60000)
-            page.wait_for_load_state("networkidle")
-
-            # Click Search button to get all results
-            print("Clicking Search button to list all documents...")
-            search_btn = page.locator("input[type='submit'][value='Tìm kiếm'], a:has-text('Tìm kiếm')").first
-            if search_btn.is_visible():
-                search_btn.click()
-                page.wait_for_load_state("networkidle")
-                time.sleep(3) # Wait for results to populate
-            else:
-                print("Error: Search button not found!")
+        if PAGE_WORKERS > 1 and self.shard is None:
+            self.run_sharded()
+        else:
+            asyncio.run(self.crawl())
+
+    def run_sharded(self):
+        """Splits the result pages into PAGE_WORKERS ranges and crawls each in its own process."""
+        ranges = self.load_plan()
+        if ranges is None:
+            total_pages = asyncio.run(self.count_pages())
+            if not total_pages:
+                print("Could not read the number of result pages; crawling sequentially.")
+                asyncio.run(self.crawl())
+                return
+            ranges = split_page_range(total_pages, PAGE_WORKERS)
+            self.save_plan(total_pages, ranges)
+            print(f"{total_pages} result pages split into {len(ranges)} ranges: {ranges}")
+
+        pending = []
+        for index, (start_page, end_page) in enumerate(ranges):
+            state = self.load_state(self.shard_state_file(index))
+            if state.get("done"):
+                print(f"  Range {index} (pages {start_page}-{end_page}) already done.")
+                continue
+            pending.append((index, start_page, end_page))
+
+        # spawn: every worker starts its own Playwright driver from a clean process
+        ctx = multiprocessing.get_context("spawn")
+        workers = [ctx.Process(target=run_page_shard, args=job, name=f"vbpl-pages-{job[0]}") for job in pending]
+        for worker in workers:
+            worker.start()
+        for (index, start_page, end_page), worker in zip(pending, workers):
+            worker.join()
+            state = self.load_state(self.shard_state_file(index))
+            print(f"  Range {index} (pages {start_page}-{end_page}): exit code {worker.exitcode}, "
+                  f"{'done' if state.get('done') else 'stopped at page ' + str(state['last_page'])}")
+
+    def load_plan(self):
+        """Page ranges of an unfinished sharded run, or None to plan a new pass."""
+        if not os.path.exists(self.plan_file):
+            return None
+        try:
+            with open(self.plan_file, 'r') as f:
+                ranges = [tuple(r) for r in json.load(f)["ranges"]]
+        except Exception as e:
+            print(f"Could not read {self.plan_file}: {e}")
+            return None
+        if all(self.load_state(self.shard_state_file(i)).get("done") for i in range(len(ranges))):
+            return None
+        print(f"Resuming sharded run: {len(ranges)} ranges from {self.plan_file}")
+        return ranges
+
+    def save_plan(self, total_pages, ranges):
+        # A new pass: forget the progress of the previous one
+        for name in os.listdir(self.output_dir):
+            if re.match(r"crawler_state_shard_\d+\.json$", name):
+                os.remove(os.path.join(self.output_dir, name))
+        with open(self.plan_file, 'w') as f:
+            json.dump({"total_pages": total_pages, "ranges": ranges}, f)
+
+    async def count_pages(self):
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            context = await browser.new_context()
+            if BLOCK_RESOURCES:
+                await block_resources_async(context, site="vbpl.vn")
+            page = await context.new_page()
+            try:
+                if not await self.open_search(page):
+                    return None
+                return await read_page_count(page)
+            finally:
+                await browser.close()
+
+    async def open_search(self, page):
+        """Loads the search page and lists all documents; returns False if the search button is missing."""
+        print(f"Navigating to Search Page: {SEARCH_URL}")
+        await page.goto(SEARCH_URL, timeout=60000, wait_until="domcontentloaded")
+        await wait_for_selector_async(page, SEARCH_BUTTON_SELECTOR)
+
+        # Click Search button to get all results
+        print("Clicking Search button to list all documents...")
+        search_btn = page.locator(SEARCH_BUTTON_SELECTOR).first
+        if not await search_btn.is_visible():
+            print("Error: Search button not found!")
+            return False
+        await search_btn.click()
+        await wait_for_selector_async(page, RESULT_LINK_SELECTOR)
+        return True
+
+    async def crawl(self):
+        if EXTRACTION_MODE == "http":
+            # Detail pages are fetched and parsed without a browser;
+            # Playwright only drives the search listing
+            async with AsyncFetcher(per_host_concurrency=HTTP_CONCURRENCY,
+                                    rate_limiter=default_limiter) as fetcher:
+                self.fetcher = fetcher
+                self.pool = None
+                await self.crawl_listing()
+        else:
+            self.fetcher = None
+            await self.crawl_listing()
+
+    async def crawl_listing(self):
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            context = await browser.new_context()
+            if BLOCK_RESOURCES:
+                await block_resources_async(context, site="vbpl.vn")
+            page = await context.new_page()
+
+            if self.fetcher is None:
+                # Detail pages are extracted in parallel on a bounded pool of recycled pages
+                setup = (lambda ctx: block_resources_async(ctx, site="vbpl.vn")) if BLOCK_RESOURCES else None
+                self.pool = PagePool(browser, size=BROWSER_POOL_SIZE, context_setup=setup)
+                await self.pool.start()
+
+            if not await self.open_search(page):
+                await self.close_pool()
+                await browser.close()
                 return
 
             # Load start page
-            start_page = self.load_state()
+            start_page = self.load_state()["last_page"]
+            end_page = self.shard[2] if self.shard else None
+            if self.shard is not None:
+                print(f"Range {self.shard[0]}: pages {start_page}-{end_page}")
             if start_page > 1:
                 print(f"Resuming from Page {start_page}...")
                 # Execute JavaScript to jump to page
                 try:
-                    page.evaluate(f"LoadPage({start_page})")
-                    page.wait_for_load_state("networkidle")
-                    time.sleep(3)
+                    previous = await first_href_async(page, RESULT_LINK_SELECTOR)
+                    await page.evaluate(f"LoadPage({start_page})")
+                    if not await wait_for_new_results_async(page, RESULT_LINK_SELECTOR, previous):
+                        raise RuntimeError("results did not change")
                 except Exception as e:
                     print(f"Error jumping to page {start_page}: {e}")
+                    if self.shard is not None:
+                        # Crawling from page 1 would redo another worker's range
+                        await self.close_pool()
+                        await browser.close()
+                        return
                     print("Falling back to Page 1")
                     start_page = 1
 
             # Pagination Loop
             page_num = start_page
             while True:
+                if end_page is not None and page_num > end_page:
+                    print(f"    End of range {self.shard[0]}.")
+                    self.save_state(page_num, done=True)
+                    break
                 print(f"  Crawling Page {page_num}...")
                 self.save_state(page_num) # Save current page
                 
                 # Get all document links on current page
                 # Selector: a[href*='ItemID=']
-                potential_links = page.locator("a[href*='ItemID=']").all()
+                potential_links = await page.locator(RESULT_LINK_SELECTOR).all()
                 
                 doc_links = []
                 for link in potential_links:
-                    href = link.get_attribute("href")
+                    href = await link.get_attribute("href")
                     # Filter for relevant detail pages
                     if href and ("toanvan.aspx" in href or "vanbanhopnhat.aspx" in href or "hethonghoa.aspx" in href):
                         full_url = href if href.startswith("http") else "https://vbpl.vn" + href
@@ -100,6 +272,7 @@ class VBPLCrawlAll:
                 
                 print(f"    Found {len(doc_links)} documents on this page.")
                 
+                jobs = []
                 for doc_url in doc_links:
                     # Extract ItemID
                     item_id_match = re.search(r'ItemID=(\d+)', doc_url)
@@ -109,76 +282,113 @@ class VBPLCrawlAll:
                         print(f"    Skipping {item_id} (Already processed)")
                         continue
                     
-                    # Random delay
-                    sleep_time = random.uniform(2, 5)
-                    print(f"    Waiting {sleep_time:.2f}s...")
-                    time.sleep(sleep_time)
-                        
-                    self.process_document(page, doc_url, item_id)
+                    jobs.append(self.process_document(doc_url, item_id))
+                
+                # Every job waits for a free page from the pool (or a per-host
+                # HTTP slot), so only a bounded number of documents are in flight
+                await asyncio.gather(*jobs)
                 
                 # Next Page
                 # Search page uses "Sau" for next page, or javascript:LoadPage()
                 next_btn = page.locator("a:has-text('Sau'), a:has-text('Next'), a[title='Trang sau']").first
                 
-                if next_btn.is_visible():
+                if await next_btn.is_visible():
                     print("    Navigating to next page...")
-                    next_btn.click()
-                    page.wait_for_load_state("networkidle")
-                    time.sleep(3)
+                    previous = await first_href_async(page, RESULT_LINK_SELECTOR)
+                    await next_btn.click()
+                    if not await wait_for_new_results_async(page, RESULT_LINK_SELECTOR, previous):
+                        print("    Results did not change after clicking next.")
                     page_num += 1
                 else:
                     print("    No more pages.")
+                    if self.shard is not None:
+                        self.save_state(page_num, done=True)
                     break
 
-            browser.close()
+            await self.close_pool()
+            await browser.close()
 
-    def process_document(self, main_page, doc_url, item_id):
-        context = main_page.context
-        page = context.new_page()
-        
+    async def close_pool(self):
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def process_document(self, doc_url, item_id):
+        # Politeness is handled per host by default_limiter (through the
+        # fetcher in http mode, around page.goto in browser mode)
+        if self.fetcher is not None:
+            await self.extract_document_http(doc_url, item_id)
+            return
+
+        async with self.pool.page() as page:
+            await self.extract_document(page, doc_url, item_id)
+
+    async def extract_document_http(self, doc_url, item_id):
+        try:
+            print(f"      Fetching: {doc_url}")
+            response = await self.fetcher.get(doc_url, headers=HTTP_HEADERS)
+            response.raise_for_status()
+            fulltext_tree = html_extract.parse_html(response.body, response.encoding)
+
+            properties_tree = None
+            properties_url = html_extract.find_properties_url(fulltext_tree, doc_url)
+            if properties_url:
+                props_response = await self.fetcher.get(properties_url, headers=HTTP_HEADERS)
+                if props_response.status < 400:
+                    properties_tree = html_extract.parse_html(props_response.body, props_response.encoding)
+                else:
+                    print(f"      Properties page returned HTTP {props_response.status}")
+
+            metadata, content = html_extract.extract_document(doc_url, fulltext_tree, properties_tree)
+            self.finish_document(metadata, content, item_id)
+
+        except Exception as e:
+            print(f"      Error processing document: {e}")
+
+    async def extract_document(self, page, doc_url, item_id):
         try:
             print(f"      Processing: {doc_url}")
-            page.goto(doc_url, timeout=30000)
-            page.wait_for_load_state("domcontentloaded")
+            await default_limiter.call_async(doc_url, lambda: page.goto(doc_url, timeout=30000, wait_until="domcontentloaded"))
+            # Raw DOM of both tabs, for `python utils.py rebuild` (http mode archives through the fetcher)
+            if get_archive() is not None:
+                archive_page(doc_url, await page.content())
             
             # 1. Switch to Properties Tab for Metadata
             properties_link = page.locator("a:has-text('Thuộc tính')").first
-            if properties_link.is_visible():
+            if await properties_link.is_visible():
                 print("      Switching to Properties tab...")
-                properties_link.click()
-                page.wait_for_load_state("networkidle")
-                time.sleep(1)
+                # The tab is a separate page; its table is in the server-rendered HTML
+                await click_tab_async(page, properties_link, PROPERTIES_SELECTOR)
+                if get_archive() is not None:
+                    archive_page(page.url, await page.content())
 
             # Metadata Extraction Helper
-            def get_metadata_value(label):
+            async def get_metadata_value(label):
                 el = page.locator(f"td:has-text('{label}') + td").first
-                if el.is_visible():
-                    return el.inner_text().strip()
+                if await el.is_visible():
+                    return (await el.inner_text()).strip()
                 return None
 
             # Title Extraction
-            title = page.title().strip()
+            title = (await page.title()).strip()
             title_candidate = page.locator(".title-vb, .vb-title, .title, strong").first
-            if title_candidate.is_visible():
-                 candidate_text = title_candidate.inner_text().strip()
+            if await title_candidate.is_visible():
+                 candidate_text = (await title_candidate.inner_text()).strip()
                  if len(candidate_text) > 10:
                      title = candidate_text
             
-            trich_yeu = get_metadata_value("Trích yếu")
+            trich_yeu = await get_metadata_value("Trích yếu")
             if trich_yeu:
                 title = trich_yeu
 
-            agency = get_metadata_value("Cơ quan ban hành")
-            doc_type = get_metadata_value("Loại văn bản")
-            date = get_metadata_value("Ngày ban hành") or "N/A"
+            agency = await get_metadata_value("Cơ quan ban hành")
+            doc_type = await get_metadata_value("Loại văn bản")
+            date = await get_metadata_value("Ngày ban hành") or "N/A"
             
             # 2. Switch back to Full Text Tab
             toanvan_link = page.locator("a:has-text('Toàn văn')").first
-            if toanvan_link.is_visible():
+            if await toanvan_link.is_visible():
                 print("      Switching back to Full Text tab...")
-                toanvan_link.click()
-                page.wait_for_load_state("networkidle")
-                time.sleep(1)
+                await click_tab_async(page, toanvan_link, CONTENT_SELECTOR)
 
             metadata = {
                 "url": doc_url,
@@ -189,35 +399,41 @@ class VBPLCrawlAll:
             }
             
             # 3. Content Extraction
-            content_div = page.locator("#toanvancontent, .box-content, .content-detail").first
-            if content_div.is_visible():
-                content = content_div.inner_text()
+            content_div = page.locator(CONTENT_SELECTOR).first
+            if await content_div.is_visible():
+                content = await content_div.inner_text()
             else:
                 main_col = page.locator("#main, .main, .col-md-9").first
-                if main_col.is_visible():
-                    content = main_col.inner_text()
+                if await main_col.is_visible():
+                    content = await main_col.inner_text()
                 else:
-                    content = page.locator("body").inner_text()
+                    content = await page.locator("body").inner_text()
             
-            # Clean noise
-            noise_phrases = ["Văn bản quy phạm pháp luật", "Văn bản hợp nhất", "Hệ thống hóa VBQPPL", "Mục lục văn bản"]
-            lines = content.split('\n')
-            cleaned_lines = [line for line in lines if line.strip() not in noise_phrases]
-            content = '\n'.join(cleaned_lines)
-
-            # 4. Save (Organizes into folders automatically via utils.save_document)
-            # Note: We save ALL documents found in search, as requested.
-            # If agency/type is unknown, it goes to Unknown folder.
-            
-            if save_document(self.output_dir, metadata, content):
-                if item_id:
-                    self.mark_as_processed(item_id)
+            self.finish_document(metadata, content, item_id)
 
         except Exception as e:
             print(f"      Error processing document: {e}")
-        finally:
-            page.close()
+
+    def finish_document(self, metadata, content, item_id):
+        # Clean noise (phrases in crawl_common/text_clean.py SITE_RULES)
+        content = cleaner_for("vbpl.vn").clean(content)
+
+        # Fill in agency/type the properties table didn't give from the content (config.INFER_FIELDS)
+        infer_fields(metadata, content, INFER_FIELDS)
+
+        # 4. Save (Organizes into folders automatically via utils.save_document)
+        # Note: We save ALL documents found in search, as requested.
+        # If agency/type is unknown, it goes to Unknown folder.
+        
+        if save_document(self.output_dir, metadata, content):
+            if item_id:
+                self.mark_as_processed(item_id)
 
 if __name__ == "__main__":
+    configure_metrics()
+    configure_archive(ARCHIVE_CONFIG)
     crawler = VBPLCrawlAll()
-    crawler.run()
+    try:
+        crawler.run()
+    finally:
+        close_shard_writer()
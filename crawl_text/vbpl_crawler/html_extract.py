@@ -0,0 +1,162 @@
+"""
+Browser-free extraction of VBPL detail pages.
+Parses the raw HTML of the "Toàn văn" (full text) and "Thuộc tính" (properties)
+pages with lxml and returns the same metadata dict / content that
+utils.save_document expects.
+"""
+
+from urllib.parse import urljoin
+import lxml.html
+
+# Tags after which inner_text() would start a new line
+BLOCK_TAGS = {
+    "p", "div", "tr", "li", "ul", "ol", "table", "h1", "h2", "h3", "h4",
+    "h5", "h6", "section", "article", "blockquote", "pre", "hr",
+}
+CELL_TAGS = {"td", "th"}
+SKIP_TAGS = {"script", "style", "noscript"}
+
+CONTENT_XPATHS = [
+    "//*[@id='toanvancontent']",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' box-content ')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' content-detail ')]",
+]
+MAIN_COLUMN_XPATHS = [
+    "//*[@id='main']",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' main ')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' col-md-9 ')]",
+]
+TITLE_XPATH = (
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' title-vb ')"
+    " or contains(concat(' ', normalize-space(@class), ' '), ' vb-title ')"
+    " or contains(concat(' ', normalize-space(@class), ' '), ' title ')]"
+    " | //strong"
+)
+
+
+def parse_html(body, encoding="utf-8"):
+    """Parses raw page bytes into an lxml tree (VBPL serves utf-8 pages)."""
+    parser = lxml.html.HTMLParser(encoding=encoding)
+    return lxml.html.fromstring(body, parser=parser)
+
+
+def element_text(el):
+    """
+    Approximates Playwright's inner_text(): text of the subtree with a line
+    break around block elements and scripts/styles dropped.
+    """
+    parts = []
+
+    def walk(node):
+        if not isinstance(node.tag, str) or node.tag in SKIP_TAGS:
+            if node.tail:
+                parts.append(node.tail)
+            return
+        if node.tag == "br":
+            parts.append("\n")
+            if node.tail:
+                parts.append(node.tail)
+            return
+        is_block = node.tag in BLOCK_TAGS
+        if is_block:
+            parts.append("\n")
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+        if is_block:
+            parts.append("\n")
+        elif node.tag in CELL_TAGS:
+            parts.append("\t")
+        if node.tail:
+            parts.append(node.tail)
+
+    walk(el)
+    lines = ["\t".join(" ".join(cell.split()) for cell in line.split("\t")).strip("\t")
+             for line in "".join(parts).split("\n")]
+    # Collapse the empty lines produced by nested blocks
+    text = "\n".join(lines)
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    return text.strip()
+
+
+def first_match(tree, xpaths):
+    for xpath in xpaths:
+        found = tree.xpath(xpath)
+        if found:
+            return found[0]
+    return None
+
+
+def find_properties_url(tree, doc_url):
+    """Returns the URL of the "Thuộc tính" tab of a full-text page."""
+    for link in tree.xpath("//a[@href]"):
+        if link.text_content().strip() == "Thuộc tính":
+            href = link.get("href")
+            if href and not href.startswith("javascript"):
+                return urljoin(doc_url, href)
+    # Fallback: the properties page shares the query string of the full text page
+    if "toanvan" in doc_url:
+        return doc_url.replace("toanvan", "thuoctinh")
+    return None
+
+
+def get_metadata_value(tree, label):
+    """Value cell next to the first <td> containing `label`, like td:has-text(label) + td."""
+    cells = tree.xpath(
+        "//td[contains(normalize-space(.), $label) and not(.//td[contains(normalize-space(.), $label)])]"
+        "/following-sibling::td[1]", label=label
+    )
+    if cells:
+        value = element_text(cells[0])
+        return value or None
+    return None
+
+
+def extract_title(tree):
+    title_nodes = tree.xpath("//title")
+    title = title_nodes[0].text_content().strip() if title_nodes else "Untitled"
+    candidates = tree.xpath(TITLE_XPATH)
+    if candidates:
+        candidate_text = element_text(candidates[0])
+        if len(candidate_text) > 10:
+            title = candidate_text
+    return title
+
+
+def extract_content(tree):
+    content_el = first_match(tree, CONTENT_XPATHS)
+    if content_el is None:
+        content_el = first_match(tree, MAIN_COLUMN_XPATHS)
+    if content_el is None:
+        bodies = tree.xpath("//body")
+        content_el = bodies[0] if bodies else tree
+    return element_text(content_el)
+
+
+def extract_document(doc_url, fulltext_tree, properties_tree=None):
+    """
+    Builds (metadata, content) from parsed full-text and properties pages.
+    Without a properties page, metadata falls back to whatever the full-text
+    page exposes.
+    """
+    meta_tree = properties_tree if properties_tree is not None else fulltext_tree
+
+    title = extract_title(meta_tree)
+    trich_yeu = get_metadata_value(meta_tree, "Trích yếu")
+    if trich_yeu:
+        title = trich_yeu
+
+    agency = get_metadata_value(meta_tree, "Cơ quan ban hành")
+    doc_type = get_metadata_value(meta_tree, "Loại văn bản")
+    date = get_metadata_value(meta_tree, "Ngày ban hành") or "N/A"
+
+    metadata = {
+        "url": doc_url,
+        "title": title,
+        "agency": agency if agency else "Unknown_Agency",
+        "type": doc_type if doc_type else "Unknown_Type",
+        "date": date
+    }
+    return metadata, extract_content(fulltext_tree)
@@ -1,8 +1,21 @@
-import time
 import os
+import sys
 from playwright.sync_api import sync_playwright
-from config import CATEGORY_URLS, TARGET_AGENCIES, TARGET_DOC_TYPES, OUTPUT_DIR
-from utils import save_document, ensure_dir
+from config import CATEGORY_URLS, INFER_FIELDS, OUTPUT_DIR, BLOCK_RESOURCES, ARCHIVE_CONFIG
+from utils import save_document, ensure_dir, close_shard_writer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from crawl_common.metrics import configure_metrics
+from crawl_common.rate_limiter import default_limiter
+from crawl_common.text_clean import cleaner_for, infer_fields
+from crawl_common.warc_archive import archive_page, configure_archive
+from crawl_common.resource_blocking import block_resources, click_tab, wait_for_selector, wait_for_new_results, first_href
+
+SEARCH_BUTTON_SELECTOR = "input[type='submit'][value='Tìm kiếm'], a:has-text('Tìm kiếm')"
+RESULT_LINK_SELECTOR = "a[href*='ItemID=']"
+# Elements only the "Thuộc tính" / "Toàn văn" tab pages have
+PROPERTIES_SELECTOR = "td:has-text('Cơ quan ban hành'), td:has-text('Trích yếu')"
+CONTENT_SELECTOR = "#toanvancontent, .box-content, .content-detail"
 
 class VBPLCrawler:
     def __init__(self):
@@ -26,6 +39,8 @@ class VBPLCrawler:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True) # Headless=True for silent running
             context = browser.new_context()
+            if BLOCK_RESOURCES:
+                block_resources(context, site="vbpl.vn")
             page = context.new_page()
 
             for category_name, url in CATEGORY_URLS.items():
@@ -36,17 +51,18 @@ class VBPLCrawler:
 
     def process_category(self, page, category_name, url):
         try:
-            page.goto(url, timeout=60000)
-            page.wait_for_load_state("networkidle")
+            page.goto(url, timeout=60000, wait_until="domcontentloaded")
             
             # If it's the Search page, we might need to click "Tìm kiếm" to get initial results
             if "timkiem" in url:
-                search_btn = page.locator("input[type='submit'][value='Tìm kiếm'], a:has-text('Tìm kiếm')").first
+                wait_for_selector(page, SEARCH_BUTTON_SELECTOR)
+                search_btn = page.locator(SEARCH_BUTTON_SELECTOR).first
                 if search_btn.is_visible():
                     print("Clicking Search button...")
                     search_btn.click()
-                    page.wait_for_load_state("networkidle")
-                    time.sleep(2) # Extra wait for results
+                    wait_for_selector(page, RESULT_LINK_SELECTOR)
+            else:
+                wait_for_selector(page, RESULT_LINK_SELECTOR)
 
             # Pagination Loop
             page_num = 1
@@ -70,7 +86,7 @@ class VBPLCrawler:
                 # potential_links = page.locator("ul.list-news li a, table.table-result tr td a").all()
                 
                 # Updated selector based on inspection
-                potential_links = page.locator("a[href*='ItemID=']").all()
+                potential_links = page.locator(RESULT_LINK_SELECTOR).all()
                 
                 for link in potential_links:
                     href = link.get_attribute("href")
@@ -83,8 +99,6 @@ class VBPLCrawler:
                 
                 print(f"    Found {len(doc_links)} documents on this page.")
                 
-                import random
-                
                 for doc_url in doc_links:
                     # Extract ItemID to check if processed
                     import re
@@ -95,11 +109,6 @@ class VBPLCrawler:
                         print(f"    Skipping {item_id} (Already processed)")
                         continue
                     
-                    # Random delay to be polite and avoid ban
-                    sleep_time = random.uniform(2, 5)
-                    print(f"    Waiting {sleep_time:.2f}s...")
-                    time.sleep(sleep_time)
-                        
                     self.process_document(page, doc_url, item_id)
                     # Return to list page? No, process_document should open a new tab or go back.
                     # Easier: process_document uses the SAME page object, so we must go back.
@@ -113,9 +122,10 @@ class VBPLCrawler:
                 
                 if next_btn.is_visible():
                     print("    Navigating to next page...")
+                    previous = first_href(page, RESULT_LINK_SELECTOR)
                     next_btn.click()
-                    page.wait_for_load_state("networkidle")
-                    time.sleep(2)
+                    if not wait_for_new_results(page, RESULT_LINK_SELECTOR, previous):
+                        print("    Results did not change after clicking next.")
                     page_num += 1
                 else:
                     print("    No more pages.")
@@ -136,8 +146,10 @@ class VBPLCrawler:
         
         try:
             print(f"      Processing: {doc_url}")
-            page.goto(doc_url, timeout=30000)
-            page.wait_for_load_state("domcontentloaded")
+            # Politeness delay is adaptive per host (replaces the fixed 2-5s sleep)
+            default_limiter.call(doc_url, lambda: page.goto(doc_url, timeout=30000, wait_until="domcontentloaded"))
+            # Raw DOM of both tabs, for `python utils.py rebuild` (config.ARCHIVE_HTML)
+            archive_page(doc_url, page.content)
             
             # ... (rest of extraction logic is same until save) ...
             
@@ -150,9 +162,9 @@ class VBPLCrawler:
             properties_link = page.locator("a:has-text('Thuộc tính')").first
             if properties_link.is_visible():
                 print("      Switching to Properties tab...")
-                properties_link.click()
-                page.wait_for_load_state("networkidle")
-                time.sleep(1) # Wait for update
+                # The tab is a separate page; its table is in the server-rendered HTML
+                click_tab(page, properties_link, PROPERTIES_SELECTOR)
+                archive_page(page.url, page.content)
             
             # Extract Metadata from Table (now likely visible)
             def get_metadata_value(label):
@@ -193,9 +205,7 @@ class VBPLCrawler:
             toanvan_link = page.locator("a:has-text('Toàn văn')").first
             if toanvan_link.is_visible():
                 print("      Switching back to Full Text tab...")
-                toanvan_link.click()
-                page.wait_for_load_state("networkidle")
-                time.sleep(1)
+                click_tab(page, toanvan_link, CONTENT_SELECTOR)
 
             metadata = {
                 "url": doc_url,
@@ -209,7 +219,7 @@ class VBPLCrawler:
             # Try to find the specific content container
             # Common IDs/Classes: #toanvancontent, .box-content, .content-detail
             
-            content_div = page.locator("#toanvancontent, .box-content, .content-detail").first
+            content_div = page.locator(CONTENT_SELECTOR).first
             if content_div.is_visible():
                 content = content_div.inner_text()
             else:
@@ -222,26 +232,12 @@ class VBPLCrawler:
                 else:
                     content = page.locator("body").inner_text()
             
-            # Clean up common noise if it leaked in
-            noise_phrases = ["Văn bản quy phạm pháp luật", "Văn bản hợp nhất", "Hệ thống hóa VBQPPL", "Mục lục văn bản"]
-            lines = content.split('\n')
-            cleaned_lines = [line for line in lines if line.strip() not in noise_phrases]
-            content = '\n'.join(cleaned_lines)
+            # Clean up common noise if it leaked in (phrases in crawl_common/text_clean.py SITE_RULES)
+            content = cleaner_for("vbpl.vn").clean(content)
 
             # Filter Logic
-            # If we found agency/type, use them. If not, check content.
-            
-            if metadata['agency'] == "Unknown_Agency":
-                 for ag in TARGET_AGENCIES:
-                    if ag in content[:1000]:
-                        metadata['agency'] = ag
-                        break
-            
-            if metadata['type'] == "Unknown_Type":
-                for dt in TARGET_DOC_TYPES:
-                    if dt in content[:1000]:
-                        metadata['type'] = dt
-                        break
+            # If we found agency/type, use them. If not, check content (config.INFER_FIELDS).
+            infer_fields(metadata, content, INFER_FIELDS)
             
             # Save if it matches or if we are permissive (user said "crawl into", implying all)
             # But user also listed specific Agencies/Types.
@@ -257,5 +253,10 @@ class VBPLCrawler:
             page.close()
 
 if __name__ == "__main__":
+    configure_metrics()
+    configure_archive(ARCHIVE_CONFIG)
     crawler = VBPLCrawler()
-    crawler.run()
+    try:
+        crawler.run()
+    finally:
+        close_shard_writer()
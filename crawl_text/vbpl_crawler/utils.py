@@ -1,6 +1,16 @@
 import os
 import re
 import json
+import sys
+import time
+import atexit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from crawl_common.shard_writer import ShardWriter, iter_records
+from config import OUTPUT_FORMAT, SHARD_DIR, SHARD_MAX_BYTES, SHARD_COMPRESSION
+
+_shard_writer = None
+_shard_prefix = "shard"
 
 def sanitize_filename(name):
     """
@@ -21,7 +31,48 @@ def ensure_dir(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
+def get_item_id(doc_metadata):
+    item_id_match = re.search(r'ItemID=(\d+)', doc_metadata.get('url', ''))
+    return item_id_match.group(1) if item_id_match else None
+
+def get_shard_writer():
+    global _shard_writer
+    if _shard_writer is None:
+        _shard_writer = ShardWriter(SHARD_DIR, prefix=_shard_prefix, max_bytes=SHARD_MAX_BYTES,
+                                    compression=SHARD_COMPRESSION)
+        atexit.register(close_shard_writer)
+    return _shard_writer
+
+def set_shard_prefix(prefix):
+    """
+    Names this process's shard files <prefix>-NNNNN.jsonl, so parallel workers never append to the same file.
+    """
+    global _shard_prefix
+    _shard_prefix = prefix
+
+def close_shard_writer():
+    global _shard_writer
+    if _shard_writer is not None:
+        _shard_writer.close()
+        _shard_writer = None
+
 def save_document(output_dir, doc_metadata, content):
+    """
+    Saves the document in the configured OUTPUT_FORMAT.
+    In "shards" mode output_dir is unused; records go to SHARD_DIR keyed by ItemID (or URL).
+    """
+    if OUTPUT_FORMAT != "shards":
+        return save_document_txt(output_dir, doc_metadata, content)
+    
+    key = get_item_id(doc_metadata) or doc_metadata.get('url', 'N/A')
+    try:
+        get_shard_writer().write(key, {"id": key, **doc_metadata, "content": content})
+        return True
+    except Exception as e:
+        print(f"Error saving {key} to shards: {e}")
+        return False
+
+def save_document_txt(output_dir, doc_metadata, content):
     """
     Saves the document content and metadata to a file.
     Structure:
@@ -43,9 +94,7 @@ def save_document(output_dir, doc_metadata, content):
     ensure_dir(full_dir_path)
     
     # Extract ItemID from URL for uniqueness
-    import re
-    item_id_match = re.search(r'ItemID=(\d+)', doc_metadata.get('url', ''))
-    item_id = item_id_match.group(1) if item_id_match else "unknown_id"
+    item_id = get_item_id(doc_metadata) or "unknown_id"
 
     # Filename: [Title]_[ItemID].txt
     filename = f"{sanitize_filename(title)}_{item_id}.txt"
@@ -68,3 +117,85 @@ def save_document(output_dir, doc_metadata, content):
     except Exception as e:
         print(f"Error saving {file_path}: {e}")
         return False
+
+def export_txt(shard_dir, output_dir):
+    """Writes the .txt tree (same layout as save_document_txt) from the shards."""
+    count = 0
+    for record in iter_records(shard_dir):
+        content = record.pop("content", "")
+        record.pop("id", None)
+        if save_document_txt(output_dir, record, content):
+            count += 1
+    print(f"Exported {count} documents from {shard_dir} to {output_dir}")
+    return count
+
+def rebuild_from_archive(archive_dir, shard_dir):
+    """
+    Re-extracts every archived document (full-text page plus its properties
+    page, see crawl_common/warc_archive.py) into new shards, without the network.
+    """
+    from config import INFER_FIELDS
+    from crawl_common.shard_writer import list_shards
+    from crawl_common.text_clean import cleaner_for, infer_fields
+    from crawl_common.warc_archive import WarcArchive
+    import html_extract
+
+    if list_shards(shard_dir):
+        print(f"{shard_dir} already holds shards; rebuild into a new directory")
+        return 0
+    count = errors = 0
+    start = time.monotonic()
+    with WarcArchive(archive_dir) as archive, \
+            ShardWriter(shard_dir, max_bytes=SHARD_MAX_BYTES, compression=SHARD_COMPRESSION) as writer:
+        for doc_url in archive.urls("%ItemID=%"):
+            if "thuoctinh" in doc_url.lower():
+                continue
+            try:
+                record = archive.get(doc_url)
+                fulltext_tree = html_extract.parse_html(record.body, record.encoding)
+                properties_tree = None
+                properties_url = html_extract.find_properties_url(fulltext_tree, doc_url)
+                properties = archive.get(properties_url) if properties_url else None
+                if properties is not None and properties.status < 400:
+                    properties_tree = html_extract.parse_html(properties.body, properties.encoding)
+                metadata, content = html_extract.extract_document(doc_url, fulltext_tree, properties_tree)
+                content = cleaner_for("vbpl.vn").clean(content)
+                infer_fields(metadata, content, INFER_FIELDS)
+                key = get_item_id(metadata) or doc_url
+                writer.write(key, {"id": key, **metadata, "content": content})
+                count += 1
+            except Exception as e:
+                errors += 1
+                print(f"Error rebuilding {doc_url}: {e}")
+    elapsed = time.monotonic() - start
+    print(f"Rebuilt {count} documents from {archive_dir} into {shard_dir} "
+          f"in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f}/s), {errors} errors")
+    return count
+
+if __name__ == "__main__":
+    # python utils.py export [shard_dir] [output_dir]
+    # python utils.py reprocess [shard_dir] [new_shard_dir] [--workers N] [--chunk N] [--zstd]
+    # python utils.py rebuild [archive_dir] [new_shard_dir]
+    if len(sys.argv) < 2 or sys.argv[1] not in ("export", "reprocess", "rebuild"):
+        print("Usage: python utils.py export [shard_dir] [output_dir]")
+        print("       python utils.py reprocess [shard_dir] [new_shard_dir] [--workers N]")
+        print("       python utils.py rebuild [archive_dir] [new_shard_dir]")
+        sys.exit(1)
+    if sys.argv[1] == "rebuild":
+        from config import ARCHIVE_DIR
+        rebuild_from_archive(sys.argv[2] if len(sys.argv) > 2 else ARCHIVE_DIR,
+                             sys.argv[3] if len(sys.argv) > 3
+                             else SHARD_DIR.rstrip(os.sep) + "-" + time.strftime("%Y%m%d-%H%M%S"))
+        sys.exit(0)
+    if sys.argv[1] == "reprocess":
+        # Re-clean, re-infer agency/type (config.INFER_FIELDS) and normalize the stored documents
+        import argparse
+        from config import INFER_FIELDS
+        from crawl_common.reprocess import add_arguments, run_from_args
+        parser = argparse.ArgumentParser(prog="utils.py reprocess")
+        add_arguments(parser, src=SHARD_DIR, dst=SHARD_DIR.rstrip(os.sep) + "-" + time.strftime("%Y%m%d-%H%M%S"))
+        run_from_args(parser.parse_args(sys.argv[2:]), infer=INFER_FIELDS)
+        sys.exit(0)
+    from config import OUTPUT_DIR
+    export_txt(sys.argv[2] if len(sys.argv) > 2 else SHARD_DIR,
+               sys.argv[3] if len(sys.argv) > 3 else OUTPUT_DIR)
@@ -12,6 +12,20 @@ import time
 import json
 import random
 import os
+import sys
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.fetch import AsyncFetcher
+from crawl_common.listing import iter_load_more
+from crawl_common.rate_limiter import default_limiter
+
+# "ajax": call the endpoint behind "Xem thêm" directly; "browser": scroll + click in Chrome.
+# LOAD_MORE_URL has not been checked against the live site yet, so "browser" stays the default;
+# in "ajax" mode a category whose endpoint yields nothing past page 1 is redone in the browser.
+LISTING_MODE = "browser"
+# Endpoint the "Xem thêm" button loads the next chunk of a category from (unverified)
+LOAD_MORE_URL = "{category_url}?page={page}"
 
 # User-Agent pool
 USER_AGENTS = [
@@ -133,6 +147,32 @@ def extract_urls_from_page(driver):
         
     return urls
 
+def is_detail_url(href):
+    return "/radio/" in href and href.endswith(".html") and href not in CATEGORIES
+
+async def collect_urls_ajax(all_urls):
+    """
+    Pages through each category's load-more endpoint over plain HTTP.
+    Returns the categories that got no new URLs past page 1 (wrong endpoint?).
+    """
+    stalled = []
+    async with AsyncFetcher(rate_limiter=default_limiter) as fetcher:
+        for category_url in CATEGORIES:
+            print(f"\nProcessing Category: {category_url}")
+            page_url = lambda page, category_url=category_url: LOAD_MORE_URL.format(category_url=category_url, page=page)
+            last_page = 0
+            async for page, urls in iter_load_more(fetcher, page_url, "a[href]", is_detail_url,
+                                                   headers={"User-Agent": get_random_user_agent()}):
+                last_page = page
+                all_urls.update(urls)
+                print(f"  Page {page}: {len(urls)} URLs (Total unique: {len(all_urls)})")
+                save_urls(list(all_urls))
+            if last_page < 2:
+                print(f"  ⚠️ LOAD_MORE_URL gave nothing new after page 1 for {category_url}; "
+                      f"falling back to the browser for this category")
+                stalled.append(category_url)
+    return stalled
+
 def save_urls(urls, filename="antv_urls.json"):
     with open(filename, "w", encoding="utf-8") as f:
         json.dump({"total": len(urls), "urls": urls}, f, indent=2, ensure_ascii=False)
@@ -143,11 +183,19 @@ def main():
     print("STEP 1: COLLECT ALL URLs (ANTV RADIO)")
     print("="*60)
     
-    driver = setup_driver()
     all_urls = set()
+    categories = CATEGORIES
+    if LISTING_MODE == "ajax":
+        categories = asyncio.run(collect_urls_ajax(all_urls))
+        if not categories:
+            print("\n" + "="*60)
+            print(f"✅ DONE! Collected total {len(all_urls)} URLs")
+            return
+    
+    driver = setup_driver()
     
     try:
-        for category_url in CATEGORIES:
+        for category_url in categories:
             print(f"\nProcessing Category: {category_url}")
             driver.get(category_url)
             time.sleep(3)
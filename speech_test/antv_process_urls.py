@@ -7,13 +7,22 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from tqdm import tqdm
-import time
 import random
 import json
 import os
-import subprocess
 import re
 import hashlib
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.dedup_store import ProcessedStore
+from crawl_common.rate_limiter import default_limiter, host_of
+from crawl_common.metrics import RESOLVE, configure_metrics, default_metrics
+from crawl_common.warc_archive import archive_page, configure_archive
+from crawl_common.transcode_pool import TranscodePool
+from crawl_common.media_capture import (enable_network_capture, clear_network_log, capture_media_url,
+                                        wait_for_script_result)
+from crawl_common.resource_blocking import block_resources_cdp
 
 # Configuration
 CONFIG = {
@@ -21,7 +30,10 @@ CONFIG = {
     "audio_format": "mp3", # ANTV usually provides mp3
     "sample_rate": "16000",
     "channels": "1",
-    "headless": True
+    "headless": True,
+    "audio_capture": "network", # "network" (Chrome performance log) or "dom" (wait + script/page-source scan)
+    "capture_timeout": 6, # Seconds to wait for the player's media request
+    "block_resources": True # Block images, fonts and ad/analytics hosts via CDP (crawl_common/resource_blocking.py)
 }
 
 # User-Agent pool
@@ -34,20 +46,13 @@ USER_AGENTS = [
 OUTPUT_DIR = "downloads_audio"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-PROCESSED_FILE = "processed_antv.json"
-processed_items = set()
-
-if os.path.exists(PROCESSED_FILE):
-    with open(PROCESSED_FILE, "r") as f:
-        processed_items = set(json.load(f))
+PROCESSED_FILE = "processed_antv.json" # Legacy list, imported once into PROCESSED_DB
+PROCESSED_DB = "processed_antv.db"
+processed_items = ProcessedStore(PROCESSED_DB, legacy_json=PROCESSED_FILE)
 
 def get_md5(string):
     return hashlib.md5(string.encode()).hexdigest()
 
-def save_processed_items(processed_set):
-    with open(PROCESSED_FILE, "w") as f:
-        json.dump(list(processed_set), f, indent=2)
-
 def get_random_user_agent():
     return random.choice(USER_AGENTS)
 
@@ -63,6 +68,8 @@ def setup_driver():
     options.add_argument(f"user-agent={get_random_user_agent()}")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    if CONFIG.get("audio_capture") == "network":
+        enable_network_capture(options)
     
     chromedriver_path = "/usr/bin/chromedriver" 
     if not os.path.exists(chromedriver_path):
@@ -79,16 +86,25 @@ def setup_driver():
     driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
         'source': "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
     })
+    if CONFIG.get("block_resources"):
+        block_resources_cdp(driver, site="antv.gov.vn")
     return driver
 
 def extract_audio_from_page(driver, url):
     """Visit detail page and extract audio source"""
     try:
-        driver.get(url)
-        time.sleep(random.uniform(2, 4))
+        if CONFIG.get("audio_capture") == "network":
+            # Take the media URL from the player's own request instead of scanning the page
+            clear_network_log(driver)
+            default_limiter.call(url, lambda: driver.get(url))
+            archive_page(url, lambda: driver.page_source)
+            return capture_media_url(driver, timeout=CONFIG.get("capture_timeout", 6))
+        
+        default_limiter.call(url, lambda: driver.get(url))
+        archive_page(url, lambda: driver.page_source)
         
         # ANTV audio is often in script tags
-        audio_url = driver.execute_script("""
+        audio_url = wait_for_script_result(driver, """
             // Method 1: Search script tags for mp3/m4a links
             const scripts = document.querySelectorAll('script');
             for (let script of scripts) {
@@ -107,7 +123,7 @@ def extract_audio_from_page(driver, url):
             if (audioElem && audioElem.src) return audioElem.src;
             
             return null;
-        """)
+        """, timeout=CONFIG.get("capture_timeout", 6))
         
         if audio_url:
             return audio_url
@@ -125,24 +141,14 @@ def get_title_from_page(driver):
     except:
         return "Unknown"
 
-def download_audio_ffmpeg(audio_url, output_path):
-    if os.path.exists(output_path):
-        return True
-    
-    cmd = [
-        "ffmpeg", "-y", "-i", audio_url, "-vn",
-        "-acodec", "libmp3lame" if output_path.endswith(".mp3") else "pcm_s16le",
-        "-ar", str(CONFIG["sample_rate"]),
-        "-ac", str(CONFIG["channels"]),
-        output_path
-    ]
-    
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Download failed: {output_path}")
-        return False
+def record_transcodes(jobs):
+    """Marks finished transcodes as processed."""
+    for job in jobs:
+        if job.ok:
+            processed_items.add(job.key)
+        else:
+            print(f"\n❌ Download failed: {job.output_path}")
+            print(f"   Error: {job.error}")
 
 def main():
     print("="*60)
@@ -158,7 +164,10 @@ def main():
     urls = data.get("urls", [])
     print(f"Loaded {len(urls)} URLs")
 
+    configure_metrics(CONFIG)
+    configure_archive(CONFIG)
     driver = setup_driver()
+    transcoder = TranscodePool(workers=CONFIG.get("transcode_workers"))
     
     try:
         with tqdm(total=len(urls), desc="Processing", unit="item") as pbar:
@@ -168,7 +177,10 @@ def main():
                     pbar.update(1)
                     continue
                     
-                audio_url = extract_audio_from_page(driver, url)
+                with default_metrics.stage(RESOLVE, host_of(url)) as span:
+                    audio_url = extract_audio_from_page(driver, url)
+                    if not audio_url:
+                        span.fail("no audio")
                 
                 if audio_url:
                     title = get_title_from_page(driver)
@@ -178,19 +190,21 @@ def main():
                     filename = f"ANTV_{safe_title}.mp3"
                     output_path = os.path.join(OUTPUT_DIR, filename)
                     
-                    if download_audio_ffmpeg(audio_url, output_path):
-                        processed_items.add(item_hash)
-                        save_processed_items(processed_items)
+                    # Queued for the ffmpeg workers; marked as processed once it succeeds
+                    transcoder.submit(audio_url, output_path, "mp3",
+                                      CONFIG["sample_rate"], CONFIG["channels"], key=item_hash)
                 else:
                     # print(f"\n⚠️  No audio found: {url}")
                     processed_items.add(item_hash) # Mark processed to skip next time
-                    save_processed_items(processed_items)
                     
+                record_transcodes(transcoder.completed())
                 pbar.update(1)
-                time.sleep(random.uniform(2, 5))
             
     finally:
         driver.quit()
+        # Let running transcodes finish so their items are recorded
+        record_transcodes(transcoder.join())
+        processed_items.close()
 
 if __name__ == "__main__":
     main()
@@ -14,6 +14,20 @@ import json
 import re
 import random
 import os
+import sys
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.fetch import AsyncFetcher
+from crawl_common.listing import iter_load_more
+from crawl_common.rate_limiter import default_limiter
+
+# "ajax": call the endpoint behind "Xem thêm" directly; "browser": scroll + click in Chrome.
+# LOAD_MORE_URL has not been checked against the live site yet, so "browser" stays the default;
+# in "ajax" mode a category whose endpoint yields nothing past page 1 is redone in the browser.
+LISTING_MODE = "browser"
+# Endpoint the .onecms__loadmore button loads the next chunk of a category from (unverified)
+LOAD_MORE_URL = "{category_url}?page={page}"
 
 # User-Agent pool for rotation
 USER_AGENTS = [
@@ -178,6 +192,36 @@ def extract_all_urls(driver, silent=False):
     print(f"Found {len(urls)} unique URLs")
     return urls
 
+def is_detail_url(href):
+    if "facebook.com" in href or "twitter.com" in href or "zalo" in href or "intent:" in href:
+        return False
+    return href.endswith(".html")
+
+async def collect_urls_ajax(all_urls):
+    """
+    Pages through each category's load-more endpoint over plain HTTP.
+    Returns the categories that got no new URLs past page 1 (wrong endpoint?).
+    """
+    stalled = []
+    async with AsyncFetcher(rate_limiter=default_limiter) as fetcher:
+        for url in CATEGORIES:
+            print(f"\n\n>>> Processing Category: {url}")
+            page_url = lambda page, url=url: LOAD_MORE_URL.format(category_url=url, page=page)
+            last_page = 0
+            # Chunks are bare item lists, so match h3 links rather than ul.onecms__loading
+            async for page, urls in iter_load_more(fetcher, page_url, "h3 a", is_detail_url,
+                                                   headers={"User-Agent": get_random_user_agent()}):
+                last_page = page
+                initial_count = len(all_urls)
+                all_urls.update(urls)
+                print(f"  Page {page}: + Added {len(all_urls) - initial_count} new URLs (Total: {len(all_urls)})")
+                save_urls(list(all_urls))
+            if last_page < 2:
+                print(f"  ⚠️ LOAD_MORE_URL gave nothing new after page 1 for {url}; "
+                      f"falling back to the browser for this category")
+                stalled.append(url)
+    return stalled
+
 def save_urls(urls, filename="baohaiphong_urls.json"):
     """Save URLs to JSON file"""
     # print(f"\nSaving URLs to {filename}...")
@@ -194,13 +238,23 @@ def main():
     print("="*60)
     print("STEP 1: COLLECT ALL URLs (BAO HAI PHONG)")
     print("="*60)
-    print("\nSetting up browser...")
     
-    driver = setup_driver()
     all_urls = set()
+    categories = CATEGORIES
+    if LISTING_MODE == "ajax":
+        categories = asyncio.run(collect_urls_ajax(all_urls))
+        if not categories:
+            print("\n" + "="*60)
+            print(f"✅ DONE! Collected total {len(all_urls)} URLs from {len(CATEGORIES)} categories")
+            print("="*60)
+            print("\nNext step: Run baohaiphong_process_urls.py to download audio")
+            return
+    
+    print("\nSetting up browser...")
+    driver = setup_driver()
     
     try:
-        for url in CATEGORIES:
+        for url in categories:
             print(f"\n\n>>> Processing Category: {url}")
             try:
                 # 1. Load category page
@@ -0,0 +1,58 @@
+"""
+Benchmark bước decode + resample 16kHz của crawl_and_merge_hf.materialize_audio.
+Tạo một dataset giả (audio 44.1kHz ngẫu nhiên) rồi chạy map với nhiều num_proc khác nhau,
+in ra samples/s tổng và samples/s trên mỗi core.
+
+Chạy: python benchmark_resample.py [--samples 400] [--seconds 5] [--procs 1 2 4]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import soundfile as sf
+from datasets import Dataset, Audio, disable_caching
+
+from crawl_and_merge_hf import materialize_audio, SAMPLING_RATE
+
+SOURCE_RATE = 44100
+
+def build_source_dataset(work_dir, num_samples, seconds):
+    """Dataset nguồn trỏ tới các file WAV 44.1kHz, cột audio cast về 16kHz như trong merge."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(num_samples):
+        path = os.path.join(work_dir, f"sample_{i:05d}.wav")
+        sf.write(path, (rng.standard_normal(int(SOURCE_RATE * seconds)) * 0.1).astype("float32"), SOURCE_RATE)
+        paths.append(path)
+    ds = Dataset.from_dict({"audio": paths, "transcription": [f"mẫu {i}" for i in range(num_samples)]})
+    return ds.cast_column("audio", Audio(sampling_rate=SAMPLING_RATE))
+
+def run(num_samples, seconds, procs, batch_size):
+    disable_caching()
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"Tạo {num_samples} mẫu x {seconds}s @ {SOURCE_RATE}Hz...")
+        ds = build_source_dataset(work_dir, num_samples, seconds)
+
+        print(f"{'num_proc':>8} {'time (s)':>10} {'samples/s':>10} {'samples/s/core':>15}")
+        for num_proc in procs:
+            start = time.perf_counter()
+            out = materialize_audio(ds, num_proc=num_proc, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            assert len(out) == num_samples
+            rate = num_samples / elapsed
+            print(f"{num_proc:>8} {elapsed:>10.2f} {rate:>10.1f} {rate / num_proc:>15.1f}")
+
+if __name__ == "__main__":
+    cpu = os.cpu_count() or 1
+    default_procs = sorted(set([1, 2, max(1, cpu // 2), cpu]))
+
+    parser = argparse.ArgumentParser(description="Benchmark decode + resample 16kHz")
+    parser.add_argument("--samples", type=int, default=400)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--procs", type=int, nargs="+", default=default_procs)
+    args = parser.parse_args()
+
+    run(args.samples, args.seconds, args.procs, args.batch_size)
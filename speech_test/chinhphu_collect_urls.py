@@ -14,6 +14,19 @@ import json
 import re
 import os
 import random
+import sys
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.fetch import AsyncFetcher
+from crawl_common.listing import iter_load_more
+from crawl_common.rate_limiter import default_limiter
+
+LISTING_URL = "https://media.chinhphu.vn/radio-news.htm"
+# "ajax": call the endpoint behind "Xem thêm" directly; "browser": scroll + click in Chrome
+LISTING_MODE = "ajax"
+# Endpoint the "Xem thêm" button loads the next chunk from
+LOAD_MORE_URL = "https://media.chinhphu.vn/timelinelist/{zone_id}/{page}.htm"
 
 # User-Agent pool for rotation
 USER_AGENTS = [
@@ -155,9 +168,44 @@ def extract_all_urls(driver):
     print(f"Found {len(urls)} unique URLs")
     return urls
 
-def save_urls(urls, filename="chinhphu_urls.json"):
+def is_detail_url(href):
+    # e.g., /ho-tro-1100-ty-dong-cho-4-tinh-thiet-hai-do-mua-lu-102251124162352928.htm
+    return "radio-news.htm" not in href and re.search(r'-\d{18,}\.htm$', href) is not None
+
+async def get_zone_id(fetcher):
+    """Fetches the listing page and extracts the zone id its load-more requests use."""
+    response = await fetcher.get(LISTING_URL, headers={"User-Agent": get_random_user_agent()})
+    response.raise_for_status()
+    match = (re.search(r"timelinelist/(\d+)", response.text)
+             or re.search(r"zone_?id['\"]?\s*[:=]\s*['\"]?(\d+)", response.text, re.IGNORECASE))
+    return match.group(1) if match else None
+
+async def collect_urls_ajax():
+    """Pages through the load-more endpoint over plain HTTP, saving after every chunk."""
+    urls = []
+    async with AsyncFetcher(rate_limiter=default_limiter) as fetcher:
+        zone_id = await get_zone_id(fetcher)
+        if not zone_id:
+            print("Could not find the zone id on the listing page; set LISTING_MODE = \"browser\"")
+            return urls
+        print(f"Zone id: {zone_id}")
+
+        def page_url(page):
+            if page == 1:
+                return LISTING_URL
+            return LOAD_MORE_URL.format(zone_id=zone_id, page=page)
+
+        async for page, new_urls in iter_load_more(fetcher, page_url, "a[href*='.htm']", is_detail_url,
+                                                   headers={"User-Agent": get_random_user_agent()}):
+            urls.extend(new_urls)
+            print(f"  Page {page}: +{len(new_urls)} URLs (Total: {len(urls)})")
+            save_urls(urls, verbose=False)
+    return urls
+
+def save_urls(urls, filename="chinhphu_urls.json", verbose=True):
     """Save URLs to JSON file"""
-    print(f"\nSaving URLs to {filename}...")
+    if verbose:
+        print(f"\nSaving URLs to {filename}...")
     
     with open(filename, "w", encoding="utf-8") as f:
         json.dump({
@@ -165,12 +213,23 @@ def save_urls(urls, filename="chinhphu_urls.json"):
             "urls": urls
         }, f, indent=2, ensure_ascii=False)
     
-    print(f"✅ Saved {len(urls)} URLs to {filename}")
+    if verbose:
+        print(f"✅ Saved {len(urls)} URLs to {filename}")
 
 def main():
     print("="*60)
     print("STEP 1: COLLECT ALL URLs")
     print("="*60)
+    
+    if LISTING_MODE == "ajax":
+        urls = asyncio.run(collect_urls_ajax())
+        save_urls(urls)
+        print("\n" + "="*60)
+        print(f"✅ DONE! Found {len(urls)} URLs")
+        print("="*60)
+        print("\nNext step: Run chinhphu_process_urls.py to download audio")
+        return
+    
     print("\nSetting up browser...")
     
     driver = setup_driver()
@@ -178,7 +237,7 @@ def main():
     try:
         # 1. Load main page
         print("\nLoading main page...")
-        driver.get("https://media.chinhphu.vn/radio-news.htm")
+        driver.get(LISTING_URL)
         time.sleep(3)
         
         # 2. Scroll and click "Xem thêm" until no more content
@@ -7,13 +7,22 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from tqdm import tqdm
-import time
 import random
 import json
 import os
-import subprocess
 import re
 import hashlib
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.dedup_store import ProcessedStore
+from crawl_common.rate_limiter import default_limiter, host_of
+from crawl_common.metrics import RESOLVE, configure_metrics, default_metrics
+from crawl_common.warc_archive import archive_page, configure_archive
+from crawl_common.transcode_pool import TranscodePool
+from crawl_common.media_capture import (enable_network_capture, clear_network_log, capture_media_url,
+                                        wait_for_script_result)
+from crawl_common.resource_blocking import block_resources_cdp
 
 # Configuration
 CONFIG = {
@@ -21,7 +30,10 @@ CONFIG = {
     "audio_format": "wav",
     "sample_rate": "16000",
     "channels": "1",
-    "headless": True
+    "headless": True,
+    "audio_capture": "network", # "network" (Chrome performance log) or "dom" (wait + script/page-source scan)
+    "capture_timeout": 6, # Seconds to wait for the player's media request
+    "block_resources": True # Block images, fonts and ad/analytics hosts via CDP (crawl_common/resource_blocking.py)
 }
 
 # User-Agent pool for rotation
@@ -41,20 +53,13 @@ if os.path.exists("pipeline_config.json"):
 OUTPUT_DIR = "downloads_audio"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-PROCESSED_FILE = "processed_chinhphu_radio.json"
-processed_items = set()
-
-if os.path.exists(PROCESSED_FILE):
-    with open(PROCESSED_FILE, "r") as f:
-        processed_items = set(json.load(f))
+PROCESSED_FILE = "processed_chinhphu_radio.json" # Legacy list, imported once into PROCESSED_DB
+PROCESSED_DB = "processed_chinhphu_radio.db"
+processed_items = ProcessedStore(PROCESSED_DB, legacy_json=PROCESSED_FILE)
 
 def get_md5(string):
     return hashlib.md5(string.encode()).hexdigest()
 
-def save_processed_items(processed_set):
-    with open(PROCESSED_FILE, "w") as f:
-        json.dump(list(processed_set), f, indent=2)
-
 def get_random_user_agent():
     """Get a random user agent from pool"""
     return random.choice(USER_AGENTS)
@@ -76,6 +81,8 @@ def setup_driver():
     # Additional anti-detection measures
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    if CONFIG.get("audio_capture") == "network":
+        enable_network_capture(options)
     
     # === PHẦN QUAN TRỌNG NHẤT: TRỎ ĐƯỜNG DẪN ===
     # Đường dẫn mặc định khi cài bằng apt-get
@@ -107,6 +114,9 @@ def setup_driver():
         '''
     })
     
+    if CONFIG.get("block_resources"):
+        block_resources_cdp(driver, site="chinhphu.vn")
+    
     return driver
 
 def load_urls(filename="chinhphu_urls.json"):
@@ -125,12 +135,18 @@ def load_urls(filename="chinhphu_urls.json"):
 def extract_audio_from_page(driver, url):
     """Visit detail page and extract audio source"""
     try:
-        driver.get(url)
-        # Random delay to mimic human behavior
-        time.sleep(random.uniform(2, 4))
+        if CONFIG.get("audio_capture") == "network":
+            # Take the media URL from the player's own request instead of scanning the page
+            clear_network_log(driver)
+            default_limiter.call(url, lambda: driver.get(url))
+            archive_page(url, lambda: driver.page_source)
+            return capture_media_url(driver, timeout=CONFIG.get("capture_timeout", 6))
+        
+        default_limiter.call(url, lambda: driver.get(url))
+        archive_page(url, lambda: driver.page_source)
         
         # Try to find audio source via JavaScript
-        audio_url = driver.execute_script("""
+        audio_url = wait_for_script_result(driver, """
             // Method 1: JW Player
             if (typeof jwplayer !== 'undefined') {
                 try {
@@ -159,7 +175,7 @@ def extract_audio_from_page(driver, url):
             }
             
             return null;
-        """)
+        """, timeout=CONFIG.get("capture_timeout", 6))
         
         if audio_url:
             return audio_url
@@ -189,29 +205,20 @@ def get_title_from_page(driver):
     except:
         return "Unknown"
 
-def download_audio_ffmpeg(audio_url, output_path):
-    """Downloads audio using ffmpeg"""
-    if os.path.exists(output_path):
-        return True  # Already exists
-    
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", audio_url,
-        "-vn",
-        "-acodec", "pcm_s16le" if CONFIG["audio_format"] == "wav" else "libmp3lame",
-        "-ar", str(CONFIG["sample_rate"]),
-        "-ac", str(CONFIG["channels"]),
-        output_path
-    ]
-    
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Download failed: {output_path}")
-        print(f"   Error: {e.stderr.decode()[:200]}")
-        return False
+def record_transcodes(jobs):
+    """Marks finished transcodes as processed; returns (ok, failed) counts."""
+    ok = failed = 0
+    for job in jobs:
+        if job.ok:
+            processed_items.add(job.key)
+            ok += 1
+            default_metrics.inc("items_total", source="chinhphu", outcome="ok")
+        else:
+            print(f"\n❌ Download failed: {job.output_path}")
+            print(f"   Error: {job.error}")
+            failed += 1
+            default_metrics.inc("items_total", source="chinhphu", outcome="fail")
+    return ok, failed
 
 def main():
     print("="*60)
@@ -228,7 +235,10 @@ def main():
     
     # 2. Setup browser
     print("Setting up browser...")
+    configure_metrics(CONFIG)
+    configure_archive(CONFIG)
     driver = setup_driver()
+    transcoder = TranscodePool(workers=CONFIG.get("transcode_workers"))
     
     try:
         # 3. Process each URL with tqdm progress bar
@@ -243,12 +253,16 @@ def main():
                 # Skip if already processed
                 if item_hash in processed_items:
                     skipped += 1
+                    default_metrics.inc("items_total", source="chinhphu", outcome="skip")
                     pbar.set_postfix({"skip": skipped, "ok": downloaded, "fail": failed})
                     pbar.update(1)
                     continue
                 
                 # Extract audio
-                audio_url = extract_audio_from_page(driver, url)
+                with default_metrics.stage(RESOLVE, host_of(url)) as span:
+                    audio_url = extract_audio_from_page(driver, url)
+                    if not audio_url:
+                        span.fail("no audio")
                 
                 if audio_url:
                     # Get title
@@ -260,29 +274,32 @@ def main():
                         filename = f"CHINHPHU_{safe_title}.{CONFIG['audio_format']}"
                         output_path = os.path.join(OUTPUT_DIR, filename)
                         
-                        if download_audio_ffmpeg(audio_url, output_path):
-                            downloaded += 1
-                        else:
-                            failed += 1
-                    
-                    # Mark as processed
-                    processed_items.add(item_hash)
-                    save_processed_items(processed_items)
+                        # Queued for the ffmpeg workers; marked as processed once it succeeds
+                        transcoder.submit(audio_url, output_path, CONFIG["audio_format"],
+                                          CONFIG["sample_rate"], CONFIG["channels"], key=item_hash)
+                    else:
+                        # Mark as processed
+                        processed_items.add(item_hash)
                 else:
                     # Log error
                     print(f"\n⚠️  No audio found: {url}")
                     failed += 1
+                    default_metrics.inc("items_total", source="chinhphu", outcome="fail")
                     # Still mark as processed to avoid retry
                     processed_items.add(item_hash)
-                    save_processed_items(processed_items)
+                
+                ok, bad = record_transcodes(transcoder.completed())
+                downloaded += ok
+                failed += bad
                 
                 # Update progress bar
                 pbar.set_postfix({"skip": skipped, "ok": downloaded, "fail": failed})
                 pbar.update(1)
-                
-                # Random delay between items
-                delay = random.uniform(3, 7)
-                time.sleep(delay)
+        
+        print(f"\nWaiting for {transcoder.pending} transcodes to finish...")
+        ok, bad = record_transcodes(transcoder.join())
+        downloaded += ok
+        failed += bad
         
         # Summary
         print("\n" + "="*60)
@@ -291,13 +308,16 @@ def main():
         print(f"Total URLs: {len(urls)}")
         print(f"Skipped (already processed): {skipped}")
         print(f"Downloaded: {downloaded}")
-        print(f"Failed (no audio): {failed}")
+        print(f"Failed (no audio / download error): {failed}")
         print(f"Total processed in this run: {downloaded + failed}")
         print("="*60)
         
     finally:
         print("\nClosing browser...")
         driver.quit()
+        # Let running transcodes finish so their items are recorded
+        record_transcodes(transcoder.join())
+        processed_items.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,54 @@
+"""
+Crawl every HTTP audio source in one process through the shared frontier.
+Each script contributes a plugin (QdndMediaSource, QdndPodcastSource,
+NhandanRadioSource); the scheduler interleaves their listing and detail pages
+newest-first with per-host politeness, and checkpoints the frontier in
+frontier.db so a restart resumes where it stopped.
+
+The standalone scripts (python crawl_qdnd_media.py, ...) still work on their own.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.fetch import AsyncFetcher
+from crawl_common.metrics import configure_metrics
+from crawl_common.warc_archive import configure_archive
+from crawl_common.frontier import Frontier, Scheduler
+from crawl_common.rate_limiter import default_limiter
+from crawl_common.transcode_pool import TranscodePool
+
+from crawl_qdnd_media import QdndMediaSource
+from crawl_qdnd_podcast import QdndPodcastSource
+from crawl_nhandan_radio import NhandanRadioSource
+
+FRONTIER_DB = "frontier.db"
+
+CONFIG = {}
+if os.path.exists("pipeline_config.json"):
+    with open("pipeline_config.json", "r") as f:
+        CONFIG = json.load(f)
+
+async def crawl():
+    frontier = Frontier(FRONTIER_DB)
+    transcoder = TranscodePool(workers=CONFIG.get("transcode_workers"))
+    plugins = [QdndMediaSource(), QdndPodcastSource(), NhandanRadioSource()]
+    try:
+        async with AsyncFetcher(per_host_concurrency=CONFIG.get("per_host_concurrency", 4),
+                                rate_limiter=default_limiter) as fetcher:
+            scheduler = Scheduler(frontier, plugins, fetcher, transcoder,
+                                  workers=CONFIG.get("frontier_workers", 8))
+            await scheduler.run()
+    finally:
+        frontier.close()
+
+def main():
+    configure_metrics(CONFIG)
+    configure_archive(CONFIG)
+    asyncio.run(crawl())
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 import os
-from datasets import load_dataset, concatenate_datasets, Audio, Dataset
+from datasets import load_dataset, concatenate_datasets, Audio, Dataset, Features, Value
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+import soundfile as sf
 import warnings
 
 # Tắt warning cho đỡ rối mắt
@@ -24,6 +28,24 @@ DATASETS = [
 # Các tên cột text có thể xuất hiện
 TEXT_COLUMNS = ['transcription', 'text', 'sentence']
 OUTPUT_DIR = "merged_dataset"
+SPLITS = ['train', 'test', 'validation', 'other']
+SAMPLING_RATE = 16000
+
+# "stream": đọc từng mẫu (streaming=True) và ghi dần ra các shard Parquet, RAM/ổ cứng không phụ thuộc tổng dữ liệu
+# "memory": tải toàn bộ rồi concatenate_datasets + save_to_disk như cũ
+MERGE_MODE = "stream"
+STREAM_OUTPUT_DIR = "merged_dataset_parquet"
+SAMPLES_PER_SHARD = 2000 # Số mẫu mỗi shard Parquet
+ROWS_PER_GROUP = 100 # Số mẫu giữ trong RAM trước khi ghi một row group
+
+# Giải mã + resample một lần, song song, trước khi save_to_disk (chế độ "memory")
+NUM_PROC = max(1, (os.cpu_count() or 1) - 1)
+MAP_BATCH_SIZE = 32
+
+OUTPUT_FEATURES = Features({
+    "audio": Audio(sampling_rate=SAMPLING_RATE),
+    "transcription": Value("string"),
+})
 
 def process_datasets():
     all_datasets = []
@@ -34,7 +56,7 @@ def process_datasets():
         print(f"-> Đang xử lý: {repo_id}")
         
         # Thử các split phổ biến
-        for split in ['train', 'test', 'validation', 'other']:
+        for split in SPLITS:
             try:
                 # Load dataset ở chế độ streaming=False để tải về máy
                 # Nếu muốn tiết kiệm ổ cứng có thể dùng streaming=True nhưng sẽ chậm khi xử lý
@@ -80,6 +102,10 @@ def process_datasets():
     final_dataset = concatenate_datasets(all_datasets)
     
     print(f"Tổng số mẫu dữ liệu: {len(final_dataset)}")
+    
+    print(f"\n=== ĐANG DECODE + RESAMPLE 16kHz ({NUM_PROC} process) ===")
+    final_dataset = materialize_audio(final_dataset)
+    
     print("Ví dụ mẫu đầu tiên:")
     print(final_dataset[0])
     
@@ -87,5 +113,156 @@ def process_datasets():
     final_dataset.save_to_disk(OUTPUT_DIR)
     print("[DONE] Hoàn tất!")
 
+def find_text_column(column_names):
+    for col in TEXT_COLUMNS:
+        if col in column_names:
+            return col
+    return None
+
+def normalize_stream(ds):
+    """Chuẩn hóa một IterableDataset về 2 cột audio (16kHz, resample khi đọc) + transcription."""
+    column_names = ds.column_names
+    if column_names is None:
+        # Một số dataset streaming không khai báo features: đọc thử mẫu đầu
+        column_names = list(next(iter(ds)).keys())
+
+    found_text_col = find_text_column(column_names)
+    if not found_text_col or 'audio' not in column_names:
+        return None, column_names
+
+    if found_text_col != 'transcription':
+        ds = ds.rename_column(found_text_col, 'transcription')
+    ds = ds.select_columns(['audio', 'transcription'])
+    ds = ds.cast_column("audio", Audio(sampling_rate=SAMPLING_RATE))
+    return ds, column_names
+
+def audio_array(audio):
+    """(array, sampling_rate) của cột audio đã decode: dict (datasets 2/3) hoặc AudioDecoder (datasets 4)."""
+    if isinstance(audio, dict):
+        return audio["array"], audio["sampling_rate"]
+    samples = audio.get_all_samples()
+    # AudioDecoder trả về (channels, samples); lấy mono
+    return samples.data.mean(dim=0).numpy(), samples.sample_rate
+
+def encode_audio(audio):
+    """Mã hóa lại thành FLAC 16kHz để shard gọn và không phải resample khi đọc."""
+    array, sampling_rate = audio_array(audio)
+    buffer = io.BytesIO()
+    sf.write(buffer, array, sampling_rate, format="FLAC", subtype="PCM_16")
+    return {"bytes": buffer.getvalue(), "path": None}
+
+def materialize_batch(batch):
+    return {
+        "audio": [encode_audio(audio) for audio in batch["audio"]],
+        "transcription": batch["transcription"],
+    }
+
+def materialize_audio(ds, num_proc=NUM_PROC, batch_size=MAP_BATCH_SIZE):
+    """
+    cast_column chỉ resample lúc đọc, nên mỗi lần đọc lại đều phải decode + resample.
+    Bước này làm việc đó đúng một lần trên num_proc process và lưu bytes FLAC 16kHz.
+    """
+    return ds.map(
+        materialize_batch,
+        batched=True,
+        batch_size=batch_size,
+        num_proc=num_proc if num_proc > 1 else None,
+        features=OUTPUT_FEATURES,
+        desc="Decode + resample 16kHz",
+    )
+
+class ParquetShardWriter:
+    """Ghi mẫu vào các shard Parquet cố định SAMPLES_PER_SHARD mẫu, mỗi lần giữ tối đa ROWS_PER_GROUP mẫu trong RAM."""
+
+    def __init__(self, output_dir, samples_per_shard=SAMPLES_PER_SHARD, rows_per_group=ROWS_PER_GROUP):
+        self.output_dir = output_dir
+        self.samples_per_shard = samples_per_shard
+        self.rows_per_group = rows_per_group
+        # Schema kèm metadata của datasets để load_dataset("parquet", ...) nhận lại kiểu Audio
+        self.schema = OUTPUT_FEATURES.arrow_schema
+        self.shard_idx = 0
+        self.shard_count = 0
+        self.total = 0
+        self.rows = []
+        self.writer = None
+        self.tmp_path = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _shard_path(self, idx):
+        return os.path.join(self.output_dir, f"shard-{idx:05d}.parquet")
+
+    def _flush_rows(self):
+        if not self.rows:
+            return
+        if self.writer is None:
+            self.tmp_path = self._shard_path(self.shard_idx) + ".part"
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+        table = pa.Table.from_pylist(self.rows, schema=self.schema)
+        self.writer.write_table(table)
+        self.rows = []
+
+    def _close_shard(self):
+        self._flush_rows()
+        if self.writer is not None:
+            self.writer.close()
+            # Shard chỉ mang tên chính thức khi đã ghi xong
+            os.replace(self.tmp_path, self._shard_path(self.shard_idx))
+            print(f"   [SHARD] {self._shard_path(self.shard_idx)} ({self.shard_count} mẫu)")
+            self.writer = None
+            self.shard_idx += 1
+            self.shard_count = 0
+
+    def write(self, example):
+        self.rows.append({
+            "audio": encode_audio(example["audio"]),
+            "transcription": example["transcription"],
+        })
+        self.shard_count += 1
+        self.total += 1
+        if len(self.rows) >= self.rows_per_group:
+            self._flush_rows()
+        if self.shard_count >= self.samples_per_shard:
+            self._close_shard()
+
+    def close(self):
+        self._close_shard()
+
+def process_datasets_streaming():
+    print(f"=== BẮT ĐẦU TỔNG HỢP (STREAMING) {len(DATASETS)} DATASET ===\n")
+    writer = ParquetShardWriter(STREAM_OUTPUT_DIR)
+
+    try:
+        for repo_id in DATASETS:
+            print(f"-> Đang xử lý: {repo_id}")
+            for split in SPLITS:
+                try:
+                    ds = load_dataset(repo_id, split=split, streaming=True)
+                    ds, column_names = normalize_stream(ds)
+                except Exception:
+                    # Lỗi thường gặp là split không tồn tại, bỏ qua
+                    continue
+
+                if ds is None:
+                    print(f"   [SKIP] Split '{split}': Không tìm thấy cột audio/text nào trong {column_names}")
+                    continue
+
+                count = 0
+                try:
+                    for example in ds:
+                        writer.write(example)
+                        count += 1
+                except Exception as e:
+                    print(f"   [ERROR] Split '{split}' dừng sau {count} mẫu: {e}")
+                print(f"   [OK] Split '{split}': {count} mẫu")
+    finally:
+        writer.close()
+
+    print(f"\nTổng số mẫu dữ liệu: {writer.total} trong {writer.shard_idx} shard")
+    print(f"Đọc lại bằng: load_dataset('parquet', data_files='{STREAM_OUTPUT_DIR}/*.parquet')")
+    print("[DONE] Hoàn tất!")
+
 if __name__ == "__main__":
-    process_datasets()
+    if MERGE_MODE == "stream":
+        process_datasets_streaming()
+    else:
+        process_datasets()
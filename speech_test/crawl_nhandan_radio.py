@@ -1,13 +1,21 @@
-import requests
+import asyncio
 import re
 import os
-import time
+import sys
 import random
 import hashlib
 import json
-import subprocess
 from bs4 import BeautifulSoup
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.fetch import AsyncFetcher
+from crawl_common.metrics import configure_metrics
+from crawl_common.warc_archive import configure_archive
+from crawl_common.dedup_store import ProcessedStore
+from crawl_common.rate_limiter import default_limiter
+from crawl_common.transcode_pool import TranscodePool
+from crawl_common.frontier import SourcePlugin, Task
+
 # Load Config
 try:
     with open("pipeline_config.json", "r") as f:
@@ -23,8 +31,10 @@ except FileNotFoundError:
     }
 
 OUTPUT_DIR = CONFIG["output_dir"]
-PROCESSED_FILE = "processed_videos_nhandan.json"
+PROCESSED_FILE = "processed_videos_nhandan.json" # Legacy list, imported once into PROCESSED_DB
+PROCESSED_DB = "processed_videos_nhandan.db"
 STATE_FILE = "crawler_state_nhandan.json"
+BASE_URL = "https://radio.nhandan.vn/ban-tin-thoi-su-c5"
 
 # List of common User-Agents for rotation
 USER_AGENTS = [
@@ -47,17 +57,7 @@ def get_md5(text):
     return hashlib.md5(text.encode('utf-8')).hexdigest()
 
 def load_processed_videos():
-    if os.path.exists(PROCESSED_FILE):
-        try:
-            with open(PROCESSED_FILE, "r") as f:
-                return set(json.load(f))
-        except:
-            return set()
-    return set()
-
-def save_processed_videos(processed_set):
-    with open(PROCESSED_FILE, "w") as f:
-        json.dump(list(processed_set), f)
+    return ProcessedStore(PROCESSED_DB, legacy_json=PROCESSED_FILE)
 
 def load_crawler_state():
     if os.path.exists(STATE_FILE):
@@ -73,42 +73,19 @@ def save_crawler_state(page):
     with open(STATE_FILE, "w") as f:
         json.dump(state, f)
 
-def download_audio_ffmpeg(audio_url, output_path):
-    """Extracts audio directly using ffmpeg."""
-    if os.path.exists(output_path):
-        print(f"File already exists: {output_path}")
-        return
-
-    print(f"Downloading Audio: {audio_url} -> {output_path}")
-    
-    # Prepare headers for ffmpeg
-    headers = get_headers()
-    headers_str = "".join([f"{k}: {v}\r\n" for k, v in headers.items()])
-    
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-headers", headers_str,
-        "-i", audio_url,
-        "-vn",
-        "-acodec", "pcm_s16le",
-        "-ar", str(CONFIG["sample_rate"]),
-        "-ac", str(CONFIG["channels"]),
-        "-nostdin",
-        "-loglevel", "error",
-        output_path
-    ]
-    
-    try:
-        subprocess.run(cmd, check=True)
-        print("Download complete.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error downloading audio: {e}")
+def record_transcodes(processed_videos, jobs):
+    """Marks finished transcodes as processed."""
+    for job in jobs:
+        if job.ok:
+            print(f"Extraction complete: {job.output_path}")
+            processed_videos.add(job.key)
+        else:
+            print(f"Error extracting audio {job.output_path}: {job.error}")
 
-def get_audio_source(url):
+async def get_audio_source(fetcher, url):
     """Fetches the article page and extracts the audio URL from JSON data."""
     try:
-        response = requests.get(url, headers=get_headers())
+        response = await fetcher.get(url, headers=get_headers())
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -133,7 +110,56 @@ def get_audio_source(url):
         print(f"Error fetching audio source {url}: {e}")
         return None
 
-def main():
+async def get_article_list(fetcher, current_page):
+    """Fetches one listing page and returns its article links, or None past the last page."""
+    if current_page == 1:
+        page_url = BASE_URL
+    else:
+        page_url = f"{BASE_URL}/page/{current_page}"
+        
+    print(f"\nCrawling Page {current_page}: {page_url}")
+    
+    response = await fetcher.get(page_url, headers=get_headers())
+    
+    # Check for 404 or redirect to handle end of pagination
+    if response.status == 404:
+        print("Reached end of pages (404).")
+        return None
+        
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, 'html.parser')
+    
+    # Find article links
+    # Structure: <div class="box-title-main"> <a href="...">Title</a> </div>
+    # Or generic search for links within article blocks
+    
+    article_links = []
+    # Based on analysis, links are often in h2 or h3 tags or specific classes
+    # Let's look for links that look like articles (contain ID like -iXXXX)
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if re.search(r'-i\d+$', href):
+            if not href.startswith("http"):
+                href = "https://radio.nhandan.vn" + href
+            
+            # Try to get title from title attribute, then text, then URL slug
+            title = a.get("title")
+            if not title:
+                title = a.get_text(strip=True)
+            if not title:
+                # Extract slug from URL: .../slug-i1234
+                match = re.search(r'/([^/]+)-i\d+$', href)
+                if match:
+                    title = match.group(1).replace("-", " ")
+                else:
+                    title = "Unknown Title"
+            
+            if not any(v['url'] == href for v in article_links):
+                article_links.append({"url": href, "title": title})
+    
+    return article_links
+
+async def crawl():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
         
@@ -144,111 +170,135 @@ def main():
     start_page = state.get("last_page", 1)
     print(f"Resuming from page {start_page}")
     
-    base_url = "https://radio.nhandan.vn/ban-tin-thoi-su-c5"
     current_page = start_page
     
-    while True:
-        if current_page == 1:
-            page_url = base_url
-        else:
-            page_url = f"{base_url}/page/{current_page}"
-            
-        print(f"\nCrawling Page {current_page}: {page_url}")
-        
-        try:
-            response = requests.get(page_url, headers=get_headers())
-            
-            # Check for 404 or redirect to handle end of pagination
-            if response.status_code == 404:
-                print("Reached end of pages (404).")
-                break
+    transcoder = TranscodePool(workers=CONFIG.get("transcode_workers"))
+    try:
+        async with AsyncFetcher(per_host_concurrency=CONFIG.get("per_host_concurrency", 4),
+                                rate_limiter=default_limiter) as fetcher:
+            while True:
+                try:
+                    article_links = await get_article_list(fetcher, current_page)
                 
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find article links
-            # Structure: <div class="box-title-main"> <a href="...">Title</a> </div>
-            # Or generic search for links within article blocks
-            
-            article_links = []
-            # Based on analysis, links are often in h2 or h3 tags or specific classes
-            # Let's look for links that look like articles (contain ID like -iXXXX)
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
-                if re.search(r'-i\d+$', href):
-                    if not href.startswith("http"):
-                        href = "https://radio.nhandan.vn" + href
-                    
-                    # Try to get title from title attribute, then text, then URL slug
-                    title = a.get("title")
-                    if not title:
-                        title = a.get_text(strip=True)
-                    if not title:
-                        # Extract slug from URL: .../slug-i1234
-                        match = re.search(r'/([^/]+)-i\d+$', href)
-                        if match:
-                            title = match.group(1).replace("-", " ")
-                        else:
-                            title = "Unknown Title"
+                    if article_links is None:
+                        break
+                
+                    if not article_links:
+                        print("No articles found on this page. Stopping.")
+                        break
                     
-                    if not any(v['url'] == href for v in article_links):
-                        article_links.append({"url": href, "title": title})
-            
-            if not article_links:
-                print("No articles found on this page. Stopping.")
-                break
+                    print(f"Found {len(article_links)} articles.")
                 
-            print(f"Found {len(article_links)} articles.")
-            
-            for article in article_links:
-                article_url = article['url']
-                article_hash = get_md5(article_url)
+                    pending = []
+                    for article in article_links:
+                        if get_md5(article['url']) in processed_videos:
+                            print(f"  Skipping (Processed): {article['title']}")
+                            continue
+                        pending.append(article)
                 
-                if article_hash in processed_videos:
-                    print(f"  Skipping (Processed): {article['title']}")
-                    continue
-                    
-                print(f"  Processing: {article['title']}")
-                audio_url = get_audio_source(article_url)
+                    # Resolve every article page of this listing page concurrently
+                    sources = await asyncio.gather(*(get_audio_source(fetcher, a['url']) for a in pending))
                 
-                if audio_url:
-                    print(f"    Source: {audio_url}")
-                    
-                    safe_title = "".join([c for c in article['title'] if c.isalnum() or c in (' ', '-', '_')]).strip()
-                    safe_title = safe_title.replace(" ", "_")[:50]
-                    
-                    if CONFIG["save_audio"]:
-                        filename = f"NHANDAN_{safe_title}.{CONFIG['audio_format']}"
-                        output_path = os.path.join(OUTPUT_DIR, filename)
-                        download_audio_ffmpeg(audio_url, output_path)
-                    
-                    # Mark as processed
-                    processed_videos.add(article_hash)
-                    save_processed_videos(processed_videos)
+                    for article, audio_url in zip(pending, sources):
+                        article_hash = get_md5(article['url'])
+                        print(f"  Processing: {article['title']}")
                     
-                    # Random delay
-                    delay = random.uniform(1, 3)
-                    print(f"    Sleeping for {delay:.2f}s...")
-                    time.sleep(delay)
-                else:
-                    print("    Could not find Audio source.")
-            
-            # Save state
-            save_crawler_state(current_page)
-            
-            # Next page
-            current_page += 1
-            
-            # Page delay
-            page_delay = random.uniform(2, 5)
-            print(f"Page done. Sleeping for {page_delay:.2f}s before next page...")
-            time.sleep(page_delay)
-            
-        except Exception as e:
-            print(f"Error crawling page {current_page}: {e}")
-            # If it's a connection error, maybe wait and retry, but for now we break or continue
-            time.sleep(5)
-            # break # Optional: stop on error
+                        if audio_url:
+                            print(f"    Source: {audio_url}")
+                        
+                            safe_title = "".join([c for c in article['title'] if c.isalnum() or c in (' ', '-', '_')]).strip()
+                            safe_title = safe_title.replace(" ", "_")[:50]
+                        
+                            if CONFIG["save_audio"]:
+                                filename = f"NHANDAN_{safe_title}.{CONFIG['audio_format']}"
+                                output_path = os.path.join(OUTPUT_DIR, filename)
+                                # Queued for the ffmpeg workers; marked as processed once it succeeds
+                                await transcoder.submit_async(audio_url, output_path, CONFIG["audio_format"],
+                                                               CONFIG["sample_rate"], CONFIG["channels"], key=article_hash, headers=get_headers())
+                            else:
+                                # Mark as processed
+                                processed_videos.add(article_hash)
+                        else:
+                            print("    Could not find Audio source.")
+                
+                    record_transcodes(processed_videos, transcoder.completed())
+                
+                    # Save state
+                    save_crawler_state(current_page)
+                
+                    # Next page
+                    current_page += 1
+                
+                except Exception as e:
+                    print(f"Error crawling page {current_page}: {e}")
+                    # If it's a connection error, maybe wait and retry, but for now we break or continue
+                    await asyncio.sleep(5)
+                    # break # Optional: stop on error
+    finally:
+        # Let running transcodes finish so their items are recorded
+        print(f"Waiting for {transcoder.pending} transcodes to finish...")
+        record_transcodes(processed_videos, transcoder.join())
+        processed_videos.close()
+
+def safe_name(title):
+    safe_title = "".join([c for c in title if c.isalnum() or c in (' ', '-', '_')]).strip()
+    return safe_title.replace(" ", "_")[:50]
+
+class NhandanRadioSource(SourcePlugin):
+    """Frontier plugin (see crawl_all_sources.py): /page/N listings, then one task per article."""
+    name = "nhandan_radio"
+
+    def start(self, transcoder):
+        super().start(transcoder)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        self.processed_videos = load_processed_videos()
+
+    def seeds(self):
+        return [Task(f"{self.name}:list:1", BASE_URL, self.name, "listing", priority=1, data={"page": 1})]
+
+    async def handle(self, fetcher, task):
+        if task.kind == "listing":
+            return await self.handle_listing(fetcher, task)
+        await self.handle_article(fetcher, task)
+        return []
+
+    async def handle_listing(self, fetcher, task):
+        page = task.data["page"]
+        article_links = await get_article_list(fetcher, page)
+        if not article_links:
+            return []
+
+        tasks = [Task(f"{self.name}:{article['url']}", article['url'], self.name, "detail",
+                      priority=page + 0.5, data={"title": article['title']})
+                 for article in article_links if get_md5(article['url']) not in self.processed_videos]
+        tasks.append(Task(f"{self.name}:list:{page + 1}", f"{BASE_URL}/page/{page + 1}", self.name, "listing",
+                          priority=page + 1, data={"page": page + 1}))
+        return tasks
+
+    async def handle_article(self, fetcher, task):
+        article_hash = get_md5(task.url)
+        audio_url = await get_audio_source(fetcher, task.url)
+        if not audio_url:
+            raise RuntimeError("could not find audio source")
+
+        if CONFIG["save_audio"]:
+            filename = f"NHANDAN_{safe_name(task.data['title'])}.{CONFIG['audio_format']}"
+            await self.transcode(task, article_hash, audio_url, os.path.join(OUTPUT_DIR, filename), CONFIG["audio_format"],
+                                 CONFIG["sample_rate"], CONFIG["channels"],
+                                 headers=get_headers())
+        else:
+            self.processed_videos.add(article_hash)
+
+    def on_transcoded(self, job):
+        record_transcodes(self.processed_videos, [job])
+
+    def close(self):
+        self.processed_videos.close()
+
+def main():
+    configure_metrics(CONFIG)
+    configure_archive(CONFIG)
+    asyncio.run(crawl())
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,19 @@
-import requests
+import asyncio
 import re
 import os
-import time
+import sys
 import random
 from bs4 import BeautifulSoup
 import json
-import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.fetch import AsyncFetcher
+from crawl_common.metrics import configure_metrics
+from crawl_common.warc_archive import configure_archive
+from crawl_common.dedup_store import ProcessedStore
+from crawl_common.rate_limiter import default_limiter
+from crawl_common.transcode_pool import TranscodePool
+from crawl_common.frontier import SourcePlugin, Task
 
 # Load Config
 try:
@@ -50,11 +58,11 @@ CATEGORIES = {
     "PHONG_SU_DIEU_TRA": "https://media.qdnd.vn/phong-su-dieu-tra"
 }
 
-def get_category_info(url):
+async def get_category_info(fetcher, url):
     """Fetches the category page to extract _glvtheloai (ID) and _glvtieude (Slug)."""
     print(f"Fetching category info from: {url}")
     try:
-        response = requests.get(url, headers=get_headers())
+        response = await fetcher.get(url, headers=get_headers())
         response.raise_for_status()
         
         # Extract variables using regex
@@ -73,7 +81,7 @@ def get_category_info(url):
         print(f"Error fetching category {url}: {e}")
         return None
 
-def get_video_list(cat_info, page_index):
+async def get_video_list(fetcher, cat_info, page_index):
     """Calls the AJAX API to get a list of videos for a specific page."""
     payload = {
         "pageid": "vi",
@@ -85,7 +93,7 @@ def get_video_list(cat_info, page_index):
     }
     
     try:
-        response = requests.post(API_URL, headers=get_headers(), json=payload)
+        response = await fetcher.post_json(API_URL, payload, headers=get_headers())
         response.raise_for_status()
         
         # The API returns HTML in the 'd' field of the JSON response
@@ -118,10 +126,10 @@ def get_video_list(cat_info, page_index):
         print(f"Error fetching video list for page {page_index}: {e}")
         return []
 
-def get_video_source(video_url):
+async def get_video_source(fetcher, video_url):
     """Fetches the video page and extracts the direct .mp4 link."""
     try:
-        response = requests.get(video_url, headers=get_headers())
+        response = await fetcher.get(video_url, headers=get_headers())
         response.raise_for_status()
         
         # Regex to find intVideo('avatar', 'video_file')
@@ -134,32 +142,14 @@ def get_video_source(video_url):
         print(f"Error fetching video source {video_url}: {e}")
         return None
 
-def download_audio_ffmpeg(video_url, output_path):
-    """Extracts audio directly from video URL using ffmpeg."""
-    if os.path.exists(output_path):
-        print(f"File already exists: {output_path}")
-        return
-
-    print(f"Extracting Audio: {video_url} -> {output_path}")
-    
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", video_url,
-        "-vn",
-        "-acodec", "pcm_s16le",
-        "-ar", str(CONFIG["sample_rate"]),
-        "-ac", str(CONFIG["channels"]),
-        "-nostdin",
-        "-loglevel", "error",
-        output_path
-    ]
-    
-    try:
-        subprocess.run(cmd, check=True)
-        print("Extraction complete.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error extracting audio: {e}")
+def record_transcodes(processed_videos, jobs):
+    """Marks finished transcodes as processed."""
+    for job in jobs:
+        if job.ok:
+            print(f"Extraction complete: {job.output_path}")
+            processed_videos.add(job.key)
+        else:
+            print(f"Error extracting audio {job.output_path}: {job.error}")
 
 # ... imports ...
 
@@ -167,24 +157,15 @@ import hashlib
 
 # ... imports ...
 
-PROCESSED_FILE = "processed_videos.json"
+PROCESSED_FILE = "processed_videos.json" # Legacy list, imported once into PROCESSED_DB
+PROCESSED_DB = "processed_videos.db"
 STATE_FILE = "crawler_state.json"
 
 def get_md5(text):
     return hashlib.md5(text.encode('utf-8')).hexdigest()
 
 def load_processed_videos():
-    if os.path.exists(PROCESSED_FILE):
-        try:
-            with open(PROCESSED_FILE, "r") as f:
-                return set(json.load(f))
-        except:
-            return set()
-    return set()
-
-def save_processed_videos(processed_set):
-    with open(PROCESSED_FILE, "w") as f:
-        json.dump(list(processed_set), f)
+    return ProcessedStore(PROCESSED_DB, legacy_json=PROCESSED_FILE)
 
 def load_crawler_state():
     if os.path.exists(STATE_FILE):
@@ -203,7 +184,7 @@ def save_crawler_state(category, page):
     with open(STATE_FILE, "w") as f:
         json.dump(state, f)
 
-def main():
+async def crawl():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
         
@@ -216,6 +197,18 @@ def main():
     
     skip_categories = True if last_category else False
 
+    transcoder = TranscodePool(workers=CONFIG.get("transcode_workers"))
+    try:
+        async with AsyncFetcher(per_host_concurrency=CONFIG.get("per_host_concurrency", 4),
+                                rate_limiter=default_limiter) as fetcher:
+            await crawl_categories(fetcher, transcoder, processed_videos, last_category, last_page, skip_categories)
+    finally:
+        # Let running transcodes finish so their items are recorded
+        print(f"Waiting for {transcoder.pending} transcodes to finish...")
+        record_transcodes(processed_videos, transcoder.join())
+        processed_videos.close()
+
+async def crawl_categories(fetcher, transcoder, processed_videos, last_category, last_page, skip_categories):
     for cat_name, cat_url in CATEGORIES.items():
         # Resume logic for categories
         if skip_categories:
@@ -227,7 +220,7 @@ def main():
                 continue
         
         print(f"\nProcessing Category: {cat_name}")
-        cat_info = get_category_info(cat_url)
+        cat_info = await get_category_info(fetcher, cat_url)
         if not cat_info:
             continue
             
@@ -239,7 +232,7 @@ def main():
         
         while True:
             print(f"  Fetching page {current_page}...")
-            videos = get_video_list(cat_info, current_page)
+            videos = await get_video_list(fetcher, cat_info, current_page)
             
             if not videos:
                 print("  No more videos found. Moving to next category.")
@@ -247,6 +240,7 @@ def main():
                 
             print(f"  Found {len(videos)} videos.")
             
+            pending = []
             for video in videos:
                 video_url = video['url']
                 video_hash = get_md5(video_url)
@@ -262,8 +256,14 @@ def main():
                     processed_videos.add(video_hash)
                     continue
 
+                pending.append(video)
+            
+            # Resolve every detail page of this listing page concurrently
+            sources = await asyncio.gather(*(get_video_source(fetcher, v['url']) for v in pending))
+            
+            for video, mp4_url in zip(pending, sources):
+                video_hash = get_md5(video['url'])
                 print(f"    Processing: {video['title']}")
-                mp4_url = get_video_source(video_url)
                 
                 if mp4_url:
                     print(f"      Source: {mp4_url}")
@@ -274,31 +274,99 @@ def main():
                     if CONFIG["save_audio"]:
                         filename = f"{cat_name}_{safe_title}.{CONFIG['audio_format']}"
                         output_path = os.path.join(OUTPUT_DIR, filename)
-                        download_audio_ffmpeg(mp4_url, output_path)
-                    
-                    # Mark as processed
-                    processed_videos.add(video_hash)
-                    save_processed_videos(processed_videos)
-                    
-                    # Random delay between 1 and 3 seconds
-                    delay = random.uniform(1, 3)
-                    print(f"      Sleeping for {delay:.2f}s...")
-                    time.sleep(delay)
+                        # Queued for the ffmpeg workers; marked as processed once it succeeds
+                        await transcoder.submit_async(mp4_url, output_path, CONFIG["audio_format"],
+                                                       CONFIG["sample_rate"], CONFIG["channels"], key=video_hash)
+                    else:
+                        # Mark as processed
+                        processed_videos.add(video_hash)
                 else:
                     print("      Could not find MP4 source.")
             
+            record_transcodes(processed_videos, transcoder.completed())
+            
             # Save state after finishing a page
             save_crawler_state(cat_name, current_page)
             
-            # Random delay between pages
-            page_delay = random.uniform(2, 5)
-            print(f"  Sleeping for {page_delay:.2f}s before next page...")
-            time.sleep(page_delay)
-            
             current_page += 1
             
         # Reset last_page for next category
         last_page = 0
 
+def safe_name(title):
+    safe_title = "".join([c for c in title if c.isalnum() or c in (' ', '-', '_')]).strip()
+    return safe_title.replace(" ", "_")[:50]
+
+class QdndMediaSource(SourcePlugin):
+    """Frontier plugin (see crawl_all_sources.py): category pages via the API, then one task per video page."""
+    name = "qdnd_media"
+
+    def start(self, transcoder):
+        super().start(transcoder)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        self.processed_videos = load_processed_videos()
+        self.cat_info = {}
+
+    def seeds(self):
+        return [Task(f"{self.name}:list:{cat_name}:0", cat_url, self.name, "listing",
+                     priority=0, data={"category": cat_name, "page": 0})
+                for cat_name, cat_url in CATEGORIES.items()]
+
+    async def handle(self, fetcher, task):
+        if task.kind == "listing":
+            return await self.handle_listing(fetcher, task)
+        await self.handle_video(fetcher, task)
+        return []
+
+    async def handle_listing(self, fetcher, task):
+        cat_name, page = task.data["category"], task.data["page"]
+        if cat_name not in self.cat_info:
+            self.cat_info[cat_name] = await get_category_info(fetcher, CATEGORIES[cat_name])
+        if not self.cat_info[cat_name]:
+            raise RuntimeError(f"no category info for {cat_name}")
+
+        videos = await get_video_list(fetcher, self.cat_info[cat_name], page)
+        if not videos:
+            return []
+
+        tasks = []
+        for video in videos:
+            video_hash = get_md5(video['url'])
+            if video_hash in self.processed_videos:
+                continue
+            if "/old_media/" in video['url']:
+                self.processed_videos.add(video_hash)
+                continue
+            # Videos of a page go ahead of the next listing page (newest first)
+            tasks.append(Task(f"{self.name}:{video['url']}", video['url'], self.name, "detail",
+                              priority=page + 0.5, data={"category": cat_name, "title": video['title']}))
+        tasks.append(Task(f"{self.name}:list:{cat_name}:{page + 1}", API_URL, self.name, "listing",
+                          priority=page + 1, data={"category": cat_name, "page": page + 1}))
+        return tasks
+
+    async def handle_video(self, fetcher, task):
+        video_hash = get_md5(task.url)
+        mp4_url = await get_video_source(fetcher, task.url)
+        if not mp4_url:
+            raise RuntimeError("could not find MP4 source")
+
+        if CONFIG["save_audio"]:
+            filename = f"{task.data['category']}_{safe_name(task.data['title'])}.{CONFIG['audio_format']}"
+            await self.transcode(task, video_hash, mp4_url, os.path.join(OUTPUT_DIR, filename), CONFIG["audio_format"],
+                                 CONFIG["sample_rate"], CONFIG["channels"])
+        else:
+            self.processed_videos.add(video_hash)
+
+    def on_transcoded(self, job):
+        record_transcodes(self.processed_videos, [job])
+
+    def close(self):
+        self.processed_videos.close()
+
+def main():
+    configure_metrics(CONFIG)
+    configure_archive(CONFIG)
+    asyncio.run(crawl())
+
 if __name__ == "__main__":
     main()
@@ -1,13 +1,21 @@
-import requests
+import asyncio
 import re
 import os
-import time
+import sys
 import random
 import hashlib
 import json
-import subprocess
 from bs4 import BeautifulSoup
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.fetch import AsyncFetcher
+from crawl_common.metrics import configure_metrics
+from crawl_common.warc_archive import configure_archive
+from crawl_common.dedup_store import ProcessedStore
+from crawl_common.rate_limiter import default_limiter
+from crawl_common.transcode_pool import TranscodePool
+from crawl_common.frontier import SourcePlugin, Task
+
 # Load Config
 try:
     with open("pipeline_config.json", "r") as f:
@@ -23,8 +31,10 @@ except FileNotFoundError:
     }
 
 OUTPUT_DIR = CONFIG["output_dir"]
-PROCESSED_FILE = "processed_videos_qdnd_podcast.json"
+PROCESSED_FILE = "processed_videos_qdnd_podcast.json" # Legacy list, imported once into PROCESSED_DB
+PROCESSED_DB = "processed_videos_qdnd_podcast.db"
 STATE_FILE = "crawler_state_qdnd_podcast.json"
+API_URL = "https://media.qdnd.vn/Ajaxloads/ServiceData.asmx/LoadMoreAudioList"
 
 # List of common User-Agents for rotation
 USER_AGENTS = [
@@ -47,17 +57,7 @@ def get_md5(text):
     return hashlib.md5(text.encode('utf-8')).hexdigest()
 
 def load_processed_videos():
-    if os.path.exists(PROCESSED_FILE):
-        try:
-            with open(PROCESSED_FILE, "r") as f:
-                return set(json.load(f))
-        except:
-            return set()
-    return set()
-
-def save_processed_videos(processed_set):
-    with open(PROCESSED_FILE, "w") as f:
-        json.dump(list(processed_set), f)
+    return ProcessedStore(PROCESSED_DB, legacy_json=PROCESSED_FILE)
 
 def load_crawler_state():
     if os.path.exists(STATE_FILE):
@@ -73,38 +73,20 @@ def save_crawler_state(page):
     with open(STATE_FILE, "w") as f:
         json.dump(state, f)
 
-def download_audio_ffmpeg(video_url, output_path):
-    """Extracts audio directly from video URL using ffmpeg."""
-    if os.path.exists(output_path):
-        print(f"File already exists: {output_path}")
-        return
-
-    print(f"Extracting Audio: {video_url} -> {output_path}")
-    
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", video_url,
-        "-vn",
-        "-acodec", "pcm_s16le",
-        "-ar", str(CONFIG["sample_rate"]),
-        "-ac", str(CONFIG["channels"]),
-        "-nostdin",
-        "-loglevel", "error",
-        output_path
-    ]
-    
-    try:
-        subprocess.run(cmd, check=True)
-        print("Extraction complete.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error extracting audio: {e}")
+def record_transcodes(processed_videos, jobs):
+    """Marks finished transcodes as processed."""
+    for job in jobs:
+        if job.ok:
+            print(f"Extraction complete: {job.output_path}")
+            processed_videos.add(job.key)
+        else:
+            print(f"Error extracting audio {job.output_path}: {job.error}")
 
-def get_audio_source(url):
+async def get_audio_source(fetcher, url):
     """Fetches the page and extracts the direct audio link."""
     print(f"Fetching audio source from: {url}")
     try:
-        response = requests.get(url, headers=get_headers())
+        response = await fetcher.get(url, headers=get_headers())
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -136,7 +118,65 @@ def get_audio_source(url):
         print(f"Error fetching audio source {url}: {e}")
         return None
 
-def main():
+async def get_video_list(fetcher, current_page):
+    """Calls the LoadMoreAudioList API and returns the podcast detail links of one page."""
+    # API Payload
+    # pageindex is 0-based
+    payload = {
+        "pageid": "vi",
+        "theloai": 4,
+        "pageindex": current_page - 1,
+        "pagesize": 12,
+        "mediaid": 0,
+        "tenchuyenmuc": "podcast"
+    }
+    
+    response = await fetcher.post_json(API_URL, payload, headers={**get_headers(), "Content-Type": "application/json"})
+    response.raise_for_status()
+    
+    # The API returns JSON with 'd' field containing HTML
+    data = response.json()
+    html_content = data.get("d", "")
+    
+    if not html_content:
+        return None
+    
+    # DEBUG: Print content preview
+    print(f"HTML Content Preview: {html_content[:500]}...")
+    
+    soup = BeautifulSoup(html_content, 'html.parser')
+    
+    # Find video links
+    # Structure in API response: <article class="media-small-news ..."> <a href="..."> ... </a> </article>
+    
+    video_links = []
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        
+        if not href.startswith("http"):
+            href = "https://media.qdnd.vn" + href
+        
+        # DEBUG: Print found link
+        # print(f"Found link: {href}")
+        
+        # Filter: Must be media.qdnd.vn and look like a detail page
+        if not href.startswith("https://media.qdnd.vn/"):
+            continue
+            
+        if ("/video/" in href or "/audio-podcast/" in href or "/podcast/" in href) and re.search(r'-\d+$', href):
+             title = a.get("title") or a.get_text(strip=True)
+             
+             if not any(v['url'] == href for v in video_links):
+                video_links.append({"url": href, "title": title})
+             else:
+                pass # Duplicate
+        else:
+             # DEBUG: Print rejected link
+             print(f"Rejected: {href}")
+    
+    return video_links
+
+async def crawl():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
         
@@ -147,122 +187,136 @@ def main():
     start_page = state.get("last_page", 1)
     print(f"Resuming from page {start_page}")
     
-    base_api_url = "https://media.qdnd.vn/Ajaxloads/ServiceData.asmx/LoadMoreAudioList"
     current_page = start_page
     
-    while True:
-        print(f"\nCrawling Page {current_page}...")
-        
-        # API Payload
-        # pageindex is 0-based
-        payload = {
-            "pageid": "vi",
-            "theloai": 4,
-            "pageindex": current_page - 1,
-            "pagesize": 12,
-            "mediaid": 0,
-            "tenchuyenmuc": "podcast"
-        }
-        
-        try:
-            response = requests.post(base_api_url, headers={**get_headers(), "Content-Type": "application/json"}, json=payload)
-            response.raise_for_status()
-            
-            # The API returns JSON with 'd' field containing HTML
-            data = response.json()
-            html_content = data.get("d", "")
-            
-            if not html_content:
-                print("No content returned (end of pages).")
-                break
-            
-            # DEBUG: Print content preview
-            print(f"HTML Content Preview: {html_content[:500]}...")
-            
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Find video links
-            # Structure in API response: <article class="media-small-news ..."> <a href="..."> ... </a> </article>
+    transcoder = TranscodePool(workers=CONFIG.get("transcode_workers"))
+    try:
+        async with AsyncFetcher(per_host_concurrency=CONFIG.get("per_host_concurrency", 4),
+                                rate_limiter=default_limiter) as fetcher:
+            while True:
+                print(f"\nCrawling Page {current_page}...")
             
-            video_links = []
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
+                try:
+                    video_links = await get_video_list(fetcher, current_page)
                 
-                if not href.startswith("http"):
-                    href = "https://media.qdnd.vn" + href
+                    if video_links is None:
+                        print("No content returned (end of pages).")
+                        break
                 
-                # DEBUG: Print found link
-                # print(f"Found link: {href}")
-                
-                # Filter: Must be media.qdnd.vn and look like a detail page
-                if not href.startswith("https://media.qdnd.vn/"):
-                    continue
+                    if not video_links:
+                        print("No videos found on this page. Stopping.")
+                        break
                     
-                if ("/video/" in href or "/audio-podcast/" in href or "/podcast/" in href) and re.search(r'-\d+$', href):
-                     title = a.get("title") or a.get_text(strip=True)
-                     
-                     if not any(v['url'] == href for v in video_links):
-                        video_links.append({"url": href, "title": title})
-                     else:
-                        pass # Duplicate
-                else:
-                     # DEBUG: Print rejected link
-                     print(f"Rejected: {href}")
-            
-            if not video_links:
-                print("No videos found on this page. Stopping.")
-                break
+                    print(f"Found {len(video_links)} videos.")
                 
-            print(f"Found {len(video_links)} videos.")
-            
-            for video in video_links:
-                video_url = video['url']
-                video_hash = get_md5(video_url)
+                    pending = []
+                    for video in video_links:
+                        if get_md5(video['url']) in processed_videos:
+                            print(f"  Skipping (Processed): {video['title']}")
+                            continue
+                        pending.append(video)
                 
-                if video_hash in processed_videos:
-                    print(f"  Skipping (Processed): {video['title']}")
-                    continue
-                    
-                print(f"  Processing: {video['title']}")
-                audio_url = get_audio_source(video_url)
+                    # Resolve every detail page of this listing page concurrently
+                    sources = await asyncio.gather(*(get_audio_source(fetcher, v['url']) for v in pending))
                 
-                if audio_url:
-                    print(f"    Source: {audio_url}")
-                    
-                    safe_title = "".join([c for c in video['title'] if c.isalnum() or c in (' ', '-', '_')]).strip()
-                    safe_title = safe_title.replace(" ", "_")[:50]
-                    
-                    if CONFIG["save_audio"]:
-                        filename = f"QDND_PODCAST_{safe_title}.{CONFIG['audio_format']}"
-                        output_path = os.path.join(OUTPUT_DIR, filename)
-                        download_audio_ffmpeg(audio_url, output_path)
+                    for video, audio_url in zip(pending, sources):
+                        video_hash = get_md5(video['url'])
+                        print(f"  Processing: {video['title']}")
                     
-                    # Mark as processed
-                    processed_videos.add(video_hash)
-                    save_processed_videos(processed_videos)
-                    
-                    # Random delay
-                    delay = random.uniform(1, 3)
-                    print(f"    Sleeping for {delay:.2f}s...")
-                    time.sleep(delay)
-                else:
-                    print("    Could not find Audio source.")
-            
-            # Save state
-            save_crawler_state(current_page)
-            
-            # Next page
-            current_page += 1
-            
-            # Page delay
-            page_delay = random.uniform(2, 5)
-            print(f"Page done. Sleeping for {page_delay:.2f}s before next page...")
-            time.sleep(page_delay)
-            
-        except Exception as e:
-            print(f"Error crawling page {current_page}: {e}")
-            time.sleep(5)
-            # break # Optional: stop on error
+                        if audio_url:
+                            print(f"    Source: {audio_url}")
+                        
+                            safe_title = "".join([c for c in video['title'] if c.isalnum() or c in (' ', '-', '_')]).strip()
+                            safe_title = safe_title.replace(" ", "_")[:50]
+                        
+                            if CONFIG["save_audio"]:
+                                filename = f"QDND_PODCAST_{safe_title}.{CONFIG['audio_format']}"
+                                output_path = os.path.join(OUTPUT_DIR, filename)
+                                # Queued for the ffmpeg workers; marked as processed once it succeeds
+                                await transcoder.submit_async(audio_url, output_path, CONFIG["audio_format"],
+                                                               CONFIG["sample_rate"], CONFIG["channels"], key=video_hash)
+                            else:
+                                # Mark as processed
+                                processed_videos.add(video_hash)
+                        else:
+                            print("    Could not find Audio source.")
+                
+                    record_transcodes(processed_videos, transcoder.completed())
+                
+                    # Save state
+                    save_crawler_state(current_page)
+                
+                    # Next page
+                    current_page += 1
+                
+                except Exception as e:
+                    print(f"Error crawling page {current_page}: {e}")
+                    await asyncio.sleep(5)
+                    # break # Optional: stop on error
+    finally:
+        # Let running transcodes finish so their items are recorded
+        print(f"Waiting for {transcoder.pending} transcodes to finish...")
+        record_transcodes(processed_videos, transcoder.join())
+        processed_videos.close()
+
+def safe_name(title):
+    safe_title = "".join([c for c in title if c.isalnum() or c in (' ', '-', '_')]).strip()
+    return safe_title.replace(" ", "_")[:50]
+
+class QdndPodcastSource(SourcePlugin):
+    """Frontier plugin (see crawl_all_sources.py): LoadMoreAudioList pages, then one task per podcast page."""
+    name = "qdnd_podcast"
+
+    def start(self, transcoder):
+        super().start(transcoder)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        self.processed_videos = load_processed_videos()
+
+    def seeds(self):
+        return [Task(f"{self.name}:list:1", API_URL, self.name, "listing", priority=1, data={"page": 1})]
+
+    async def handle(self, fetcher, task):
+        if task.kind == "listing":
+            return await self.handle_listing(fetcher, task)
+        await self.handle_podcast(fetcher, task)
+        return []
+
+    async def handle_listing(self, fetcher, task):
+        page = task.data["page"]
+        video_links = await get_video_list(fetcher, page)
+        if not video_links:
+            return []
+
+        tasks = [Task(f"{self.name}:{video['url']}", video['url'], self.name, "detail",
+                      priority=page + 0.5, data={"title": video['title']})
+                 for video in video_links if get_md5(video['url']) not in self.processed_videos]
+        tasks.append(Task(f"{self.name}:list:{page + 1}", API_URL, self.name, "listing",
+                          priority=page + 1, data={"page": page + 1}))
+        return tasks
+
+    async def handle_podcast(self, fetcher, task):
+        video_hash = get_md5(task.url)
+        audio_url = await get_audio_source(fetcher, task.url)
+        if not audio_url:
+            raise RuntimeError("could not find audio source")
+
+        if CONFIG["save_audio"]:
+            filename = f"QDND_PODCAST_{safe_name(task.data['title'])}.{CONFIG['audio_format']}"
+            await self.transcode(task, video_hash, audio_url, os.path.join(OUTPUT_DIR, filename), CONFIG["audio_format"],
+                                 CONFIG["sample_rate"], CONFIG["channels"])
+        else:
+            self.processed_videos.add(video_hash)
+
+    def on_transcoded(self, job):
+        record_transcodes(self.processed_videos, [job])
+
+    def close(self):
+        self.processed_videos.close()
+
+def main():
+    configure_metrics(CONFIG)
+    configure_archive(CONFIG)
+    asyncio.run(crawl())
 
 if __name__ == "__main__":
     main()
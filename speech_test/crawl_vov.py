@@ -9,13 +9,26 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from tqdm import tqdm
-import time
 import random
 import json
 import os
-import subprocess
 import re
 import hashlib
+import html
+import sys
+from urllib.parse import urljoin
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_common.dedup_store import ProcessedStore
+from crawl_common.rate_limiter import default_limiter, host_of
+from crawl_common.metrics import RESOLVE, configure_metrics, default_metrics
+from crawl_common.warc_archive import archive_page, configure_archive
+from crawl_common.transcode_pool import TranscodePool
+from crawl_common.media_capture import (enable_network_capture, clear_network_log, capture_media_url,
+                                        wait_for_script_result)
+from crawl_common.resource_blocking import block_resources_cdp
+from crawl_common.incremental import IncrementalCrawl
+from crawl_common.http_cache import ResponseCache
 
 # Configuration
 CONFIG = {
@@ -23,7 +36,12 @@ CONFIG = {
     "audio_format": "wav",
     "sample_rate": "16000",
     "channels": "1",
-    "headless": True
+    "headless": True,
+    "audio_capture": "network", # "network" (Chrome performance log) or "dom" (wait + script/page-source scan)
+    "capture_timeout": 6, # Seconds to wait for the player's media request
+    "block_resources": True, # Block images, fonts and ad/analytics hosts via CDP (crawl_common/resource_blocking.py)
+    "crawl_mode": "incremental", # "incremental": after one full pass, stop at the first page with nothing new; "full": walk every page
+    "listing_cache": True # Read list pages over HTTP through an on-disk cache (conditional GETs, crawl_common/http_cache.py); the browser is only used when that finds no links
 }
 
 # User-Agent pool for rotation
@@ -43,20 +61,16 @@ if os.path.exists("pipeline_config.json"):
 OUTPUT_DIR = "downloads_audio"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-PROCESSED_FILE = "processed_vov.json"
-processed_items = set()
-
-if os.path.exists(PROCESSED_FILE):
-    with open(PROCESSED_FILE, "r") as f:
-        processed_items = set(json.load(f))
+PROCESSED_FILE = "processed_vov.json" # Legacy list, imported once into PROCESSED_DB
+PROCESSED_DB = "processed_vov.db"
+processed_items = ProcessedStore(PROCESSED_DB, legacy_json=PROCESSED_FILE)
+STATE_FILE = "crawler_state_vov.json"
+ITEM_LINK_SELECTOR = "a[href*='.vov']"
+LISTING_CACHE_DB = "listing_cache_vov.db"
 
 def get_md5(string):
     return hashlib.md5(string.encode()).hexdigest()
 
-def save_processed_items(processed_set):
-    with open(PROCESSED_FILE, "w") as f:
-        json.dump(list(processed_set), f, indent=2)
-
 def get_random_user_agent():
     """Get a random user agent from pool"""
     return random.choice(USER_AGENTS)
@@ -78,6 +92,8 @@ def setup_driver():
     # Additional anti-detection measures
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    if CONFIG.get("audio_capture") == "network":
+        enable_network_capture(options)
     
     # === PHẦN QUAN TRỌNG NHẤT: TRỎ ĐƯỜNG DẪN ===
     # Đường dẫn mặc định khi cài bằng apt-get
@@ -109,6 +125,9 @@ def setup_driver():
         '''
     })
     
+    if CONFIG.get("block_resources"):
+        block_resources_cdp(driver, site="vov.vn")
+    
     return driver
     
 def extract_item_links(driver):
@@ -117,7 +136,7 @@ def extract_item_links(driver):
     
     # Find links to detail pages
     # Usually in h4 > a or similar structure
-    elements = driver.find_elements(By.CSS_SELECTOR, "a[href*='.vov']")
+    elements = driver.find_elements(By.CSS_SELECTOR, ITEM_LINK_SELECTOR)
     
     for elem in elements:
         href = elem.get_attribute("href")
@@ -125,23 +144,47 @@ def extract_item_links(driver):
         if not href:
             continue
             
-        # Filter for detail pages (usually ends with .vov and has ID)
-        # e.g. https://vov.vn/podcast/cau-chuyen-thoi-su/abc-xyz-post123.vov
-        if "podcast/" in href and "-post" in href and href.endswith(".vov"):
-            if href not in links:
-                links.append(href)
+        if is_item_link(href) and href not in links:
+            links.append(href)
                 
     return links
 
+def is_item_link(href):
+    # Filter for detail pages (usually ends with .vov and has ID)
+    # e.g. https://vov.vn/podcast/cau-chuyen-thoi-su/abc-xyz-post123.vov
+    return "podcast/" in href and "-post" in href and href.endswith(".vov")
+
+def fetch_item_links(listing_cache, page_url):
+    """Item links from the list page's HTML, fetched through the cache (no browser)"""
+    try:
+        response = listing_cache.fetch(page_url, headers={"User-Agent": random.choice(USER_AGENTS)},
+                                       limiter=default_limiter)
+    except Exception as e:
+        print(f"  Listing fetch failed ({e}), using the browser")
+        return []
+    print(f"  Listing {response.outcome}")
+    links = []
+    for href in re.findall(r'href=["\']([^"\']+)["\']', response.text):
+        href = urljoin(page_url, html.unescape(href))
+        if is_item_link(href) and href not in links:
+            links.append(href)
+    return links
+
 def extract_audio_from_page(driver, url):
     """Visit detail page and extract audio source"""
     try:
-        driver.get(url)
-        # Random delay
-        time.sleep(random.uniform(2, 4))
+        if CONFIG.get("audio_capture") == "network":
+            # Take the media URL from the player's own request instead of scanning the page
+            clear_network_log(driver)
+            default_limiter.call(url, lambda: driver.get(url))
+            archive_page(url, lambda: driver.page_source)
+            return capture_media_url(driver, timeout=CONFIG.get("capture_timeout", 6))
+        
+        default_limiter.call(url, lambda: driver.get(url))
+        archive_page(url, lambda: driver.page_source)
         
         # Try to find audio source via JavaScript
-        audio_url = driver.execute_script("""
+        audio_url = wait_for_script_result(driver, """
             // Method 1: HTML5 audio/video element
             var audioElem = document.querySelector('audio');
             if (audioElem && audioElem.src) {
@@ -163,7 +206,7 @@ def extract_audio_from_page(driver, url):
             // This part is speculative, adjust based on actual site inspection
             
             return null;
-        """)
+        """, timeout=CONFIG.get("capture_timeout", 6))
         
         if audio_url:
             return audio_url
@@ -189,29 +232,14 @@ def get_title_from_page(driver):
     except:
         return "Unknown"
 
-def download_audio_ffmpeg(audio_url, output_path):
-    """Downloads audio using ffmpeg"""
-    if os.path.exists(output_path):
-        return True
-    
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", audio_url,
-        "-vn",
-        "-acodec", "pcm_s16le" if CONFIG["audio_format"] == "wav" else "libmp3lame",
-        "-ar", str(CONFIG["sample_rate"]),
-        "-ac", str(CONFIG["channels"]),
-        output_path
-    ]
-    
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"\n❌ Download failed: {output_path}")
-        print(f"   Error: {e.stderr.decode()[:200]}")
-        return False
+def record_transcodes(jobs):
+    """Marks finished transcodes as processed."""
+    for job in jobs:
+        if job.ok:
+            processed_items.add(job.key)
+        else:
+            print(f"\n❌ Download failed: {job.output_path}")
+            print(f"   Error: {job.error}")
 
 def main():
     print("="*60)
@@ -219,7 +247,12 @@ def main():
     print("="*60)
     
     print("Setting up browser...")
+    configure_metrics(CONFIG)
+    configure_archive(CONFIG)
     driver = setup_driver()
+    transcoder = TranscodePool(workers=CONFIG.get("transcode_workers"))
+    incremental = IncrementalCrawl(STATE_FILE, enabled=CONFIG["crawl_mode"] == "incremental")
+    listing_cache = ResponseCache(LISTING_CACHE_DB) if CONFIG.get("listing_cache") else None
     
     try:
         page = 0
@@ -229,14 +262,23 @@ def main():
             page_url = f"{base_url}?page={page}"
             print(f"\nCrawling Page {page}: {page_url}")
             
-            driver.get(page_url)
-            time.sleep(3)
-            
-            # Extract links
-            links = extract_item_links(driver)
+            links = fetch_item_links(listing_cache, page_url) if listing_cache is not None else []
+            if not links:
+                default_limiter.call(page_url, lambda: driver.get(page_url))
+                # Wait for the item links themselves rather than a fixed 3s
+                try:
+                    WebDriverWait(driver, 10).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, ITEM_LINK_SELECTOR))
+                    )
+                except TimeoutException:
+                    pass
+                
+                # Extract links
+                links = extract_item_links(driver)
             
             if not links:
                 print("No items found on this page. Stopping.")
+                incremental.finish()
                 break
                 
             print(f"Found {len(links)} items.")
@@ -251,7 +293,10 @@ def main():
                         continue
                         
                     # Extract audio
-                    audio_url = extract_audio_from_page(driver, url)
+                    with default_metrics.stage(RESOLVE, host_of(url)) as span:
+                        audio_url = extract_audio_from_page(driver, url)
+                        if not audio_url:
+                            span.fail("no audio")
                     
                     if audio_url:
                         title = get_title_from_page(driver)
@@ -261,28 +306,31 @@ def main():
                         if CONFIG["save_audio"]:
                             filename = f"VOV_{safe_title}.{CONFIG['audio_format']}"
                             output_path = os.path.join(OUTPUT_DIR, filename)
-                            download_audio_ffmpeg(audio_url, output_path)
-                        
-                        processed_items.add(item_hash)
-                        save_processed_items(processed_items)
+                            # Queued for the ffmpeg workers; marked as processed once it succeeds
+                            transcoder.submit(audio_url, output_path, CONFIG["audio_format"],
+                                              CONFIG["sample_rate"], CONFIG["channels"], key=item_hash)
+                        else:
+                            processed_items.add(item_hash)
                     else:
                         print(f"\n⚠️  No audio found: {url}")
                         processed_items.add(item_hash) # Mark as processed to avoid retry
-                        save_processed_items(processed_items)
                         
+                    record_transcodes(transcoder.completed())
                     pbar.update(1)
-                    
-                    # Random delay
-                    time.sleep(random.uniform(3, 6))
             
+            if incremental.should_stop(page, [get_md5(url) for url in links], processed_items):
+                incremental.finish()
+                break
             page += 1
             
-            # Page delay
-            time.sleep(random.uniform(2, 5))
-            
     finally:
         print("\nClosing browser...")
         driver.quit()
+        # Let running transcodes finish so their items are recorded
+        record_transcodes(transcoder.join())
+        processed_items.close()
+        if listing_cache is not None:
+            listing_cache.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,104 @@
 import os
 import random
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import soundfile as sf
 from faster_whisper import WhisperModel
-from pydub import AudioSegment
 
 # --- CẤU HÌNH ---
 MODEL_SIZE = "small"   # Chọn 'tiny', 'base', 'small', 'medium', 'large-v2' (Máy khỏe thì dùng large)
 INPUT_FILE = "downloads_audio/THOI_SU_Tỉnh_Gia_Lai_Càng_khó_khăn_tình_quân_-_dân_càng_th.wav" # Đường dẫn file audio gốc
 OUTPUT_DIR = "dataset_whisper_test"
+BEAM_SIZE = 5
+
+# --- BATCH MODE (python split_audio.py --batch) ---
+BATCH_INPUT_DIR = "downloads_audio"
+BATCH_OUTPUT_DIR = "dataset_whisper"
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a")
+# Số process chạy song song; mỗi process load model 1 lần và dùng cpu_count / workers luồng CPU
+BATCH_WORKERS = 2
+
+_worker_model = None
+
+def random_target_duration():
+    # Random độ dài mục tiêu cho mỗi chunk (20s - 30s)
+    return random.uniform(20, 30)
+
+# Định dạng libsndfile đọc được (wav, mp3, flac, ogg...); còn lại (m4a/AAC) giải mã qua ffmpeg
+SNDFILE_FORMATS = set(sf.available_formats())
+
+def load_audio(path):
+    """Đọc toàn bộ audio một lần thành mảng NumPy int16 (samples[, channels]) + sample rate."""
+    ext = os.path.splitext(path)[1][1:].upper()
+    if ext in SNDFILE_FORMATS:
+        return sf.read(path, dtype="int16")
+    return load_audio_ffmpeg(path)
+
+def load_audio_ffmpeg(path):
+    """Giải mã bằng ffmpeg ra PCM 16-bit, giữ nguyên sample rate và số kênh của file gốc."""
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=sample_rate,channels",
+         "-of", "csv=p=0", path],
+        capture_output=True, text=True, check=True
+    )
+    sample_rate, channels = (int(v) for v in probe.stdout.strip().split(",")[:2])
+    decoded = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", path, "-map", "0:a:0",
+         "-f", "s16le", "-acodec", "pcm_s16le", "-"],
+        capture_output=True, check=True
+    )
+    audio = np.frombuffer(decoded.stdout, dtype=np.int16)
+    # Cùng dạng với sf.read: 1 chiều nếu mono, (samples, channels) nếu nhiều kênh
+    if channels > 1:
+        audio = audio[: len(audio) - len(audio) % channels].reshape(-1, channels)
+    return audio, sample_rate
+
+def plan_chunks(segments, sample_rate):
+    """
+    Tính trước ranh giới các chunk từ timestamp của segment.
+    Mỗi chunk là một khoảng liên tục [start, end) tính bằng sample, kèm text.
+    """
+    chunks = []
+    chunk_start = None
+    chunk_end = None
+    texts = []
+    target = random_target_duration()
+
+    for segment in segments:
+        if chunk_start is None:
+            chunk_start = segment.start
+        chunk_end = segment.end
+        texts.append(segment.text.strip())
+
+        # Kiểm tra độ dài: Nếu >= target random hiện tại thì chốt chunk
+        if chunk_end - chunk_start >= target:
+            chunks.append((int(chunk_start * sample_rate), int(chunk_end * sample_rate), " ".join(texts), target))
+            chunk_start = None
+            texts = []
+            target = random_target_duration()
+
+    # Đoạn thừa cuối cùng (nếu có)
+    if chunk_start is not None:
+        chunks.append((int(chunk_start * sample_rate), int(chunk_end * sample_rate), " ".join(texts), target))
+    return chunks
+
+def write_chunks(audio, sample_rate, chunks, output_dir, verbose=True):
+    """Mỗi chunk được ghi bằng một lát cắt (view) của mảng gốc, không ghép nối trung gian."""
+    os.makedirs(output_dir, exist_ok=True)
+    for chunk_idx, (start, end, text, target) in enumerate(chunks, start=1):
+        out_filename = f"chunk_{chunk_idx:04d}.wav"
+        out_path = os.path.join(output_dir, out_filename)
+        sf.write(out_path, audio[start:end], sample_rate, subtype="PCM_16")
+
+        # Lưu text (nếu cần làm data ASR)
+        with open(out_path.replace(".wav", ".txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+        if verbose:
+            print(f"-> Saved {out_filename} ({(end - start) / sample_rate:.1f}s / target {target:.1f}s): {text[:30]}...")
 
 def process_with_whisper():
     print("1. Đang load model Whisper...")
@@ -14,57 +106,84 @@ def process_with_whisper():
     model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8")
 
     print(f"2. Đang Transcribe file: {INPUT_FILE}...")
-    segments, info = model.transcribe(INPUT_FILE, beam_size=5)
-
-    # Load audio gốc để tí nữa cắt
-    audio = AudioSegment.from_file(INPUT_FILE)
-    
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    
-    current_chunk_audio = AudioSegment.empty()
-    current_text = ""
-    chunk_idx = 1
-    
-    # Random độ dài mục tiêu ban đầu (20s - 30s)
-    current_target_duration = random.uniform(20, 30) * 1000 
-    
-    print("3. Đang cắt và ghép segment...")
-    for segment in segments:
-        # segment.start và segment.end là thời gian (giây)
-        start_ms = segment.start * 1000
-        end_ms = segment.end * 1000
-        
-        # Cắt đoạn audio tương ứng với câu này
-        seg_audio = audio[start_ms:end_ms]
-        
-        # Cộng dồn vào chunk hiện tại
-        current_chunk_audio += seg_audio
-        current_text += segment.text + " "
-        
-        # Kiểm tra độ dài: Nếu >= target random hiện tại thì Xuất file
-        if len(current_chunk_audio) >= current_target_duration:
-            # Lưu audio
-            out_filename = f"chunk_{chunk_idx:04d}.wav"
-            out_path = os.path.join(OUTPUT_DIR, out_filename)
-            current_chunk_audio.export(out_path, format="wav")
-            
-            # Lưu text (nếu cần làm data ASR)
-            with open(out_path.replace(".wav", ".txt"), "w", encoding="utf-8") as f:
-                f.write(current_text.strip())
-            
-            print(f"-> Saved {out_filename} ({len(current_chunk_audio)/1000:.1f}s / target {current_target_duration/1000:.1f}s): {current_text[:30]}...")
-            
-            # Reset
-            current_chunk_audio = AudioSegment.empty()
-            current_text = ""
-            chunk_idx += 1
-            
-            # Random lại target mới cho chunk tiếp theo
-            current_target_duration = random.uniform(20, 30) * 1000
-            
-    # Lưu nốt đoạn thừa cuối cùng (nếu có)
-    if len(current_chunk_audio) > 0:
-        current_chunk_audio.export(os.path.join(OUTPUT_DIR, f"chunk_{chunk_idx:04d}.wav"), format="wav")
+    segments, info = model.transcribe(INPUT_FILE, beam_size=BEAM_SIZE)
+
+    # Load audio gốc một lần thành mảng NumPy để tí nữa cắt
+    audio, sample_rate = load_audio(INPUT_FILE)
+
+    print("3. Đang tính ranh giới chunk và cắt...")
+    chunks = plan_chunks(segments, sample_rate)
+    write_chunks(audio, sample_rate, chunks, OUTPUT_DIR)
+
+def init_worker(model_size, cpu_threads):
+    """Load model đúng 1 lần cho mỗi worker process."""
+    global _worker_model
+    _worker_model = WhisperModel(model_size, device="cpu", compute_type="int8",
+                                 cpu_threads=cpu_threads, num_workers=1)
+
+def segment_file(input_path, output_dir, beam_size):
+    """
+    Transcribe + cắt một file trong worker process.
+    Chunk được ghi vào thư mục tạm rồi đổi tên, nên thư mục output chỉ tồn tại khi file đã xong.
+    """
+    tmp_dir = output_dir + ".part"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    segments, info = _worker_model.transcribe(input_path, beam_size=beam_size)
+    audio, sample_rate = load_audio(input_path)
+    chunks = plan_chunks(segments, sample_rate)
+    write_chunks(audio, sample_rate, chunks, tmp_dir, verbose=False)
+    os.replace(tmp_dir, output_dir)
+    return len(chunks)
+
+def find_pending_files(input_dir, output_dir):
+    """Các file audio chưa có thư mục chunk output."""
+    pending = []
+    for name in sorted(os.listdir(input_dir)):
+        if not name.lower().endswith(AUDIO_EXTENSIONS) or ".part." in name:
+            continue
+        stem = os.path.splitext(name)[0]
+        if os.path.isdir(os.path.join(output_dir, stem)):
+            continue
+        pending.append((os.path.join(input_dir, name), os.path.join(output_dir, stem)))
+    return pending
+
+def process_directory(input_dir=BATCH_INPUT_DIR, output_dir=BATCH_OUTPUT_DIR, workers=BATCH_WORKERS,
+                      cpu_threads=None, beam_size=BEAM_SIZE):
+    os.makedirs(output_dir, exist_ok=True)
+    pending = find_pending_files(input_dir, output_dir)
+    print(f"{len(pending)} file cần xử lý trong {input_dir} (bỏ qua các file đã có chunk trong {output_dir})")
+    if not pending:
+        return
+
+    workers = max(1, min(workers, len(pending)))
+    cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // workers)
+    print(f"Chạy {workers} worker process x {cpu_threads} luồng CPU, model {MODEL_SIZE}, beam_size={beam_size}")
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(MODEL_SIZE, cpu_threads)) as executor:
+        futures = {executor.submit(segment_file, input_path, out_dir, beam_size): input_path
+                   for input_path, out_dir in pending}
+        for future in as_completed(futures):
+            input_path = futures[future]
+            done += 1
+            try:
+                num_chunks = future.result()
+                print(f"[{done}/{len(pending)}] {os.path.basename(input_path)}: {num_chunks} chunks")
+            except Exception as e:
+                print(f"[{done}/{len(pending)}] Lỗi {input_path}: {e}")
 
 if __name__ == "__main__":
-    process_with_whisper()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Cắt audio thành chunk 20-30s theo segment của Whisper")
+    parser.add_argument("--batch", action="store_true", help="Xử lý toàn bộ thư mục thay vì INPUT_FILE")
+    parser.add_argument("--input-dir", default=BATCH_INPUT_DIR)
+    parser.add_argument("--output-dir", default=BATCH_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--cpu-threads", type=int, default=None)
+    parser.add_argument("--beam-size", type=int, default=BEAM_SIZE)
+    args = parser.parse_args()
+
+    if args.batch:
+        process_directory(args.input_dir, args.output_dir, args.workers, args.cpu_threads, args.beam_size)
+    else:
+        process_with_whisper()
\ No newline at end of file
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The crawlers import crawl_common from the repo root the same way
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
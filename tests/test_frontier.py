@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+import crawl_common.transcode_pool as transcode_pool
+from crawl_common.frontier import DONE, FAILED, PENDING, Frontier, Scheduler, SourcePlugin, Task
+from crawl_common.rate_limiter import HostRateLimiter
+from crawl_common.transcode_pool import TranscodePool
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = Frontier(str(tmp_path / "frontier.db"))
+    yield frontier
+    frontier.close()
+
+
+def listing(page, host="qdnd.vn"):
+    return Task(f"{host}:list:{page}", f"https://{host}/list/{page}", "src", "listing", priority=page)
+
+
+def detail(n, host="qdnd.vn", priority=0.0):
+    return Task(f"{host}:item:{n}", f"https://{host}/item/{n}", "src", "detail", priority=priority)
+
+
+def drain(frontier):
+    tasks = []
+    while True:
+        task, _ = frontier.pop_ready(limiter=None)
+        if task is None:
+            return tasks
+        tasks.append(task)
+
+
+def test_add_dedups_pending_and_done_details(frontier):
+    task = detail(1)
+    assert frontier.add(task)
+    assert not frontier.add(detail(1))
+    frontier.done(frontier.pop_ready(limiter=None)[0])
+    assert not frontier.add(detail(1))
+    assert drain(frontier) == []
+
+
+def test_done_listing_is_requeued(frontier):
+    assert frontier.add(listing(1))
+    assert not frontier.add(listing(1))
+    frontier.done(frontier.pop_ready(limiter=None)[0])
+    assert frontier.add(listing(1))
+    assert [task.key for task in drain(frontier)] == ["qdnd.vn:list:1"]
+
+
+def test_pop_ready_lowest_priority_across_hosts(frontier):
+    frontier.add(detail(1, priority=3))
+    frontier.add(detail(2, host="nhandan.vn", priority=1))
+    frontier.add(detail(3, priority=2))
+    assert [task.key for task in drain(frontier)] == ["nhandan.vn:item:2", "qdnd.vn:item:3", "qdnd.vn:item:1"]
+
+
+def test_pop_ready_skips_busy_and_throttled_hosts(frontier):
+    frontier.add(detail(1, priority=0))
+    frontier.add(detail(2, host="nhandan.vn", priority=5))
+    task, wait = frontier.pop_ready(limiter=None, in_flight={"qdnd.vn": 2}, per_host_tasks=2)
+    assert task.key == "nhandan.vn:item:2"
+
+    limiter = HostRateLimiter(jitter=0)
+    limiter.record("https://qdnd.vn/", status=429, retry_after="10")
+    task, wait = frontier.pop_ready(limiter=limiter)
+    assert task is None
+    assert wait == pytest.approx(10.0, abs=0.1)
+
+
+def test_pop_ready_empty(frontier):
+    assert frontier.pop_ready(limiter=None) == (None, None)
+
+
+def test_retry_penalty_then_failed(frontier):
+    frontier.add(detail(1, priority=1))
+    frontier.add(detail(2, priority=5))
+    task = frontier.pop_ready(limiter=None)[0]
+    assert frontier.retry(task, "timeout", max_attempts=2, penalty=10) == PENDING
+    assert task.priority == 11
+    # Requeued behind the other task
+    assert [t.key for t in drain(frontier)] == ["qdnd.vn:item:2", "qdnd.vn:item:1"]
+    assert frontier.retry(task, "timeout", max_attempts=2, penalty=10) == FAILED
+    assert drain(frontier) == []
+    frontier.flush()
+    assert frontier.counts() == {FAILED: 1, PENDING: 1}
+
+
+def test_pending_tasks_resume_on_reopen(tmp_path):
+    path = str(tmp_path / "frontier.db")
+    frontier = Frontier(path)
+    frontier.add(detail(1, priority=2))
+    frontier.add(detail(2, priority=1))
+    frontier.done(frontier.pop_ready(limiter=None)[0])
+    frontier.close()
+
+    frontier = Frontier(path)
+    try:
+        assert [task.key for task in drain(frontier)] == ["qdnd.vn:item:1"]
+        assert frontier.counts() == {DONE: 1, PENDING: 1}
+    finally:
+        frontier.close()
+
+
+class MediaSource(SourcePlugin):
+    name = "media"
+
+    def __init__(self, items):
+        self.items = items
+        self.transcoded = []
+
+    def seeds(self):
+        return [Task("media:list:1", "https://media.test/list/1", self.name, "listing")]
+
+    async def handle(self, fetcher, task):
+        if task.kind == "listing":
+            return [Task(f"media:item:{item}", f"https://media.test/item/{item}", self.name, "detail")
+                    for item in self.items]
+        await self.transcode(task, task.key.split(":")[-1], task.url + ".mp3", "out.wav")
+        return []
+
+    def on_transcoded(self, job):
+        self.transcoded.append((job.key, job.ok))
+
+
+def fake_transcode(job, limiter=None, download_dir=None):
+    job.ok = "bad" not in job.source_url
+    job.error = None if job.ok else "ffmpeg failed"
+
+
+def run_scheduler(frontier, plugin, monkeypatch):
+    monkeypatch.setattr(transcode_pool, "run_transcode", fake_transcode)
+    scheduler = Scheduler(frontier, [plugin], fetcher=None, transcoder=TranscodePool(workers=2),
+                          workers=2, limiter=None, max_attempts=2)
+    asyncio.run(scheduler.run())
+
+
+def test_scheduler_marks_task_done_after_transcode(frontier, monkeypatch):
+    plugin = MediaSource(["1", "2"])
+    run_scheduler(frontier, plugin, monkeypatch)
+    assert sorted(plugin.transcoded) == [("1", True), ("2", True)]
+    assert frontier.counts() == {DONE: 3}
+
+
+def test_scheduler_retries_failed_transcode(frontier, monkeypatch):
+    plugin = MediaSource(["1", "bad"])
+    run_scheduler(frontier, plugin, monkeypatch)
+    # Retried once, then failed
+    assert sorted(plugin.transcoded) == [("1", True), ("bad", False), ("bad", False)]
+    row = frontier.conn.execute("SELECT state, attempts, error FROM tasks WHERE key = 'media:item:bad'").fetchone()
+    assert row == (FAILED, 2, "transcode: ffmpeg failed")
+    assert frontier.counts() == {DONE: 2, FAILED: 1}
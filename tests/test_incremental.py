@@ -0,0 +1,106 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from crawl_common.incremental import IncrementalCrawl, load_state, parse_date, update_state
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Thứ Hai, 05/02/2024 14:30", datetime(2024, 2, 5, 14, 30)),
+    ("5-2-2024", datetime(2024, 2, 5)),
+    ("Cập nhật 05.02.2024 - 9h05", datetime(2024, 2, 5, 9, 5)),
+    ("2024-02-05T14:30:00", datetime(2024, 2, 5, 14, 30)),
+    ("31/02/2024", None),
+    ("không có ngày", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_date(text, expected):
+    assert parse_date(text) == expected
+
+
+def test_update_state_merges(tmp_path):
+    path = str(tmp_path / "crawler_state.json")
+    assert load_state(path) == {}
+    with open(path, "w") as f:
+        json.dump({"last_page": 7}, f)
+    update_state(path, backfill_done=True, incremental_page=3)
+    update_state(path, incremental_page=None)
+    assert load_state(path) == {"last_page": 7, "backfill_done": True}
+
+
+def test_broken_state_file(tmp_path):
+    path = tmp_path / "crawler_state.json"
+    path.write_text("{not json")
+    assert load_state(str(path)) == {}
+
+
+def finished_crawl(tmp_path, watermark="2024-02-05T08:00:00", **state):
+    path = str(tmp_path / "crawler_state.json")
+    update_state(path, backfill_done=True, watermark=watermark, **state)
+    return path
+
+
+def test_inactive_until_backfill_done(tmp_path):
+    path = str(tmp_path / "crawler_state.json")
+    update_state(path, last_page=4)
+    crawl = IncrementalCrawl(path)
+    assert not crawl.active
+    assert not crawl.should_stop(1, ["a"], {"a"})
+    assert not IncrementalCrawl(finished_crawl(tmp_path), enabled=False).active
+
+
+def test_stops_on_a_page_of_known_links(tmp_path):
+    crawl = IncrementalCrawl(finished_crawl(tmp_path))
+    assert crawl.active
+    assert not crawl.should_stop(1, ["a", "b"], {"a"})
+    assert not crawl.should_stop(2, [], set())
+    assert crawl.should_stop(3, ["a", "b"], {"a", "b"})
+
+
+def test_stops_at_watermark(tmp_path):
+    crawl = IncrementalCrawl(finished_crawl(tmp_path))
+    assert not crawl.seen("06/02/2024 10:00")
+    assert not crawl.seen("không rõ")
+    assert not crawl.should_stop(1, ["a"], set())
+    assert crawl.seen("04/02/2024 10:00")
+    assert crawl.should_stop(2, ["b"], set())
+
+
+def test_resume_page_after_interruption(tmp_path):
+    path = finished_crawl(tmp_path)
+    crawl = IncrementalCrawl(path)
+    assert not crawl.should_stop(1, ["a"], set())
+    assert not crawl.should_stop(2, ["b"], set())
+    assert load_state(path)["incremental_page"] == 2
+
+    # Interrupted: known pages up to 2 do not stop the next pass
+    crawl = IncrementalCrawl(path)
+    assert crawl.resume_page == 2
+    assert not crawl.should_stop(1, ["a"], {"a", "b"})
+    assert not crawl.should_stop(2, ["b"], {"a", "b"})
+    assert crawl.should_stop(3, ["c"], {"c"})
+
+
+def test_finish_advances_watermark(tmp_path):
+    path = finished_crawl(tmp_path, incremental_page=5, last_page=9)
+    crawl = IncrementalCrawl(path)
+    crawl.seen("07/02/2024 09:15")
+    crawl.seen("06/02/2024")
+    crawl.finish()
+    assert load_state(path) == {"last_page": 9, "backfill_done": True, "watermark": "2024-02-07T09:15:00"}
+
+    # Nothing newer: the watermark stays
+    crawl = IncrementalCrawl(path)
+    crawl.seen("01/01/2024")
+    crawl.finish()
+    assert load_state(path)["watermark"] == "2024-02-07T09:15:00"
+
+
+def test_first_finish_marks_backfill_done(tmp_path):
+    path = str(tmp_path / "crawler_state.json")
+    crawl = IncrementalCrawl(path)
+    crawl.finish()
+    assert load_state(path) == {"backfill_done": True}
+    assert IncrementalCrawl(path).active
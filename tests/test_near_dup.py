@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from crawl_common.near_dup import NearDuplicateIndex, index_shards, shingles, similarity
+from crawl_common.shard_writer import ShardWriter
+
+WORDS = ("quân đội nhân dân bảo vệ tổ quốc huấn luyện sẵn sàng chiến đấu đơn vị cán bộ chiến sĩ "
+         "nhiệm vụ kế hoạch tổ chức hội nghị tổng kết công tác năm phát động thi đua").split()
+
+
+def article(seed, words=400):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def edit(text, every):
+    """Replaces every `every`-th word, for a near-duplicate with a known overlap."""
+    words = text.split()
+    return " ".join("SỬA" if i % every == 0 else word for i, word in enumerate(words))
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "near_dup.db"))
+    yield index
+    index.close()
+
+
+def test_shingles_normalize_case_and_punctuation():
+    assert shingles("Một, hai ba bốn năm!") == shingles("một hai  ba\nbốn năm")
+    assert len(shingles("một hai ba bốn năm sáu")) == 2
+
+
+def test_identical_text_found(index):
+    text = article(1)
+    index.add("https://qdnd.vn/a", index.signature(text))
+    match = index.find(index.signature(text))
+    assert match == ("https://qdnd.vn/a", 1.0)
+
+
+def test_unrelated_text_not_found(index):
+    index.add("https://qdnd.vn/a", index.signature(article(1)))
+    assert index.find(index.signature(article(2))) is None
+
+
+def test_threshold(index):
+    text = article(1)
+    index.add("https://qdnd.vn/a", index.signature(text))
+    # One word in 100 changed: ~95% of 5-gram shingles survive
+    close = index.find(index.signature(edit(text, 100)))
+    assert close is not None and close[0] == "https://qdnd.vn/a" and close[1] >= 0.8
+    # One word in 5 changed: hardly any shingle survives
+    assert index.find(index.signature(edit(text, 5))) is None
+    sig = index.signature(text)
+    assert similarity(sig, index.signature(edit(text, 100))) > similarity(sig, index.signature(edit(text, 10)))
+
+
+def test_best_match_wins(index):
+    text = article(1)
+    index.add("https://qdnd.vn/edited", index.signature(edit(text, 50)))
+    index.add("https://qdnd.vn/exact", index.signature(text))
+    assert index.find(index.signature(text))[0] == "https://qdnd.vn/exact"
+
+
+def test_empty_text_is_never_a_duplicate(index):
+    index.add("https://qdnd.vn/a", index.signature(""))
+    assert index.find(index.signature("")) is None
+    assert len(index) == 0
+
+
+def test_alias_and_canonical(index):
+    index.add("https://qdnd.vn/a", index.signature(article(1)))
+    index.add_alias("https://qdnd.vn/b", "https://qdnd.vn/a", 0.93)
+    assert index.canonical("https://qdnd.vn/b") == "https://qdnd.vn/a"
+    assert index.canonical("https://qdnd.vn/a") == "https://qdnd.vn/a"
+    assert "https://qdnd.vn/a" in index
+    assert "https://qdnd.vn/b" not in index
+
+
+def test_persists_and_refuses_other_parameters(tmp_path):
+    path = str(tmp_path / "near_dup.db")
+    with NearDuplicateIndex(path) as index:
+        index.add("https://qdnd.vn/a", index.signature(article(1)))
+    with NearDuplicateIndex(path) as index:
+        assert len(index) == 1
+        assert index.find(index.signature(article(1)))[0] == "https://qdnd.vn/a"
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(path, num_perm=64, bands=16)
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(str(tmp_path / "other.db"), num_perm=100, bands=16)
+
+
+def test_index_shards(tmp_path, index):
+    shard_dir = str(tmp_path / "shards")
+    text = article(1)
+    with ShardWriter(shard_dir) as writer:
+        writer.write("a", {"url": "https://qdnd.vn/a", "content": text})
+        writer.write("b", {"url": "https://qdnd.vn/b", "content": article(2)})
+        writer.write("c", {"url": "https://qdnd.vn/c", "content": edit(text, 100)})
+    assert index_shards(index, shard_dir) == (2, 1)
+    assert index.canonical("https://qdnd.vn/c") == "https://qdnd.vn/a"
+    # A second run adds nothing; aliases are matched again to the same document
+    assert index_shards(index, shard_dir) == (0, 1)
+    assert len(index) == 2
+    assert index.canonical("https://qdnd.vn/c") == "https://qdnd.vn/a"
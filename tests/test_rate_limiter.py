@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from crawl_common.rate_limiter import HostRateLimiter, host_of
+
+URL = "https://qdnd.vn/a"
+OTHER = "https://nhandan.vn/b"
+
+
+def limiter(**kwargs):
+    return HostRateLimiter(jitter=0, **kwargs)
+
+
+def test_host_of():
+    assert host_of("https://qdnd.vn/x?y=1") == "qdnd.vn"
+    assert host_of("qdnd.vn") == "qdnd.vn"
+
+
+def test_burst_then_wait():
+    rl = limiter(initial_rate=1.0, burst=2)
+    assert rl._reserve(URL) == 0.0
+    assert rl._reserve(URL) == 0.0
+    assert rl._reserve(URL) == pytest.approx(1.0, abs=0.05)
+    # Callers queue up behind each other
+    assert rl._reserve(URL) == pytest.approx(2.0, abs=0.05)
+
+
+def test_hosts_are_independent():
+    rl = limiter(initial_rate=1.0, burst=1)
+    rl._reserve(URL)
+    assert rl.ready_in(URL) > 0
+    assert rl.ready_in(OTHER) == 0.0
+    assert rl._reserve(OTHER) == 0.0
+
+
+def test_ready_in_does_not_take_a_token():
+    rl = limiter(initial_rate=1.0, burst=2)
+    rl._reserve(URL)
+    assert rl.ready_in(URL) == 0.0
+    assert rl.ready_in(URL) == 0.0
+    assert rl._reserve(URL) == 0.0
+    assert rl.ready_in(URL) == pytest.approx(1.0, abs=0.05)
+
+
+def test_additive_increase_capped():
+    rl = limiter(initial_rate=1.0, max_rate=1.2, increase=0.1)
+    rl.record(URL, status=200, latency=0.1)
+    assert rl.rate(URL) == pytest.approx(1.1)
+    for _ in range(10):
+        rl.record(URL, status=200, latency=0.1)
+    assert rl.rate(URL) == pytest.approx(1.2)
+
+
+def test_throttle_backs_off_and_cools_down():
+    rl = limiter(initial_rate=2.0, backoff=0.5, cooldown=30.0)
+    rl.record(URL, status=429)
+    assert rl.rate(URL) == pytest.approx(1.0)
+    assert rl.ready_in(URL) == pytest.approx(30.0, abs=0.1)
+    assert rl._reserve(URL) == pytest.approx(30.0, abs=0.1)
+
+
+def test_retry_after_overrides_cooldown():
+    rl = limiter(cooldown=30.0)
+    rl.record(URL, status=503, retry_after="5")
+    assert rl.ready_in(URL) == pytest.approx(5.0, abs=0.1)
+    # An unparsable Retry-After falls back to the cooldown
+    rl.record(OTHER, status=503, retry_after="Wed, 21 Oct 2015 07:28:00 GMT")
+    assert rl.ready_in(OTHER) == pytest.approx(30.0, abs=0.1)
+
+
+def test_error_drops_saved_tokens():
+    rl = limiter(initial_rate=1.0, burst=2, backoff=0.5)
+    rl.record(URL, status=200)
+    rl.record(URL, error=True)
+    assert rl.rate(URL) == pytest.approx(0.525)
+    assert rl.ready_in(URL) > 0
+
+
+def test_slow_response_backs_off_gently():
+    rl = limiter(initial_rate=1.0, slow_backoff=0.8, latency_target=3.0)
+    rl.record(URL, status=200, latency=5.0)
+    assert rl.rate(URL) == pytest.approx(0.8)
+
+
+def test_client_error_keeps_rate():
+    rl = limiter(initial_rate=1.0)
+    rl.record(URL, status=404, latency=0.1)
+    assert rl.rate(URL) == pytest.approx(1.0)
+
+
+def test_min_rate_floor():
+    rl = limiter(initial_rate=1.0, min_rate=0.2, backoff=0.5)
+    for _ in range(10):
+        rl.record(URL, error=True)
+    assert rl.rate(URL) == pytest.approx(0.2)
+
+
+def test_call_records_outcome():
+    rl = limiter(initial_rate=1.0, increase=0.1)
+
+    class Response:
+        status = 429
+
+    with pytest.raises(RuntimeError):
+        rl.call(URL, lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert rl.rate(URL) == pytest.approx(0.5)
+    rl.call(OTHER, lambda: None)
+    assert rl.rate(OTHER) == pytest.approx(1.1)
+    rl.call("https://vbpl.vn/c", Response)
+    assert rl.rate("https://vbpl.vn/c") == pytest.approx(0.5)
+
+
+def test_tokens_refill_over_time():
+    rl = limiter(initial_rate=20.0, burst=1)
+    rl._reserve(URL)
+    assert rl.ready_in(URL) > 0
+    time.sleep(0.1)
+    assert rl.ready_in(URL) == 0.0
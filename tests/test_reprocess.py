@@ -0,0 +1,84 @@
+import functools
+import json
+import os
+
+import pytest
+
+from crawl_common.reprocess import MANIFEST_FILE, iter_work_units, process_record, reprocess
+from crawl_common.shard_writer import ShardWriter, iter_records, list_shards, read_record
+
+QDND = "https://www.qdnd.vn/quoc-phong/bai-{}"
+VBPL = "https://vbpl.vn/boquocphong/Pages/vbpq-toanvan.aspx?ItemID={}"
+INFER = {"agency": ("Unknown_Agency", ["Chính phủ"])}
+
+
+def write_corpus(src):
+    with ShardWriter(src, max_bytes=400) as writer:
+        for n in range(6):
+            writer.write(QDND.format(n), {"url": QDND.format(n), "content": f"Bài {n}  \nThân bài\nTAG\nquốc phòng"})
+        writer.write("1", {"url": VBPL.format(1), "agency": "Unknown_Agency",
+                           "content": "Mục lục văn bản\nChính phủ ban hành\nĐiều 1"})
+        # Rewritten later: only this version is reprocessed
+        writer.write(QDND.format(0), {"url": QDND.format(0), "content": "Bản sửa\nTin liên quan\nBài khác"})
+        writer.write("other", {"url": "https://example.com/x", "content": "giữ nguyên\n\n\n\nhết"})
+
+
+def drop_other_sites(record):
+    return record if "example.com" not in record["url"] else None
+
+
+def test_process_record():
+    record = {"url": VBPL.format(1), "agency": "Unknown_Agency", "content": "Mục lục văn bản\nChính phủ ban hành\n"}
+    result = process_record(record, infer=INFER)
+    assert result == {"url": VBPL.format(1), "agency": "Chính phủ", "content": "Chính phủ ban hành"}
+    # The input record is left as it was
+    assert record["content"] == "Mục lục văn bản\nChính phủ ban hành\n"
+    assert process_record({"url": "https://example.com/x", "content": "a \n"}) == {
+        "url": "https://example.com/x", "content": "a"}
+    assert process_record({"content": None}, normalize=False) == {"content": ""}
+
+
+def test_work_units_hold_the_latest_version_once(tmp_path):
+    src = str(tmp_path / "src")
+    write_corpus(src)
+    units = list(iter_work_units(src, chunk_size=2))
+    keys = [key for _, chunk in units for key, _ in chunk]
+    assert sorted(keys) == sorted([QDND.format(n) for n in range(6)] + ["1", "other"])
+    assert all(len(chunk) <= 2 for _, chunk in units)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_reprocess(tmp_path, workers):
+    src, dst = str(tmp_path / "src"), str(tmp_path / "dst")
+    write_corpus(src)
+    before = sorted(os.listdir(src))
+    totals = reprocess(src, dst, process=functools.partial(process_record, infer=INFER),
+                       workers=workers, chunk_size=3)
+    assert totals == {"documents": 8, "changed": 8, "dropped": 0, "errors": 0}
+    assert sorted(os.listdir(src)) == before
+    assert all(shard.startswith("shard-w") for shard in list_shards(dst))
+    assert read_record(dst, QDND.format(0))["content"] == "Bản sửa"
+    assert read_record(dst, QDND.format(3))["content"] == "Bài 3\nThân bài"
+    assert read_record(dst, "1") == {"url": VBPL.format(1), "agency": "Chính phủ", "content": "Chính phủ ban hành\nĐiều 1"}
+    assert read_record(dst, "other")["content"] == "giữ nguyên\n\nhết"
+    assert len(list(iter_records(dst))) == 8
+    with open(os.path.join(dst, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    assert manifest["documents"] == 8 and manifest["workers"] == workers
+
+
+def test_reprocess_drops_records(tmp_path):
+    src, dst = str(tmp_path / "src"), str(tmp_path / "dst")
+    write_corpus(src)
+    totals = reprocess(src, dst, process=drop_other_sites, workers=1)
+    assert totals == {"documents": 8, "changed": 0, "dropped": 1, "errors": 0}
+    assert read_record(dst, "other") is None
+
+
+def test_reprocess_needs_a_new_directory(tmp_path):
+    src = str(tmp_path / "src")
+    write_corpus(src)
+    with pytest.raises(ValueError):
+        reprocess(src, src, workers=1)
+    with pytest.raises(ValueError):
+        reprocess(str(tmp_path / "other"), src, workers=1)
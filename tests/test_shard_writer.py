@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from crawl_common.shard_writer import ShardWriter, iter_records, list_shards, read_record
+
+
+def record(n, size=10):
+    return {"url": f"https://qdnd.vn/{n}", "title": f"Bài {n}", "content": "nội dung " * size}
+
+
+def test_write_and_read_back(tmp_path):
+    out = str(tmp_path)
+    with ShardWriter(out) as writer:
+        shard, offset, length = writer.write("a", record(1))
+        writer.write("b", record(2))
+        assert "a" in writer
+        assert "c" not in writer
+    assert (shard, offset) == ("shard-00000.jsonl", 0)
+    assert read_record(out, "a") == record(1)
+    assert read_record(out, "b") == record(2)
+    assert read_record(out, "c") is None
+    assert list(iter_records(out)) == [record(1), record(2)]
+
+
+def test_rotates_by_size(tmp_path):
+    out = str(tmp_path)
+    with ShardWriter(out, max_bytes=300) as writer:
+        for n in range(6):
+            writer.write(str(n), record(n))
+    shards = list_shards(out)
+    assert len(shards) > 1
+    assert all(os.path.getsize(os.path.join(out, shard)) <= 300 for shard in shards)
+    assert [read_record(out, str(n)) for n in range(6)] == [record(n) for n in range(6)]
+    assert list(iter_records(out)) == [record(n) for n in range(6)]
+
+
+def test_each_run_starts_a_new_shard_and_index_keeps_latest(tmp_path):
+    out = str(tmp_path)
+    with ShardWriter(out) as writer:
+        writer.write("a", record(1))
+    with ShardWriter(out) as writer:
+        shard, _, _ = writer.write("a", record(2))
+    assert shard == "shard-00001.jsonl"
+    assert read_record(out, "a") == record(2)
+    # Streaming sees both versions
+    assert list(iter_records(out)) == [record(1), record(2)]
+
+
+def test_list_shards_includes_parallel_writers(tmp_path):
+    out = str(tmp_path)
+    for name in ("shard-00001.jsonl", "shard-w1-00000.jsonl", "shard-w0-00002.jsonl.zst",
+                 "shard-00000.jsonl", "index.db", "other-00000.jsonl", "shard-wx-00003.jsonl"):
+        (tmp_path / name).write_bytes(b"")
+    assert list_shards(out) == ["shard-00000.jsonl", "shard-w1-00000.jsonl",
+                                "shard-00001.jsonl", "shard-w0-00002.jsonl.zst"]
+    assert list_shards(str(tmp_path / "missing")) == []
+
+
+def test_parallel_writers_share_the_index(tmp_path):
+    out = str(tmp_path)
+    with ShardWriter(out, prefix="shard-w0") as w0, ShardWriter(out, prefix="shard-w1") as w1:
+        w0.write("a", record(1))
+        # Worker processes commit per batch; in one thread w1 would wait on w0's open batch
+        w0.flush()
+        w1.write("b", record(2))
+    assert read_record(out, "a") == record(1)
+    assert read_record(out, "b") == record(2)
+    assert sorted(r["url"] for r in iter_records(out)) == [record(1)["url"], record(2)["url"]]
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    out = str(tmp_path)
+    with ShardWriter(out) as writer:
+        writer.write("a", record(1))
+        writer.write("b", record(2))
+    with open(tmp_path / "shard-00000.jsonl", "ab") as f:
+        f.write(b'{"url": "https://qdnd.vn/3", "content": "cut sh')
+    assert list(iter_records(out)) == [record(1), record(2)]
+    # The next run does not append after the torn line
+    with ShardWriter(out) as writer:
+        writer.write("c", record(3))
+    assert list(iter_records(out)) == [record(1), record(2), record(3)]
+
+
+def test_unsupported_compression(tmp_path):
+    with pytest.raises(ValueError):
+        ShardWriter(str(tmp_path), compression="gzip")
+
+
+def test_zstd_round_trip(tmp_path):
+    pytest.importorskip("zstandard")
+    out = str(tmp_path)
+    with ShardWriter(out, compression="zstd", max_bytes=400) as writer:
+        for n in range(5):
+            writer.write(str(n), record(n))
+    assert all(shard.endswith(".jsonl.zst") for shard in list_shards(out))
+    assert [read_record(out, str(n)) for n in range(5)] == [record(n) for n in range(5)]
+    assert list(iter_records(out)) == [record(n) for n in range(5)]
@@ -0,0 +1,90 @@
+import os
+import sys
+import unicodedata
+
+import pytest
+
+from crawl_common.text_clean import SITE_RULES, cleaner_for, infer_fields, normalize_text
+
+# benchmark_cleaning.py keeps the line loops the crawlers ran before text_clean
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_text"))
+from benchmark_cleaning import legacy_for, news_article, vbpl_document  # noqa: E402
+
+EDGE_CASES = [
+    "",
+    "\n",
+    "\n\n\n",
+    "một dòng",
+    "TAG",
+    "TAG\nnội dung",
+    "nội dung\nTAG",
+    "nội dung\nTAG\n",
+    "nội dung\n  Xem thêm  \nđuôi",
+    "đoạn dài nhắc TAG " + "chữ " * 30 + "\ncòn tiếp\nTAG",
+    "Tạp chí và Tòa soạn",
+    "Tạp chí và Tòa soạn\n",
+    "đầu\nTạp chí và Tòa soạn\nthân bài\nTIÊU ĐIỂM\nchân",
+    "\n".join(["dòng"] * 30 + ["Tạp chí và Tòa soạn", "thân bài"]),
+    "\n".join(["dòng"] * 29 + ["Tạp chí và Tòa soạn", "thân bài"]),
+    "Mục lục văn bản",
+    "Mục lục văn bản\n",
+    "\nMục lục văn bản",
+    "  Văn bản hợp nhất  \nĐiều 1\nVăn bản hợp nhất\n\nVăn bản hợp nhất",
+    "Điều 1\n\tHệ thống hóa VBQPPL\t\nĐiều 2\nVăn bản quy phạm pháp luật hiện hành",
+    "Văn bản hợp nhất\nVăn bản hợp nhất\nĐiều 1",
+    "Điều 1\r\nMục lục văn bản\r\nĐiều 2",
+    "Điều 1\nMục lục văn bản\n",
+]
+
+
+@pytest.mark.parametrize("site", sorted(SITE_RULES))
+def test_same_output_as_legacy_loops(site):
+    legacy, cleaner = legacy_for(site), cleaner_for(site)
+    texts = EDGE_CASES + [news_article(site, paragraphs=20, seed=seed) for seed in range(5)]
+    if site == "vbpl.vn":
+        texts.append(vbpl_document(0.2))
+    for text in texts:
+        assert cleaner.clean(text) == legacy(text), repr(text[:80])
+
+
+def test_cuts():
+    qdnd = cleaner_for("qdnd.vn")
+    assert qdnd.clean("Tiêu đề\nThân bài\nTin liên quan\nBài khác") == "Tiêu đề\nThân bài"
+    tcqp = cleaner_for("tapchiqptd.vn")
+    assert tcqp.clean("Tòa soạn: Hà Nội\nTạp chí và Tòa soạn\nThân bài\nTIÊU ĐIỂM\nBài khác") == "Thân bài"
+    vbpl = cleaner_for("vbpl.vn")
+    assert vbpl.clean("Mục lục văn bản\nĐiều 1\n Văn bản hợp nhất \nĐiều 2") == "Điều 1\nĐiều 2"
+
+
+def test_cleaner_for_url_and_subdomain():
+    assert cleaner_for("https://www.qdnd.vn/quoc-phong/bai-1") is cleaner_for("qdnd.vn")
+    assert cleaner_for("www.vbpl.vn") is cleaner_for("vbpl.vn")
+    assert cleaner_for("english.qdnd.vn") is cleaner_for("qdnd.vn")
+    with pytest.raises(KeyError):
+        cleaner_for("notqdnd.vn")
+
+
+def test_infer_fields():
+    fields = {"agency": ("Unknown_Agency", ["Quốc hội", "Chính phủ"]),
+              "type": ("Unknown_Type", ["Luật", "Nghị định"])}
+    metadata = {"agency": "Unknown_Agency", "type": "Thông tư"}
+    infer_fields(metadata, "CHÍNH PHỦ\nChính phủ ban hành Nghị định", fields)
+    assert metadata == {"agency": "Chính phủ", "type": "Thông tư"}
+
+    # A missing field counts as unknown; the first candidate in the list wins
+    metadata = {}
+    infer_fields(metadata, "Quốc hội và Chính phủ ... Luật", fields)
+    assert metadata == {"agency": "Quốc hội", "type": "Luật"}
+
+    metadata = {"agency": "Unknown_Agency"}
+    infer_fields(metadata, "x" * 1000 + "Chính phủ", fields)
+    assert metadata == {"agency": "Unknown_Agency"}
+
+
+def test_normalize_text():
+    decomposed = unicodedata.normalize("NFD", "Quân đội nhân dân Việt Nam")
+    assert decomposed != "Quân đội nhân dân Việt Nam"
+    assert normalize_text(decomposed) == "Quân đội nhân dân Việt Nam"
+    assert normalize_text("  a  \r\nb\t\r\n\r\n\r\n\r\nc \n\n") == "a\nb\n\nc"
+    assert normalize_text("a\n\nb") == "a\n\nb"
+    assert normalize_text("") == ""
@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("lxml")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crawl_text", "vbpl_crawler"))
+
+from crawl_common.shard_writer import iter_records, read_record  # noqa: E402
+from crawl_common.warc_archive import WarcArchive  # noqa: E402
+
+DOC_URL = "https://vbpl.vn/boquocphong/Pages/vbpq-toanvan.aspx?ItemID={}"
+PROPERTIES_URL = "https://vbpl.vn/boquocphong/Pages/vbpq-thuoctinh.aspx?ItemID={}"
+
+FULLTEXT = """<html><head><title>Toàn văn</title></head><body>
+<a href="vbpq-thuoctinh.aspx?ItemID={item}">Thuộc tính</a>
+<div id="toanvancontent"><p>Mục lục văn bản</p><p>BỘ QUỐC PHÒNG</p><p>{body}</p></div>
+</body></html>"""
+
+PROPERTIES = """<html><body><table>
+<tr><td>Trích yếu</td><td>Thông tư quy định về huấn luyện {item}</td></tr>
+<tr><td>Cơ quan ban hành</td><td>{agency}</td></tr>
+<tr><td>Loại văn bản</td><td>Thông tư</td></tr>
+<tr><td>Ngày ban hành</td><td>05/02/2024</td></tr>
+</table></body></html>"""
+
+
+def test_split_page_range():
+    pytest.importorskip("playwright")
+    from crawl_all import split_page_range
+
+    assert split_page_range(10, 3) == [(1, 4), (5, 8), (9, 10)]
+    assert split_page_range(9, 3) == [(1, 3), (4, 6), (7, 9)]
+    assert split_page_range(2, 4) == [(1, 1), (2, 2)]
+    assert split_page_range(1, 1) == [(1, 1)]
+    for total, workers in ((100, 7), (13, 4), (5, 8)):
+        ranges = split_page_range(total, workers)
+        assert len(ranges) <= workers
+        pages = [page for start, end in ranges for page in range(start, end + 1)]
+        assert pages == list(range(1, total + 1))
+
+
+def write_archive(archive_dir):
+    headers = {"Content-Type": "text/html; charset=utf-8"}
+    with WarcArchive(archive_dir) as archive:
+        archive.write_response(DOC_URL.format(1), 200, headers,
+                               FULLTEXT.format(item=1, body="Điều 1. Phạm vi điều chỉnh").encode("utf-8"))
+        archive.write_response(PROPERTIES_URL.format(1), 200, headers,
+                               PROPERTIES.format(item=1, agency="Bộ Quốc phòng").encode("utf-8"))
+        # No properties page archived: the agency is inferred from the text
+        archive.write_resource(DOC_URL.format(2), FULLTEXT.format(item=2, body="Chính phủ ban hành Nghị định"))
+        archive.write_response("https://vbpl.vn/boquocphong/Pages/Home.aspx", 200, headers, b"<html></html>")
+
+
+def test_rebuild_from_archive(tmp_path):
+    from utils import rebuild_from_archive
+
+    archive_dir, shard_dir = str(tmp_path / "archive"), str(tmp_path / "shards")
+    write_archive(archive_dir)
+    assert rebuild_from_archive(archive_dir, shard_dir) == 2
+
+    first = read_record(shard_dir, "1")
+    assert first["id"] == "1"
+    assert first["url"] == DOC_URL.format(1)
+    assert first["title"] == "Thông tư quy định về huấn luyện 1"
+    assert first["agency"] == "Bộ Quốc phòng"
+    assert first["type"] == "Thông tư"
+    assert first["date"] == "05/02/2024"
+    # Cleaned with the vbpl.vn rules; the blank line after the dropped noise stays, as in the old loop
+    assert first["content"] == "\nBỘ QUỐC PHÒNG\n\nĐiều 1. Phạm vi điều chỉnh"
+
+    second = read_record(shard_dir, "2")
+    assert second["agency"] == "Chính phủ"
+    assert second["type"] == "Nghị định"
+    assert len(list(iter_records(shard_dir))) == 2
+
+    # Never into a directory that already holds shards
+    assert rebuild_from_archive(archive_dir, shard_dir) == 0
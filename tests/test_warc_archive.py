@@ -0,0 +1,134 @@
+import gzip
+
+import pytest
+
+import crawl_common.warc_archive as warc_archive
+from crawl_common.warc_archive import RESOURCE, RESPONSE, WarcArchive, list_archives
+
+URL = "https://qdnd.vn/quoc-phong/bai-1"
+HTML = "<html><body><p>Quân đội nhân dân</p></body></html>"
+
+
+def test_response_round_trip(tmp_path):
+    body = HTML.encode("utf-8")
+    with WarcArchive(str(tmp_path)) as archive:
+        archive.write_response(URL, 200, {"Content-Type": "text/html; charset=utf-8", "Content-Encoding": "gzip",
+                                          "X-Cache": "MISS"}, body)
+        record = archive.get(URL)
+    assert record.record_type == RESPONSE
+    assert record.status == 200
+    assert record.body == body
+    assert record.text == HTML
+    assert record.headers["Content-Type"] == "text/html; charset=utf-8"
+    assert record.headers["X-Cache"] == "MISS"
+    # The body is stored decompressed, so the encoding header would be wrong
+    assert "Content-Encoding" not in record.headers
+
+
+def test_resource_round_trip_and_reopen(tmp_path):
+    with WarcArchive(str(tmp_path)) as archive:
+        archive.write_resource(URL, HTML)
+    with WarcArchive(str(tmp_path)) as archive:
+        assert URL in archive
+        record = archive.get(URL)
+        assert "https://qdnd.vn/other" not in archive
+        assert archive.get("https://qdnd.vn/other") is None
+    assert record.record_type == RESOURCE
+    assert record.status == 200
+    assert record.text == HTML
+
+
+def test_error_status_round_trip(tmp_path):
+    with WarcArchive(str(tmp_path)) as archive:
+        archive.write_response(URL, 404, {}, b"")
+        record = archive.get(URL)
+    assert record.status == 404
+    assert record.body == b""
+
+
+def test_latest_capture_wins(tmp_path):
+    with WarcArchive(str(tmp_path)) as archive:
+        archive.write_response(URL, 200, {"Content-Type": "text/html"}, b"old")
+        archive.write_resource(URL, "new")
+        assert archive.get(URL).text == "new"
+        assert archive.get(URL, RESPONSE).body == b"old"
+    with WarcArchive(str(tmp_path)) as archive:
+        archive.write_response(URL, 200, {"Content-Type": "text/html"}, b"newest")
+        assert archive.get(URL).body == b"newest"
+
+
+def test_read_before_flush(tmp_path):
+    with WarcArchive(str(tmp_path), batch_size=1000, flush_interval=1000) as archive:
+        archive.write_resource(URL, HTML)
+        assert archive.get(URL).text == HTML
+
+
+def test_files_are_valid_gzip_warc(tmp_path):
+    with WarcArchive(str(tmp_path), max_bytes=600) as archive:
+        for n in range(4):
+            archive.write_resource(f"{URL}?n={n}", HTML * 3)
+    names = list_archives(str(tmp_path))
+    assert len(names) > 1
+    for name in names:
+        data = gzip.decompress((tmp_path / name).read_bytes())
+        assert data.startswith(b"WARC/1.0\r\n")
+        assert b"WARC-Type: warcinfo" in data
+
+
+def test_urls_and_list_archives(tmp_path):
+    with WarcArchive(str(tmp_path)) as archive:
+        archive.write_resource("https://vbpl.vn/van-ban/toanvan.aspx?ItemID=1", HTML)
+        archive.write_resource("https://vbpl.vn/van-ban/thuoctinh.aspx?ItemID=1", HTML)
+        archive.write_resource("https://vbpl.vn/van-ban/toanvan.aspx?ItemID=1", HTML)
+        archive.write_resource(URL, HTML)
+        assert len(archive.urls()) == 3
+        assert sorted(archive.urls("%ItemID=%")) == ["https://vbpl.vn/van-ban/thuoctinh.aspx?ItemID=1",
+                                                     "https://vbpl.vn/van-ban/toanvan.aspx?ItemID=1"]
+    for name in ("archive-w1-00000.warc.gz", "archive-00003.warc.gz", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    assert list_archives(str(tmp_path)) == ["archive-00000.warc.gz", "archive-w1-00000.warc.gz",
+                                            "archive-00003.warc.gz"]
+
+
+def test_replay_only_run_writes_no_file(tmp_path):
+    with WarcArchive(str(tmp_path), replay=True) as archive:
+        assert archive.get(URL) is None
+    assert list_archives(str(tmp_path)) == []
+
+
+@pytest.fixture
+def no_archive(monkeypatch):
+    monkeypatch.delenv("CRAWL_ARCHIVE_DIR", raising=False)
+    monkeypatch.delenv("CRAWL_ARCHIVE_REPLAY", raising=False)
+    yield
+    warc_archive.close_archive()
+
+
+def test_configure_archive_off_by_default(no_archive):
+    assert warc_archive.configure_archive({}) is None
+    warc_archive.archive_page(URL, lambda: pytest.fail("page content read without an archive"))
+    assert not warc_archive.is_replayed(URL)
+
+
+def test_archive_page_and_replay(tmp_path, no_archive):
+    out = str(tmp_path / "archive")
+    archive = warc_archive.configure_archive({"archive_dir": out})
+    warc_archive.archive_page(URL, lambda: HTML)
+    assert archive.get(URL).text == HTML
+    assert not warc_archive.is_replayed(URL)
+
+    archive = warc_archive.configure_archive({"archive_dir": out, "archive_replay": True})
+    assert warc_archive.get_archive() is archive
+    assert warc_archive.is_replayed(URL)
+    assert not warc_archive.is_replayed("https://qdnd.vn/other")
+    # A replayed page is not archived again
+    warc_archive.archive_page(URL, lambda: pytest.fail("replayed page archived again"))
+    assert len(archive.urls()) == 1
+
+
+def test_configure_archive_from_environment(tmp_path, no_archive, monkeypatch):
+    monkeypatch.setenv("CRAWL_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setenv("CRAWL_ARCHIVE_REPLAY", "yes")
+    archive = warc_archive.configure_archive()
+    assert archive.out_dir == str(tmp_path)
+    assert archive.replay